@@ -0,0 +1,79 @@
+"""
+AI提示词基准
+对比"原始历史数据列表"与"统计摘要"两种方式在不同采样率下的提示词大小和构造耗时。
+指定 --live 且已配置 DEEPSEEK_CONFIG['api_key'] 时，额外测量真实的端到端请求延迟。
+
+用法: python benchmarks/bench_ai_prompt.py [--rates 1 10 100] [--live]
+"""
+import sys
+import json
+import time
+import asyncio
+import argparse
+from pathlib import Path
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.core.deepseek_ai import DeepSeekAnalyzer
+from src.core.feature_extractor import estimate_tokens
+
+
+def make_window(rate_hz: float, seconds: int = 3600, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    n = int(rate_hz * seconds)
+    ts = time.time() - seconds + np.arange(n) / rate_hz
+    pressure = 40 + np.cumsum(rng.normal(0, 0.01, n)) + rng.normal(0, 0.5, n)
+    temperature = 25 + 0.001 * np.arange(n) / rate_hz + rng.normal(0, 0.2, n)
+    vibration = np.abs(rng.normal(5, 2, n))
+    vibration[rng.integers(0, n, max(1, n // 5000))] += 30
+    return np.vstack([pressure, temperature, vibration, ts])
+
+
+def raw_prompt(current, window: np.ndarray) -> str:
+    """改造前的做法：每个样本转成字典后整体序列化"""
+    history = [{'pressure': p, 'temperature': t, 'vibration': v, 'timestamp': ts} for p, t, v, ts in window.T.tolist()]
+    return (
+        "你是矿井安全监测专家。请根据以下传感器数据评估当前安全状态。\n"
+        f"当前数据: {json.dumps(dict(zip(('pressure', 'temperature', 'vibration', 'timestamp'), current)))}\n"
+        f"历史数据: {json.dumps(history)}\n"
+    )
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, (time.perf_counter() - start) * 1000
+
+
+async def live_latency(analyzer: DeepSeekAnalyzer, prompt: str) -> float:
+    start = time.perf_counter()
+    await analyzer._call_api([{'role': 'user', 'content': prompt}])
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='AI提示词大小与延迟基准')
+    parser.add_argument('--rates', type=float, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--live', action='store_true', help='调用真实API测量端到端延迟')
+    args = parser.parse_args()
+    analyzer = DeepSeekAnalyzer()
+    print(f"{'采样率Hz':>8}{'样本数':>10}{'原始字符':>12}{'原始tokens':>12}{'构造ms':>10}{'摘要字符':>10}{'摘要tokens':>12}{'构造ms':>10}")
+    for rate in args.rates:
+        window = make_window(rate)
+        current = tuple(window[:, -1])
+        raw, raw_ms = timed(raw_prompt, current, window)
+        summary, summary_ms = timed(analyzer.build_safety_prompt, current, window)
+        raw_tokens = int(len(raw) * 0.3)  # 纯ASCII，直接按字符估算，避免逐字符扫描数百MB文本
+        print(f"{rate:>8g}{window.shape[1]:>10}{len(raw):>12}{raw_tokens:>12}{raw_ms:>10.1f}"
+              f"{len(summary):>10}{estimate_tokens(summary):>12}{summary_ms:>10.1f}")
+        if args.live and analyzer.api_key:
+            if raw_tokens > 60000:
+                print("        原始提示词超过模型上下文，跳过真实请求")
+            else:
+                print(f"        端到端延迟: 原始 {asyncio.run(live_latency(analyzer, raw)):.0f} ms")
+            print(f"        端到端延迟: 摘要 {asyncio.run(live_latency(analyzer, summary)):.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+历史导出基准
+在临时数据库中生成指定行数的传感器数据，分别测量流式导出 CSV / CSV.gz / Parquet 的吞吐量（行/秒）和峰值RSS增量。
+指定 --naive 时额外测量一次性 fetchall 后写出的做法作为对照（大数据量下可能耗尽内存）。
+
+用法: python benchmarks/bench_export.py [--rows 10000000] [--formats csv csv.gz parquet] [--chunk-size 50000] [--naive]
+"""
+import os
+import sys
+import csv
+import time
+import tempfile
+import argparse
+import threading
+from pathlib import Path
+import numpy as np
+import psutil
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.config import settings
+
+
+class PeakRSS:
+    """后台线程采样当前进程RSS，记录峰值"""
+    def __init__(self, interval: float = 0.01):
+        self.process = psutil.Process()
+        self.interval = interval
+        self.baseline = self.peak = self.process.memory_info().rss
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, self.process.memory_info().rss)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self.process.memory_info().rss)
+
+    @property
+    def delta_mb(self) -> float:
+        return (self.peak - self.baseline) / 1024 / 1024
+
+
+def populate(db, rows: int, batch: int = 200000):
+    rng = np.random.default_rng(0)
+    start = time.time() - rows * 0.1
+    with db.get_connection() as conn:
+        for offset in range(0, rows, batch):
+            n = min(batch, rows - offset)
+            ts = start + (offset + np.arange(n)) * 0.1
+            data = np.column_stack([40 + rng.normal(0, 1, n), 25 + rng.normal(0, 1, n), np.abs(rng.normal(5, 2, n)), ts])
+            conn.executemany('INSERT INTO sensor_data (pressure, temperature, vibration, timestamp) VALUES (?, ?, ?, ?)', data.tolist())
+            conn.commit()
+    db.rebuild_rollups()
+    return start
+
+
+def naive_export(db, path: Path, start_time: float) -> int:
+    rows = db.get_sensor_data(start_time)
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(('timestamp', 'device_id', 'pressure', 'temperature', 'vibration'))
+        writer.writerows((r['timestamp'], r['device_id'], r['pressure'], r['temperature'], r['vibration']) for r in rows)
+    return len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='历史数据流式导出基准')
+    parser.add_argument('--rows', type=int, default=10_000_000)
+    parser.add_argument('--formats', nargs='+', default=['csv', 'csv.gz', 'parquet'])
+    parser.add_argument('--chunk-size', type=int, default=settings.EXPORT_CONFIG['chunk_size'])
+    parser.add_argument('--naive', action='store_true', help='额外测量一次性读取全部行的做法')
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix='bench_export_'))
+    settings.DATABASE_CONFIG['path'] = workdir / 'bench.db'
+    # 关闭 mmap，否则被映射的数据库页也会计入RSS，掩盖导出本身的内存占用
+    settings.DATABASE_CONFIG['pragmas'] = dict(settings.DATABASE_CONFIG['pragmas'], mmap_size=0)
+    from src.utils.database import DatabaseManager
+    from src.utils.exporter import HistoryExporter
+
+    db = DatabaseManager()
+    t0 = time.perf_counter()
+    start_time = populate(db, args.rows)
+    print(f"生成 {args.rows} 行数据耗时 {time.perf_counter() - t0:.1f}s，数据库 {os.path.getsize(db.db_path) / 1e6:.0f} MB")
+
+    exporter = HistoryExporter(db, args.chunk_size)
+    print(f"{'方式':>10}{'行数':>12}{'耗时s':>10}{'行/秒':>12}{'峰值RSS增量MB':>16}{'文件MB':>10}")
+    for fmt in args.formats:
+        target = workdir / f'export.{fmt}'
+        try:
+            with PeakRSS() as rss:
+                result = exporter.export(target, start_time - 1, fmt=fmt)
+        except RuntimeError as e:
+            print(f"{fmt:>10}  跳过: {e}")
+            continue
+        rate = result['rows'] / result['elapsed'] if result['elapsed'] else 0
+        print(f"{fmt:>10}{result['rows']:>12}{result['elapsed']:>10.1f}{rate:>12.0f}{rss.delta_mb:>16.1f}{target.stat().st_size / 1e6:>10.1f}")
+        target.unlink()
+    if args.naive:
+        target = workdir / 'naive.csv'
+        with PeakRSS() as rss:
+            t0 = time.perf_counter()
+            count = naive_export(db, target, start_time - 1)
+            elapsed = time.perf_counter() - t0
+        print(f"{'fetchall':>10}{count:>12}{elapsed:>10.1f}{count / elapsed:>12.0f}{rss.delta_mb:>16.1f}{target.stat().st_size / 1e6:>10.1f}")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+辅助函数基准
+对比 helpers 中移动平均和异常检测的纯Python实现与NumPy实现，覆盖 1e3 到 1e7 个点。
+纯Python实现在大规模数据上耗时过长，默认只测到 --python-limit 个点。
+计时之前先用含 NaN、+inf、-inf 的数据核对移动平均与纯Python实现的边界语义（非有限值只影响包含它们的窗口）。
+
+用法: python benchmarks/bench_helpers.py [--sizes 1e3 1e4 1e5 1e6 1e7] [--window 60] [--python-limit 1e5]
+"""
+import sys
+import time
+import argparse
+from pathlib import Path
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.utils import helpers
+
+
+def python_moving_average(data, window_size):
+    """改造前的实现：每个位置重新切片求和"""
+    if len(data) < window_size:
+        return data
+    result = []
+    for i in range(len(data)):
+        if i < window_size - 1:
+            result.append(data[i])
+        else:
+            window_data = data[i - window_size + 1:i + 1]
+            result.append(sum(window_data) / window_size)
+    return result
+
+
+def python_detect_anomalies(data, threshold=2.0):
+    """改造前的实现：多次Python层遍历"""
+    if len(data) < 3:
+        return []
+    mean = sum(data) / len(data)
+    variance = sum((x - mean) ** 2 for x in data) / len(data)
+    std_dev = variance ** 0.5
+    return [i for i, x in enumerate(data) if abs(x - mean) > threshold * std_dev]
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def make_series(n: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    series = 40 + np.cumsum(rng.normal(0, 0.01, n)) + rng.normal(0, 0.5, n)
+    series[rng.integers(0, n, max(1, n // 1000))] += 10
+    return series
+
+
+def same_values(expected, actual) -> bool:
+    """逐点比较，NaN 与 NaN、同号 inf 与 inf 视为相等"""
+    expected, actual = np.asarray(expected, dtype=np.float64), np.asarray(actual, dtype=np.float64)
+    return expected.shape == actual.shape and np.allclose(expected, actual, equal_nan=True) \
+        and np.array_equal(np.isposinf(expected), np.isposinf(actual)) and np.array_equal(np.isneginf(expected), np.isneginf(actual))
+
+
+def check_non_finite(window: int, chunk_size: int):
+    """含非有限值时的移动平均一致性（包括分块实现跨块的窗口）"""
+    assert same_values([1, 2, np.nan, np.nan, np.nan, 5.0, 6.0], helpers.moving_average_array([1, 2, np.nan, 4, 5, 6, 7], 3))
+    n = max(10_000, 3 * window)
+    series = make_series(n, seed=1)
+    rng = np.random.default_rng(1)
+    for value, count in ((np.nan, 20), (np.inf, 10), (-np.inf, 10)):
+        series[rng.integers(0, n, count)] = value
+    series[n // 2:n // 2 + 2] = (np.inf, -np.inf)
+    expected = python_moving_average(series.tolist(), window)
+    assert same_values(expected, helpers.moving_average_array(series, window)), '含 NaN/inf 时移动平均结果不一致'
+    assert same_values(expected, helpers.moving_average_chunked(series, window, min(chunk_size, n // 3))), '含 NaN/inf 时分块移动平均结果不一致'
+    print(f"NaN/inf 边界语义检查通过 ({n} 点, 窗口 {window})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='移动平均与异常检测基准')
+    parser.add_argument('--sizes', type=float, nargs='+', default=[1e3, 1e4, 1e5, 1e6, 1e7])
+    parser.add_argument('--window', type=int, default=60)
+    parser.add_argument('--python-limit', type=float, default=1e5, help='超过该点数时跳过纯Python实现')
+    parser.add_argument('--chunk-size', type=int, default=1_000_000)
+    args = parser.parse_args()
+    check_non_finite(args.window, args.chunk_size)
+    print(f"{'点数':>10}{'MA py ms':>12}{'MA np ms':>12}{'MA 分块ms':>12}{'异常 py ms':>12}{'异常 np ms':>12}{'MAD ms':>10}{'异常 分块ms':>12}")
+    for size in args.sizes:
+        n = int(size)
+        series = make_series(n)
+        as_list = series.tolist()
+        ma_np, ma_np_ms = timed(helpers.moving_average_array, series, args.window)
+        _, ma_chunk_ms = timed(helpers.moving_average_chunked, series, args.window, args.chunk_size)
+        an_np, an_np_ms = timed(helpers.detect_anomalies_array, series)
+        _, mad_ms = timed(helpers.detect_anomalies_robust, series)
+        _, an_chunk_ms = timed(helpers.detect_anomalies_chunked, series, 2.0, args.chunk_size)
+        if n <= args.python_limit:
+            ma_py, ma_py_ms = timed(python_moving_average, as_list, args.window)
+            an_py, an_py_ms = timed(python_detect_anomalies, as_list)
+            assert same_values(ma_py, ma_np), '移动平均结果不一致'
+            assert an_py == an_np.tolist(), '异常检测结果不一致'
+            py_cols = f"{ma_py_ms:>12.1f}", f"{an_py_ms:>12.1f}"
+        else:
+            py_cols = f"{'-':>12}", f"{'-':>12}"
+        print(f"{n:>10}{py_cols[0]}{ma_np_ms:>12.2f}{ma_chunk_ms:>12.2f}{py_cols[1]}{an_np_ms:>12.2f}{mad_ms:>10.2f}{an_chunk_ms:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+多设备采集负载测试
+在本机启动 N 个模拟设备（TCP 服务端，由一个发送线程按固定速率推送二进制帧），
+用 CollectorManager 以少量读线程同时采集，统计接收/入库条数、吞吐量、线程数、CPU 占用和RSS。
+把 --reader-threads 设为与设备数相同可以对照“每个端口一个线程”的做法。
+压测之前先检查解析器：把一段帧流在每个字节位置切成两次读取，所有帧都应被解析出来，不丢帧、不丢字节，失败以退出码 1 结束。
+
+用法: python benchmarks/bench_multi_device.py [--devices 32] [--rate 200] [--duration 10] [--reader-threads 4]
+"""
+import sys
+import time
+import socket
+import tempfile
+import argparse
+import threading
+from pathlib import Path
+import numpy as np
+import psutil
+from loguru import logger
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.config import settings
+from src.core.frame_protocol import FrameParser, encode_frames
+
+
+class MockDeviceFleet:
+    """每个模拟设备占用一个本地 TCP 监听端口；单个发送线程每个 tick 为所有设备生成并发送一批帧"""
+    def __init__(self, count: int, rate: float, tick: float = 0.01):
+        self.rate = rate
+        self.tick = tick
+        self.servers = []
+        for _ in range(count):
+            server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            server.bind(('127.0.0.1', 0))
+            server.listen(1)
+            self.servers.append(server)
+        self.conns = []
+        self.sent = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='MockDeviceFleet', daemon=True)
+
+    @property
+    def uris(self):
+        return [f'tcp://127.0.0.1:{server.getsockname()[1]}' for server in self.servers]
+
+    def start(self):
+        self.conns = [server.accept()[0] for server in self.servers]
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def close(self):
+        for sock in self.conns + self.servers:
+            sock.close()
+
+    def _run(self):
+        rng = np.random.default_rng(0)
+        per_device = 0
+        started = time.monotonic()
+        while not self._stop.is_set():
+            # 按实际经过的时间补发，发送线程偶尔落后时总速率仍保持不变
+            elapsed = time.monotonic() - started
+            n = int(elapsed * self.rate) - per_device
+            if n > 0:
+                seq = per_device + np.arange(n)
+                ts_ms = (seq * 1000 / self.rate).astype(np.int64)
+                for conn in self.conns:
+                    values = np.column_stack([40 + rng.normal(0, 1, n), 25 + rng.normal(0, 0.5, n), np.abs(rng.normal(5, 1, n))])
+                    conn.sendall(encode_frames(seq, ts_ms, values))
+                per_device += n
+                self.sent += n * len(self.conns)
+            self._stop.wait(self.tick)
+
+
+def check_split_reads(frames: int = 5) -> bool:
+    """帧流在任意位置被拆成两次读取（包括同步字 0xAA 0x55 的两个字节之间）时，binary 和 auto 都应完整解析"""
+    data = encode_frames(np.arange(frames), np.arange(frames) * 10, np.ones((frames, 3)))
+    failed = []
+    for protocol in ('binary', 'auto'):
+        for cut in range(len(data) + 1):
+            parser = FrameParser(protocol=protocol)
+            decoded = len(parser.feed(data[:cut], now=100.0)) + len(parser.feed(data[cut:], now=100.1))
+            if decoded != frames or parser.stats['lost_frames'] or parser.stats['discarded_bytes']:
+                failed.append(f'{protocol}@{cut}')
+    print(f"分段读取检查: {len(data) + 1} 个切分位置 x 2 种协议 -> {'通过' if not failed else '未通过 ' + ', '.join(failed)}")
+    return not failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='多设备采集负载测试')
+    parser.add_argument('--devices', type=int, default=32)
+    parser.add_argument('--rate', type=float, default=200, help='每个设备每秒样本数')
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--reader-threads', type=int, default=settings.DEVICES_CONFIG['reader_threads'])
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level='WARNING')
+    if not check_split_reads():
+        return 1
+    workdir = Path(tempfile.mkdtemp(prefix='bench_devices_'))
+    settings.DATABASE_CONFIG['path'] = workdir / 'bench.db'
+    from src.core.collector_manager import CollectorManager
+    from src.utils.database import get_database_manager
+
+    fleet = MockDeviceFleet(args.devices, args.rate)
+    manager = CollectorManager([{'id': f'dev{i:03d}', 'uri': uri, 'protocol': 'binary'} for i, uri in enumerate(fleet.uris)],
+                               reader_threads=args.reader_threads)
+    process = psutil.Process()
+    manager.start()
+    fleet.start()
+    cpu_before = process.cpu_times()
+    started = time.perf_counter()
+    time.sleep(args.duration)
+    threads = threading.active_count()
+    fleet.stop()
+    time.sleep(0.5)  # 等待读线程取完套接字中剩余的数据
+    cpu_after = process.cpu_times()
+    elapsed = time.perf_counter() - started
+    manager.stop()
+    fleet.close()
+
+    stats = manager.get_stats()
+    with get_database_manager().get_read_connection() as conn:
+        stored = conn.execute('SELECT COUNT(*) FROM sensor_data').fetchone()[0]
+        devices = conn.execute('SELECT COUNT(DISTINCT device_id) FROM sensor_data').fetchone()[0]
+    cpu = (cpu_after.user + cpu_after.system - cpu_before.user - cpu_before.system) / elapsed * 100
+    crc_errors = sum(d['crc_errors'] for d in stats['devices'].values())
+    lost = sum(d['lost_frames'] for d in stats['devices'].values())
+    print(f"设备 {args.devices} 个 x {args.rate:g} Hz, 读线程 {manager.reader_threads} 个, 进程线程 {threads} 个")
+    print(f"发送 {fleet.sent} 帧, 接收 {stats['total_samples']} 条, 入库 {stored} 条 ({devices} 个设备), "
+          f"CRC错误 {crc_errors}, 丢帧 {lost}")
+    print(f"吞吐量 {stats['total_samples'] / elapsed:.0f} 条/秒, CPU {cpu:.0f}%, RSS {process.memory_info().rss / 1e6:.0f} MB")
+    get_database_manager().close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,220 @@
+"""
+端到端管道基准
+用 MockSTM32Communicator（以及可选的多个 mock:// 设备）按指定速率驱动完整的 MineMonitoringSystem，
+统计 串口→报警检查完成、串口→落库提交 的延迟分位数、持续吞吐量、CPU 占用和RSS，作为每次性能改动的回归基线。
+延迟的起点是解析器给样本打的时间戳，即数据从（模拟）串口读出的时刻。预热阶段的数据不计入统计。
+计时之前先做两项检查，失败以退出码 1 结束：报警订阅的无损反压（报警检查变慢、队列写满时不得丢弃样本）；
+写入队列在 drop_oldest 下被写满时，flush() 和 stop() 的控制消息不会被当作数据丢弃。
+
+用法: python benchmarks/bench_pipeline.py [--rate 1000] [--devices 1] [--duration 30] [--warmup 3] [--seed 0] [--json result.json]
+"""
+import sys
+import json
+import time
+import tempfile
+import argparse
+import threading
+from pathlib import Path
+from typing import Dict, List
+import numpy as np
+import psutil
+from loguru import logger
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.config import settings
+
+PERCENTILES = (50, 90, 99, 99.9)
+
+
+class LatencyRecorder:
+    """记录 当前时间 - 样本时间戳；active 为 False 时忽略（预热阶段）"""
+    def __init__(self):
+        self.active = False
+        self._chunks: List[np.ndarray] = []
+        self._lock = threading.Lock()
+
+    def record(self, timestamps: np.ndarray):
+        if not self.active or not len(timestamps):
+            return
+        latency = time.time() - timestamps
+        with self._lock:
+            self._chunks.append(latency)
+
+    def summary(self) -> Dict:
+        with self._lock:
+            values = np.concatenate(self._chunks) if self._chunks else np.empty(0)
+        if not values.size:
+            return {'count': 0}
+        result = {'count': int(values.size), 'mean_ms': float(values.mean() * 1000), 'max_ms': float(values.max() * 1000)}
+        for p, v in zip(PERCENTILES, np.percentile(values, PERCENTILES)):
+            result[f'p{p:g}_ms'] = float(v * 1000)
+        return result
+
+
+def instrument_alarm_system(alarm_system, recorder: LatencyRecorder):
+    """在实例上包装 check_sensor_batch，检查完成后记录整批样本的延迟"""
+    original = alarm_system.check_sensor_batch
+
+    def timed(rows):
+        result = original(rows)
+        recorder.record(np.asarray(rows, dtype=np.float64).reshape(-1, 4)[:, 3])
+        return result
+    alarm_system.check_sensor_batch = timed
+
+
+def check_alarm_backpressure(batches: int = 200, rows_per_batch: int = 50) -> bool:
+    """把 alarm_check 订阅的队列上限调小并让报警检查变慢，发布远超上限的批次，核对每一行都经过了报警检查"""
+    from src.main import MineMonitoringSystem
+    system = MineMonitoringSystem(use_mock_data=True)
+    if not system.initialize():
+        return False
+    bus = system.data_collector.event_bus
+    subscription = next(sub for sub in bus.subscriptions if sub.name == 'alarm_check')
+    subscription.maxsize = 4
+    alarm_system = system.alarm_system
+    original = alarm_system.check_sensor_batch
+    checked = []
+
+    def slow(rows):
+        time.sleep(0.001)
+        checked.append(len(rows))
+        return original(rows)
+    alarm_system.check_sensor_batch = slow
+    base = time.time() - 3600
+    try:
+        for i in range(batches):
+            times = base + (i * rows_per_batch + np.arange(rows_per_batch)) * 0.001
+            bus.publish_batch(np.column_stack([np.full((rows_per_batch, 3), 1.0), times]))
+        deadline = time.monotonic() + 10
+        while len(checked) < batches and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        bus.unsubscribe(subscription)
+        alarm_system.check_sensor_batch = original
+    stats = subscription.stats
+    ok = sum(checked) == batches * rows_per_batch and stats['dropped'] == 0
+    print(f"报警订阅反压检查: 发布 {batches * rows_per_batch} 行, 检查 {sum(checked)} 行, 丢弃 {stats['dropped']} 批, "
+          f"发布方等待 {stats['waited']} 次 -> {'通过' if ok else '未通过'}")
+    return ok
+
+
+def check_writer_control_messages(rows_per_batch: int = 10) -> bool:
+    """写入线程被数据库锁挡住时写满队列（drop_oldest），再调用 flush() 和 stop()：两者都应及时返回，行数核对无误"""
+    from src.utils.database import get_database_manager
+    from src.utils.db_writer import SensorDataWriter
+    db = get_database_manager()
+    writer = SensorDataWriter(db, {'queue_size': 4, 'overflow': 'drop_oldest', 'batch_size': 1, 'flush_interval': 0.01})
+    writer.start()
+    rows = [(1.0, 1.0, 1.0, time.time() - 7200, 'check')] * rows_per_batch
+    flushed, flusher = [], None
+    with db.lock:
+        for _ in range(8):
+            writer.submit_many(rows)
+        flusher = threading.Thread(target=lambda: flushed.append(writer.flush(timeout=5.0)))
+        flusher.start()
+        time.sleep(0.05)
+        for _ in range(20):
+            writer.submit_many(rows)
+    flusher.join(6.0)
+    writer.stop(timeout=5.0)
+    stats = writer.stats
+    ok = flushed == [True] and not writer.thread.is_alive() \
+        and stats['written'] + stats['dropped'] == stats['submitted']
+    print(f"写入队列控制消息检查: flush {'完成' if flushed == [True] else '超时'}, 写入线程{'仍在运行' if writer.thread.is_alive() else '已退出'}, "
+          f"提交 {stats['submitted']} 行 = 写入 {stats['written']} + 丢弃 {stats['dropped']} -> {'通过' if ok else '未通过'}")
+    return ok
+
+
+def format_latency(name: str, stats: Dict) -> str:
+    if not stats['count']:
+        return f"{name:<12} 无数据"
+    cols = '  '.join(f"p{p:g}={stats[f'p{p:g}_ms']:.1f}" for p in PERCENTILES)
+    return f"{name:<12} n={stats['count']:<9} {cols}  max={stats['max_ms']:.1f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='端到端管道基准（模拟设备驱动 MineMonitoringSystem）')
+    parser.add_argument('--rate', type=float, default=1000, help='每个设备每秒样本数 (1 ~ 10000)')
+    parser.add_argument('--devices', type=int, default=1, help='模拟设备数，第一个走 --mock 采集器，其余由 CollectorManager 采集')
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument('--warmup', type=float, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--quiet-signal', action='store_true', help='关闭尖峰、突增和掉线，只保留平稳信号')
+    parser.add_argument('--json', type=str, help='把结果写入 JSON 文件，便于与历史基线比较')
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix='bench_pipeline_'))
+    settings.DATABASE_CONFIG['path'] = workdir / 'bench.db'
+    settings.MOCK_CONFIG.update(rate=args.rate, seed=args.seed)
+    if args.quiet_signal:
+        settings.MOCK_CONFIG.update(spike_prob=0.0, burst_prob=0.0, dropout_prob=0.0)
+    settings.DEVICES_CONFIG['devices'] = [
+        {'id': f'mock{i:03d}', 'uri': f'mock://mock{i:03d}?rate={args.rate:g}&seed={args.seed + i}', 'protocol': 'binary'}
+        for i in range(1, args.devices)]
+    from src.main import MineMonitoringSystem
+    from src.utils.database import get_database_manager
+
+    logger.remove()
+    logger.add(sys.stderr, level='ERROR')
+    if not check_alarm_backpressure() or not check_writer_control_messages():
+        return 1
+    system = MineMonitoringSystem(use_mock_data=True)
+    logger.remove()
+    logger.add(sys.stderr, level='ERROR')
+    if not system.start():
+        print("系统启动失败")
+        return 1
+    alarm_latency, db_latency = LatencyRecorder(), LatencyRecorder()
+    instrument_alarm_system(system.alarm_system, alarm_latency)
+    if system.collector_manager:
+        for channel in system.collector_manager.channels.values():
+            instrument_alarm_system(channel.alarm_system, alarm_latency)
+    writer = get_database_manager().sensor_writer
+    writer.flush_listeners.append(lambda batch: db_latency.record(np.fromiter((r[3] for r in batch), np.float64, len(batch))))
+
+    def received() -> int:
+        total = system.data_collector.stats['total_samples']
+        if system.collector_manager:
+            total += system.collector_manager.get_stats()['total_samples']
+        return total
+
+    time.sleep(args.warmup)
+    process = psutil.Process()
+    alarm_latency.active = db_latency.active = True
+    samples_before, written_before, cpu_before = received(), writer.stats['written'], process.cpu_times()
+    started = time.perf_counter()
+    peak_rss = process.memory_info().rss
+    while time.perf_counter() - started < args.duration:
+        time.sleep(0.25)
+        peak_rss = max(peak_rss, process.memory_info().rss)
+    elapsed = time.perf_counter() - started
+    samples, written, cpu_after = received() - samples_before, writer.stats['written'] - written_before, process.cpu_times()
+    bus = system.data_collector.event_bus.get_metrics()
+    system.stop()
+    alarm_latency.active = db_latency.active = False
+
+    cpu = (cpu_after.user + cpu_after.system - cpu_before.user - cpu_before.system) / elapsed * 100
+    result = {
+        'config': {'rate': args.rate, 'devices': args.devices, 'duration': args.duration, 'quiet_signal': args.quiet_signal},
+        'throughput': {'received_per_s': samples / elapsed, 'written_per_s': written / elapsed,
+                       'offered_per_s': args.rate * args.devices},
+        'latency': {'serial_to_alarm': alarm_latency.summary(), 'serial_to_db': db_latency.summary()},
+        'cpu_percent': cpu, 'peak_rss_mb': peak_rss / 1e6,
+        'writer': dict(writer.stats), 'alarm_subscriber': bus.get('alarm_check', {}),
+    }
+    print(f"设备 {args.devices} 个 x {args.rate:g} Hz, 测量 {elapsed:.1f}s")
+    print(f"吞吐量: 接收 {result['throughput']['received_per_s']:.0f} 条/秒, 落库 {result['throughput']['written_per_s']:.0f} 条/秒 "
+          f"(目标 {result['throughput']['offered_per_s']:.0f})")
+    print(format_latency('串口→报警', result['latency']['serial_to_alarm']))
+    print(format_latency('串口→落库', result['latency']['serial_to_db']))
+    print(f"CPU {cpu:.0f}%, 峰值RSS {result['peak_rss_mb']:.0f} MB, 写入丢弃 {writer.stats['dropped']} 条, "
+          f"报警订阅丢弃 {result['alarm_subscriber'].get('dropped', 0)} 批")
+    if args.json:
+        Path(args.json).write_text(json.dumps(result, ensure_ascii=False, indent=2, default=str), encoding='utf-8')
+        print(f"结果已写入 {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
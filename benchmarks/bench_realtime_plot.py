@@ -0,0 +1,108 @@
+"""
+实时曲线数据准备基准
+不需要 Qt：若干生产者线程按指定速率向环形缓冲区追加样本（模拟多设备采集），PlotWorker 按显示刷新率生成帧，
+统计每帧准备耗时、实际帧率和 CPU 占用；--naive 对照每帧拷贝整个时间窗口再整体降采样的做法。
+
+用法: python benchmarks/bench_realtime_plot.py [--channels 50] [--rate 1000] [--window 60] [--width 1200] [--fps 30] [--duration 10] [--naive]
+"""
+import sys
+import math
+import time
+import argparse
+import threading
+from pathlib import Path
+import numpy as np
+import psutil
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.utils.ring_buffer import SensorRingBuffer, SENSOR_FIELDS
+from src.gui.plot_model import PlotFrame, PlotWorker, RealtimePlotModel
+
+FIELDS = SENSOR_FIELDS[:-1]
+
+
+class NaivePlotModel(RealtimePlotModel):
+    """对照组：每帧拷贝整个窗口并对全部样本重新做 min/max 降采样"""
+    def update(self, now=None) -> PlotFrame:
+        now = time.time() if now is None else now
+        names, lanes = [], []
+        for name, track, index in self.channels:
+            window = track.buffer.since(now - self.window).copy()
+            times, values = window[track._time_row], window[track.rows[index]]
+            columns = np.minimum(((times - (now - self.window)) / self.window * self.columns).astype(np.int64), self.columns - 1)
+            lo = np.full(self.columns, np.inf)
+            hi = np.full(self.columns, -np.inf)
+            np.minimum.at(lo, columns, values)
+            np.maximum.at(hi, columns, values)
+            valid = np.flatnonzero(np.isfinite(lo))
+            names.append(name)
+            lanes.append(np.column_stack([np.repeat(valid, 2), np.column_stack([lo[valid], hi[valid]]).ravel()]))
+        return PlotFrame(now, self.window, tuple(names), tuple(lanes), (), ())
+
+
+def produce(buffers, rate: float, stop: threading.Event, tick: float = 0.01):
+    """按实际经过的时间为每个缓冲区追加样本，时间戳均匀分布"""
+    rng = np.random.default_rng(0)
+    started = time.time()
+    sent = 0
+    while not stop.is_set():
+        n = int((time.time() - started) * rate) - sent
+        if n > 0:
+            ts = started + (sent + np.arange(1, n + 1)) / rate
+            for buffer in buffers:
+                buffer.extend(np.column_stack([rng.normal(30, 1, (n, len(FIELDS))), ts]))
+            sent += n
+        stop.wait(tick)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='实时曲线数据准备基准')
+    parser.add_argument('--channels', type=int, default=50)
+    parser.add_argument('--rate', type=float, default=1000, help='每个通道每秒样本数')
+    parser.add_argument('--window', type=float, default=60, help='显示的时间窗口（秒）')
+    parser.add_argument('--width', type=int, default=1200, help='绘图区宽度（像素），即降采样后的列数')
+    parser.add_argument('--fps', type=float, default=30)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--naive', action='store_true', help='使用每帧全量重算的对照实现')
+    args = parser.parse_args()
+
+    buffers = [SensorRingBuffer(int(args.rate * args.window * 1.2)) for _ in range(math.ceil(args.channels / len(FIELDS)))]
+    model = (NaivePlotModel if args.naive else RealtimePlotModel)(args.window, args.width)
+    for i in range(args.channels):
+        buffer_index, field = divmod(i, len(FIELDS))
+        model.add_channel(f"dev{buffer_index:03d}/{FIELDS[field]}", buffers[buffer_index], FIELDS[field])
+
+    # 先填满一个窗口，使测量时每帧面对的是完整窗口；生产者的时间戳从当前时刻接续，保持单调递增
+    ts = time.time() - args.window + np.arange(int(args.rate * args.window)) / args.rate
+    for buffer in buffers:
+        buffer.extend(np.column_stack([np.random.default_rng(1).normal(30, 1, (len(ts), len(FIELDS))), ts]))
+    stop = threading.Event()
+    producer = threading.Thread(target=produce, args=(buffers, args.rate, stop), daemon=True)
+    producer.start()
+
+    taken = []
+    worker = PlotWorker(model, args.fps, notify=lambda: taken.append(worker.take_frame()))
+    process = psutil.Process()
+    cpu_before = process.cpu_times()
+    started = time.perf_counter()
+    worker.start()
+    time.sleep(args.duration)
+    worker.stop()
+    elapsed = time.perf_counter() - started
+    cpu_after = process.cpu_times()
+    stop.set()
+    producer.join()
+
+    stats = worker.stats
+    frames = [f for f in taken if f is not None]
+    points = sum(len(lane) for lane in frames[-1].lanes) if frames else 0
+    cpu = (cpu_after.user + cpu_after.system - cpu_before.user - cpu_before.system) / elapsed * 100
+    print(f"{'全量重算' if args.naive else '增量降采样'}: {args.channels} 通道 x {args.rate:g} Hz, 窗口 {args.window:g}s, 宽度 {args.width}px")
+    print(f"帧率 {stats['frames'] / elapsed:.1f}/{args.fps:g} fps, 每帧准备 平均 {stats['prepare_avg'] * 1000:.2f} ms, "
+          f"最大 {stats['prepare_max'] * 1000:.2f} ms, 每帧 {points} 个点")
+    print(f"CPU {cpu:.0f}%（含生产者线程）")
+
+
+if __name__ == "__main__":
+    main()
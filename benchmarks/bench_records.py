@@ -0,0 +1,86 @@
+"""
+记录类型微基准
+对比旧的 dataclass + to_dict 路径与 SensorData 行元组路径的单样本耗时和内存分配
+
+用法: python benchmarks/bench_records.py [--samples N]
+"""
+import sys
+import time
+import argparse
+import tracemalloc
+from dataclasses import dataclass
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.core.data_collector import SensorData
+
+
+@dataclass
+class LegacySensorData:
+    pressure: float
+    temperature: float
+    vibration: float
+    timestamp: float
+    def to_dict(self):
+        return {'pressure': self.pressure, 'temperature': self.temperature, 'vibration': self.vibration, 'timestamp': self.timestamp}
+
+
+FIELDS = ('pressure', 'temperature', 'vibration')
+
+
+def legacy_path(raw):
+    data = LegacySensorData(raw['pressure'], raw['temperature'], raw['vibration'], raw['timestamp'])
+    d = data.to_dict()                                                            # 数据库写入
+    row = (d['pressure'], d['temperature'], d['vibration'], d['timestamp'])
+    checked = data.to_dict()                                                      # 报警检查
+    total = 0.0
+    for name in FIELDS:
+        total += checked[name]
+    history = data.to_dict()                                                      # AI 历史
+    return row, total, history
+
+
+def record_path(raw):
+    data = SensorData(raw['pressure'], raw['temperature'], raw['vibration'], raw['timestamp'])
+    row = data.as_row()                                                           # 数据库写入
+    total = 0.0
+    for index in range(3):                                                        # 报警检查
+        total += data[index]
+    history = data                                                                # AI 历史
+    return row, total, history
+
+
+def measure(func, raw, samples):
+    keep = [None] * samples
+    start = time.perf_counter()
+    for i in range(samples):
+        keep[i] = func(raw)
+    elapsed = time.perf_counter() - start
+    del keep
+    tracemalloc.start()
+    keep = [None] * samples
+    base, _ = tracemalloc.get_traced_memory()
+    snapshot_before = tracemalloc.take_snapshot()
+    for i in range(samples):
+        keep[i] = func(raw)
+    current, _ = tracemalloc.get_traced_memory()
+    snapshot_after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    blocks = sum(stat.count_diff for stat in snapshot_after.compare_to(snapshot_before, 'filename'))
+    return elapsed / samples * 1e9, (current - base) / samples, blocks / samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SensorData 记录类型微基准')
+    parser.add_argument('--samples', type=int, default=200000)
+    args = parser.parse_args()
+    raw = {'pressure': 42.0, 'temperature': 25.5, 'vibration': 3.2, 'timestamp': time.time()}
+    print(f"{'路径':<12}{'ns/样本':>12}{'保留字节/样本':>16}{'存活对象/样本':>16}")
+    for name, func in (('dataclass', legacy_path), ('row tuple', record_path)):
+        ns, nbytes, blocks = measure(func, raw, args.samples)
+        print(f"{name:<12}{ns:>12.0f}{nbytes:>16.1f}{blocks:>16.2f}")
+
+
+if __name__ == "__main__":
+    main()
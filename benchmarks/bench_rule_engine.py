@@ -0,0 +1,52 @@
+"""
+报警规则引擎吞吐量基准
+对比逐样本调用 AlarmRule.evaluate 与 CompiledRuleEngine 批量评估的吞吐量，并校验两者结果一致
+
+用法: python benchmarks/bench_rule_engine.py [--sizes 1000 100000 1000000]
+"""
+import sys
+import time
+import argparse
+from pathlib import Path
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.config.settings import ALARM_THRESHOLDS
+from src.core.alarm_system import AlarmRule, LEVEL_BY_CODE
+from src.core.rule_engine import CompiledRuleEngine
+
+
+def make_values(n: int, parameters, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    highs = np.array([ALARM_THRESHOLDS[p]['danger'][1] for p in parameters])
+    return rng.uniform(0, 1.1, (n, len(parameters))) * highs
+
+
+def scalar_levels(rules, values: np.ndarray):
+    return [[rule.evaluate(v) for rule, v in zip(rules, row)] for row in values.tolist()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='报警规则引擎吞吐量基准')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 100000, 1000000])
+    args = parser.parse_args()
+    engine = CompiledRuleEngine(ALARM_THRESHOLDS)
+    rules = [AlarmRule(p, ALARM_THRESHOLDS[p]) for p in engine.parameters]
+    print(f"{'样本数':>10}{'逐样本 样本/秒':>18}{'批量 样本/秒':>18}{'加速比':>10}")
+    for n in args.sizes:
+        values = make_values(n, engine.parameters)
+        start = time.perf_counter()
+        expected = scalar_levels(rules, values)
+        scalar_s = time.perf_counter() - start
+        start = time.perf_counter()
+        levels = engine.evaluate(values)
+        batch_s = time.perf_counter() - start
+        mismatch = sum(LEVEL_BY_CODE[c] != e for row_c, row_e in zip(levels.tolist(), expected) for c, e in zip(row_c, row_e))
+        if mismatch:
+            raise SystemExit(f"批量结果与逐样本结果不一致: {mismatch} 处")
+        print(f"{n:>10}{n / scalar_s:>18,.0f}{n / batch_s:>18,.0f}{scalar_s / batch_s:>10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
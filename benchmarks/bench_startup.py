@@ -0,0 +1,124 @@
+"""
+启动耗时基准
+在全新的解释器中测量 导入 src.main 和 无界面 --mock 启动（AcquisitionService + MineMonitoringSystem.start）的耗时，
+取多次运行的中位数与预算比较，超出预算时以退出码 1 结束，可直接用于 CI 回归检查。
+另用 python -X importtime 运行一次，列出累计导入耗时最高的模块，并检查无界面启动时是否加载了不需要的重型依赖。
+数据库、日志和 IPC 密钥写入临时目录，不影响 data/。
+
+用法: python benchmarks/bench_startup.py [--runs 5] [--import-budget 300] [--start-budget 1000] [--top 15] [--json result.json]
+"""
+import os
+import sys
+import json
+import time
+import tempfile
+import argparse
+import statistics
+import subprocess
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+RESULT_MARK = 'BENCH_STARTUP '
+# 无界面 --mock 启动不应加载的模块：界面、串口、AI HTTP 客户端和指标端点都只在用到时导入
+UNEXPECTED_MODULES = ('PyQt6', 'serial', 'aiohttp', 'http.server', 'pyarrow')
+
+
+def run_child(workdir: str):
+    """子进程：测量导入和启动耗时，结果以一行 JSON 写到 stdout"""
+    started = time.perf_counter()
+    sys.path.insert(0, str(ROOT))
+    from src.config import settings
+    settings.DATABASE_CONFIG['path'] = Path(workdir) / 'bench.db'
+    settings.LOGGING_CONFIG.update(level='WARNING', file_path=Path(workdir) / 'bench.log')
+    settings.IPC_CONFIG['authkey_path'] = Path(workdir) / 'ipc.key'
+    import src.main
+    imported = time.perf_counter()
+    from src.core.acquisition_service import AcquisitionService
+    service = AcquisitionService()
+    system = src.main.MineMonitoringSystem(use_mock_data=True, buffer_factory=service.create_ring)
+    ok = system.start()
+    ready = time.perf_counter()
+    loaded = [name for name in UNEXPECTED_MODULES if name in sys.modules]
+    system.stop()
+    service.close()
+    print(RESULT_MARK + json.dumps({'ok': ok, 'import_ms': (imported - started) * 1000,
+                                    'start_ms': (ready - imported) * 1000, 'ready_ms': (ready - started) * 1000,
+                                    'unexpected_modules': loaded}), flush=True)
+
+
+def spawn(importtime: bool = False):
+    """启动一次子进程，返回 (子进程结果, 进程总耗时毫秒, stderr)"""
+    workdir = tempfile.mkdtemp(prefix='bench_startup_')
+    cmd = [sys.executable, *(['-X', 'importtime'] if importtime else []), str(Path(__file__).resolve()), '--child', workdir]
+    started = time.perf_counter()
+    proc = subprocess.run(cmd, capture_output=True, text=True, cwd=str(ROOT), env=dict(os.environ, PYTHONDONTWRITEBYTECODE='1'))
+    wall = (time.perf_counter() - started) * 1000
+    for line in proc.stdout.splitlines():
+        if line.startswith(RESULT_MARK):
+            return json.loads(line[len(RESULT_MARK):]), wall, proc.stderr
+    raise RuntimeError(f"子进程没有输出结果 (退出码 {proc.returncode}):\n{proc.stderr[-2000:]}")
+
+
+def parse_importtime(stderr: str, top: int):
+    """解析 -X importtime 输出，返回累计耗时最高的 top 个模块 [(模块, 累计毫秒, 自身毫秒)]"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        rows.append((name.strip(), int(cumulative_us) / 1000, int(self_us) / 1000))
+    return sorted(rows, key=lambda row: -row[1])[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='启动耗时基准（导入 src.main 与无界面 --mock 启动）')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--import-budget', type=float, default=300.0, help='导入 src.main 的中位耗时预算（毫秒）')
+    parser.add_argument('--start-budget', type=float, default=1000.0, help='从进程开始到系统就绪的中位耗时预算（毫秒）')
+    parser.add_argument('--top', type=int, default=15, help='列出累计导入耗时最高的模块数')
+    parser.add_argument('--json', type=str, help='把结果写入 JSON 文件，便于与历史基线比较')
+    parser.add_argument('--child', type=str, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        run_child(args.child)
+        return 0
+
+    spawn()  # 预热文件系统缓存和字节码
+    runs = [spawn() for _ in range(args.runs)]
+    results = [result for result, _, _ in runs]
+    if not all(result['ok'] for result in results):
+        print("系统启动失败")
+        return 1
+    summary = {key: statistics.median(result[key] for result in results) for key in ('import_ms', 'start_ms', 'ready_ms')}
+    summary['process_ms'] = statistics.median(wall for _, wall, _ in runs)
+    unexpected = sorted({name for result in results for name in result['unexpected_modules']})
+    _, _, stderr = spawn(importtime=True)
+    top_modules = parse_importtime(stderr, args.top)
+
+    print(f"运行 {args.runs} 次取中位数:")
+    print(f"  导入 src.main    {summary['import_ms']:8.1f} ms  (预算 {args.import_budget:g} ms)")
+    print(f"  系统启动         {summary['start_ms']:8.1f} ms")
+    print(f"  进程开始到就绪   {summary['ready_ms']:8.1f} ms  (预算 {args.start_budget:g} ms)")
+    print(f"  子进程总耗时     {summary['process_ms']:8.1f} ms  (含解释器启动与停止)")
+    print(f"累计导入耗时最高的 {len(top_modules)} 个模块（-X importtime，含测量开销）:")
+    for name, cumulative, self_ms in top_modules:
+        print(f"  {cumulative:8.1f} ms  自身 {self_ms:6.1f} ms  {name}")
+    failures = []
+    if summary['import_ms'] > args.import_budget:
+        failures.append(f"导入耗时 {summary['import_ms']:.1f} ms 超出预算")
+    if summary['ready_ms'] > args.start_budget:
+        failures.append(f"启动耗时 {summary['ready_ms']:.1f} ms 超出预算")
+    if unexpected:
+        failures.append(f"无界面启动加载了不需要的模块: {', '.join(unexpected)}")
+    for failure in failures:
+        print(f"未通过: {failure}")
+    if args.json:
+        result = dict(summary, runs=results, unexpected_modules=unexpected, failures=failures,
+                      top_modules=[{'module': name, 'cumulative_ms': c, 'self_ms': s} for name, c, s in top_modules])
+        Path(args.json).write_text(json.dumps(result, ensure_ascii=False, indent=2), encoding='utf-8')
+        print(f"结果已写入 {args.json}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
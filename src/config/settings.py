@@ -8,11 +8,26 @@ DATA_DIR = PROJECT_ROOT / "data"
 DATABASE_DIR = DATA_DIR / "database"
 LOGS_DIR = DATA_DIR / "logs"
 EXPORTS_DIR = DATA_DIR / "exports"
-for dir_path in [DATA_DIR, DATABASE_DIR, LOGS_DIR, EXPORTS_DIR]:
-    dir_path.mkdir(exist_ok=True)
-DATABASE_CONFIG = {'name': 'mine_monitoring.db', 'path': DATABASE_DIR / 'mine_monitoring.db'}
-STM32_CONFIG = {'port': 'COM3', 'baudrate': 115200, 'timeout': 1, 'data_format': {'pressure': {'min': 0, 'max': 1000, 'unit': 'MPa'}, 'temperature': {'min': -40, 'max': 85, 'unit': '\u00b0C'}, 'vibration': {'min': 0, 'max': 100, 'unit': 'mm/s'}}}
-DEEPSEEK_CONFIG = {'api_url': 'https://api.deepseek.com/v1/chat/completions', 'api_key': '', 'model': 'deepseek-chat', 'max_tokens': 1000, 'temperature': 0.7}
+ARCHIVE_DIR = DATA_DIR / "archive"
+# 导入配置不创建目录：数据库、日志、归档和导出在首次写入时各自创建所需目录
+DATABASE_CONFIG = {'name': 'mine_monitoring.db', 'path': DATABASE_DIR / 'mine_monitoring.db', 'read_pool_size': 4, 'pragmas': {'mmap_size': 268435456, 'cache_size': -16000, 'temp_store': 'MEMORY', 'busy_timeout': 30000}}
+STM32_CONFIG = {'port': 'COM3', 'baudrate': 115200, 'timeout': 1, 'protocol': 'auto', 'read_chunk': 4096, 'parser_buffer': 65536, 'data_format': {'pressure': {'min': 0, 'max': 1000, 'unit': 'MPa'}, 'temperature': {'min': -40, 'max': 85, 'unit': '\u00b0C'}, 'vibration': {'min': 0, 'max': 100, 'unit': 'mm/s'}}}
+DEEPSEEK_CONFIG = {'api_url': 'https://api.deepseek.com/v1/chat/completions', 'api_key': '', 'model': 'deepseek-chat', 'max_tokens': 1000, 'temperature': 0.7, 'context_token_budget': 800}
 ALARM_THRESHOLDS = {'pressure': {'normal': (0, 50), 'warning': (50, 80), 'danger': (80, 100)}, 'temperature': {'normal': (10, 35), 'warning': (35, 50), 'danger': (50, 70)}, 'vibration': {'normal': (0, 20), 'warning': (20, 40), 'danger': (40, 60)}}
-UI_CONFIG = {'window_size': (1400, 900), 'min_window_size': (1200, 800), 'theme': 'dark', 'update_interval': 1000, 'chart_points': 100, 'language': 'zh_CN'}
-LOGGING_CONFIG = {'level': 'INFO', 'format': '{time:YYYY-MM-DD HH:mm:ss} | {level} | {name} | {message}', 'rotation': '10 MB', 'retention': '30 days', 'file_path': LOGS_DIR / 'mine_monitoring.log'}
+UI_CONFIG = {'window_size': (1400, 900), 'min_window_size': (1200, 800), 'theme': 'dark', 'update_interval': 1000, 'chart_points': 100, 'language': 'zh_CN', 'plot_window_seconds': 60, 'plot_fps': 30, 'plot_lane_min_height': 24}
+LOGGING_CONFIG = {'level': 'INFO', 'format': '{time:YYYY-MM-DD HH:mm:ss} | {level} | {name} | {message}', 'rotation': '10 MB', 'retention': '30 days', 'file_path': LOGS_DIR / 'mine_monitoring.log', 'async': True, 'queue_size': 10000, 'json': False, 'json_path': LOGS_DIR / 'mine_monitoring.jsonl', 'rate_limit_interval': 10.0, 'rate_limit_burst': 5, 'rate_limit_keys': 4096}
+DB_WRITER_CONFIG = {'queue_size': 10000, 'batch_size': 500, 'flush_interval': 0.5, 'durability': 'normal', 'overflow': 'block', 'block_timeout': 0.05}
+COLLECTOR_CONFIG = {'buffer_size': 65536, 'warm_start_seconds': 3600, 'batch_mode': True, 'device_id': 'default'}
+MOCK_CONFIG = {'rate': 10, 'max_rate': 10000, 'tick': 0.01, 'seed': None, 'baseline': {'pressure': 30.0, 'temperature': 25.0, 'vibration': 8.0}, 'noise': {'pressure': 1.0, 'temperature': 0.3, 'vibration': 1.5}, 'drift_per_hour': {'pressure': 0.5, 'temperature': 0.2, 'vibration': 0.0}, 'wave_amplitude': {'pressure': 2.0, 'temperature': 1.0, 'vibration': 0.5}, 'wave_period': 600.0, 'spike_prob': 0.0005, 'spike_scale': 25.0, 'burst_prob': 0.005, 'burst_duration': 2.0, 'burst_factor': 5.0, 'dropout_prob': 0.002, 'dropout_duration': 1.0}
+DEVICES_CONFIG = {'devices': [], 'reader_threads': 4, 'poll_interval': 0.005, 'read_chunk': 4096, 'buffer_size': 65536, 'reconnect_interval': 5.0}
+EVENT_BUS_CONFIG = {'queue_size': 1000, 'policy': 'drop_oldest', 'block_timeout': 0.1}
+AI_SCHEDULER_CONFIG = {'max_in_flight': 2, 'timeout': 30.0, 'min_interval': 60.0}
+ANALYSIS_CACHE_CONFIG = {'enabled': True, 'ttl': 300, 'max_entries': 256, 'persist': True, 'quantization': {'pressure': 1.0, 'temperature': 0.5, 'vibration': 1.0}}
+ROLLUP_CONFIG = {'enabled': True, 'resolutions': {'1m': 60, '1h': 3600, '1d': 86400}, 'lttb_max_rows': 50000}
+RETENTION_CONFIG = {'enabled': True, 'hot_days': 7, 'partition': 'day', 'raw_days': 90, 'archive_format': 'npz', 'rollup_days': {'1m': 180, '1h': 1825, '1d': None}, 'interval': 3600, 'chunk_rows': 5000, 'chunk_pause': 0.05, 'vacuum_pages': 512}
+EXPORT_CONFIG = {'chunk_size': 50000, 'gzip_level': 6, 'parquet_compression': 'zstd'}
+TREND_DETECTION_CONFIG = {'enabled': True, 'ewma_alpha': 0.05, 'baseline_alpha': 0.002, 'warmup': 50, 'anomaly_z': 5.0, 'slope_window': 60.0, 'slope_buckets': 60, 'slope_t': 5.0, 'slope_limits': {'pressure': 5.0, 'temperature': 2.0, 'vibration': 10.0}, 'cusum_k': 0.5, 'cusum_h': 10.0}
+METRICS_CONFIG = {'enabled': False, 'host': '127.0.0.1', 'port': 9108, 'buckets': (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)}
+PROFILER_CONFIG = {'profile_signal': 'SIGUSR1', 'trace_signal': 'SIGUSR2', 'duration': 30.0, 'max_duration': 300.0, 'interval': 0.005, 'trace_fraction': 0.001, 'trace_timeout': 30.0}
+IPC_CONFIG = {'host': '127.0.0.1', 'port': 9110, 'authkey_path': DATA_DIR / 'ipc.key', 'stats_interval': 1.0, 'connect_timeout': 15.0, 'ring_prefix': 'mine_ring'}
+ALARM_CONFIG = {'min_interval': 60, 'max_count_per_hour': 10, 'rate_window': 3600, 'history_size': 1000, 'queue_size': 10000, 'batch_size': 200, 'flush_interval': 0.5, 'retries': 3, 'retry_backoff': 0.2}
@@ -0,0 +1,365 @@
+"""
+采集服务模块
+无界面模式下，采集、存储和报警在独立的采集进程中运行（python src/main.py --headless），
+界面进程通过 AcquisitionClient 挂载：
+    实时数据    每个设备一个 SharedSensorRing（共享内存，零拷贝只读挂载）
+    报警与统计  multiprocessing.connection 连接，服务端主动推送 alarm / stats 消息
+    命令        客户端 call(command, **kwargs)，服务端以 reply 消息应答
+界面进程退出或重启只会断开连接，不影响采集；多个界面可以同时挂载。
+连接用 HMAC 密钥认证（multiprocessing.connection 会反序列化收到的对象，密钥泄露等同于可在采集进程中执行任意代码）：
+密钥在首次使用时随机生成，保存在仅所有者可读写（0600）的 IPC_CONFIG['authkey_path'] 中，
+也可由环境变量 MINE_IPC_AUTHKEY 指定；spawn_service 通过环境变量把密钥交给子进程。
+"""
+import os
+import re
+import sys
+import stat
+import time
+import secrets
+import itertools
+import subprocess
+import threading
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Connection, Listener
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+from loguru import logger
+from ..config.settings import IPC_CONFIG
+from ..utils.logger import get_log_stats
+from ..utils.shared_ring import SharedSensorRing
+
+
+def _address():
+    return (IPC_CONFIG['host'], IPC_CONFIG['port'])
+
+
+AUTHKEY_ENV = 'MINE_IPC_AUTHKEY'
+
+
+def _authkey() -> bytes:
+    return (os.environ.get(AUTHKEY_ENV) or _load_or_create_key(Path(IPC_CONFIG['authkey_path']))).encode('ascii')
+
+
+def _load_or_create_key(path: Path) -> str:
+    """读取密钥文件，不存在时以 0600 权限原子地创建；其他用户可访问的密钥文件先收紧权限再使用"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        if os.name == 'posix':
+            info = path.stat()
+            if info.st_uid != os.getuid():
+                raise PermissionError(f"IPC 密钥文件 {path} 不属于当前用户，拒绝使用")
+            if stat.S_IMODE(info.st_mode) & 0o077:
+                logger.warning(f"IPC 密钥文件 {path} 的权限过宽，已收紧为 0600")
+                os.chmod(path, 0o600)
+        key = path.read_text(encoding='ascii').strip()
+        if key:
+            return key
+        # 另一个进程刚创建文件尚未写入，稍后重读
+        time.sleep(0.1)
+        return path.read_text(encoding='ascii').strip()
+    key = secrets.token_hex(32)
+    with os.fdopen(fd, 'w', encoding='ascii') as f:
+        f.write(key)
+    logger.info(f"已生成 IPC 密钥: {path}")
+    return key
+
+
+class AcquisitionService:
+    """
+    用法: 先创建服务，以 create_ring 作为 buffer_factory 构造并启动监测系统，再调用 serve(system)。
+    serve 在收到 shutdown 命令或 stop() 之前阻塞。
+    """
+    def __init__(self, address=None, authkey: Optional[bytes] = None):
+        self.address = address or _address()
+        self.authkey = authkey or _authkey()
+        self.rings: Dict[str, SharedSensorRing] = {}
+        self.system = None
+        self.listener: Optional[Listener] = None
+        self.clients: Dict[Connection, threading.Lock] = {}
+        self._clients_lock = threading.Lock()
+        self._stop = threading.Event()
+        self.commands: Dict[str, Callable] = {
+            'ping': lambda: 'pong',
+            'get_stats': self.collect_stats,
+            'get_rings': self.describe_rings,
+            'recent_alarms': self._recent_alarms,
+            'alarm_records': self._alarm_records,
+            'acknowledge_alarms': self._acknowledge_alarms,
+            'shutdown': self.stop,
+        }
+
+    def create_ring(self, device_id: str, capacity: int) -> SharedSensorRing:
+        """buffer_factory：为设备创建共享内存缓冲区，名称带进程号以免与残留的段冲突"""
+        name = f"{IPC_CONFIG['ring_prefix']}_{os.getpid()}_{re.sub(r'[^0-9A-Za-z_]', '_', device_id)}"
+        ring = SharedSensorRing.create(capacity, name=name)
+        self.rings[device_id] = ring
+        return ring
+
+    def describe_rings(self) -> Dict[str, Dict]:
+        return {device_id: ring.describe() for device_id, ring in self.rings.items()}
+
+    def collect_stats(self) -> Dict:
+        system = self.system
+        if system is None:
+            return {}
+        stats = {'running': system.is_running, 'clients': len(self.clients), 'pid': os.getpid()}
+        if system.data_collector:
+            stats['collector'] = dict(system.data_collector.stats)
+            writer = system.data_collector.db_manager.sensor_writer
+            if writer:
+                stats['writer'] = dict(writer.stats)
+        if system.alarm_system:
+            stats['alarms'] = dict(system.alarm_system.alarm_stats)
+            alarm_writer = system.alarm_system.db_manager.alarm_writer
+            if alarm_writer:
+                stats['alarm_writer'] = dict(alarm_writer.stats)
+        if system.collector_manager:
+            stats['devices'] = system.collector_manager.get_stats()
+        stats['logging'] = get_log_stats()
+        return stats
+
+    def _alarm_systems(self) -> List:
+        alarm_systems = [self.system.alarm_system]
+        if self.system.collector_manager:
+            alarm_systems += [channel.alarm_system for channel in self.system.collector_manager.channels.values()]
+        return alarm_systems
+
+    def _recent_alarms(self, limit: int = 50) -> List[Dict]:
+        events = [event for alarm_system in self._alarm_systems() for event in alarm_system.get_recent_alarms(limit)]
+        return [event.to_dict() for event in sorted(events, key=lambda e: e.timestamp)[-limit:]]
+
+    def _alarm_records(self, **filters) -> List[Dict]:
+        """跨设备查询数据库中的报警记录，参数见 DatabaseManager.get_alarm_records"""
+        return self.system.alarm_system.db_manager.get_alarm_records(**filters)
+
+    def _acknowledge_alarms(self, alarm_ids: Optional[List[int]] = None) -> int:
+        return sum(alarm_system.acknowledge_alarms(alarm_ids) for alarm_system in self._alarm_systems())
+
+    def serve(self, system):
+        self.system = system
+        system.alarm_system.add_alarm_callback(self._on_alarm)
+        if system.collector_manager:
+            system.collector_manager.add_alarm_callback(self._on_alarm)
+        self.listener = Listener(self.address, authkey=self.authkey)
+        threading.Thread(target=self._accept_loop, name='IPCAccept', daemon=True).start()
+        logger.info(f"采集服务已就绪: {self.address[0]}:{self.address[1]}, 共享缓冲区 {len(self.rings)} 个")
+        try:
+            while not self._stop.wait(IPC_CONFIG['stats_interval']):
+                if not system.is_running:
+                    break
+                self.broadcast({'type': 'stats', 'stats': self.collect_stats()})
+        except KeyboardInterrupt:
+            logger.info("收到退出信号")
+
+    def stop(self):
+        self._stop.set()
+        return True
+
+    def close(self):
+        """在监测系统停止之后调用：断开客户端并删除共享内存段"""
+        self._stop.set()
+        if self.listener is not None:
+            self.listener.close()
+            self.listener = None
+        with self._clients_lock:
+            clients, self.clients = list(self.clients), {}
+        for conn in clients:
+            conn.close()
+        for ring in self.rings.values():
+            ring.close()
+        self.rings = {}
+
+    def broadcast(self, message: Dict):
+        with self._clients_lock:
+            clients = list(self.clients.items())
+        for conn, lock in clients:
+            self._send(conn, lock, message)
+
+    def _send(self, conn: Connection, lock: threading.Lock, message: Dict):
+        try:
+            with lock:
+                conn.send(message)
+        except (OSError, EOFError, ValueError):
+            self._drop(conn)
+
+    def _drop(self, conn: Connection):
+        with self._clients_lock:
+            if self.clients.pop(conn, None) is None:
+                return
+        conn.close()
+        logger.info(f"界面客户端已断开，剩余 {len(self.clients)} 个")
+
+    def _on_alarm(self, event):
+        self.broadcast({'type': 'alarm', 'alarm': event.to_dict()})
+
+    def _accept_loop(self):
+        while not self._stop.is_set():
+            try:
+                conn = self.listener.accept()
+            except (OSError, EOFError, AuthenticationError) as e:
+                if not self._stop.is_set() and self.listener is not None:
+                    logger.warning(f"拒绝界面客户端连接: {e}")
+                    continue
+                return
+            # 先发送 hello 再登记，保证客户端收到的第一条消息总是 hello
+            try:
+                conn.send({'type': 'hello', 'pid': os.getpid(), 'rings': self.describe_rings(), 'stats': self.collect_stats()})
+            except (OSError, EOFError):
+                conn.close()
+                continue
+            lock = threading.Lock()
+            with self._clients_lock:
+                self.clients[conn] = lock
+            logger.info(f"界面客户端已连接，共 {len(self.clients)} 个")
+            threading.Thread(target=self._client_loop, args=(conn, lock), name='IPCClient', daemon=True).start()
+
+    def _client_loop(self, conn: Connection, lock: threading.Lock):
+        while True:
+            try:
+                request = conn.recv()
+            except (OSError, EOFError):
+                self._drop(conn)
+                return
+            handler = self.commands.get(request.get('command'))
+            reply = {'type': 'reply', 'id': request.get('id')}
+            if handler is None:
+                reply.update(ok=False, error=f"未知命令: {request.get('command')}")
+            else:
+                try:
+                    reply.update(ok=True, result=handler(**request.get('kwargs', {})))
+                except Exception as e:
+                    reply.update(ok=False, error=repr(e))
+            self._send(conn, lock, reply)
+
+
+class AcquisitionClient:
+    """界面侧连接；rings 为按设备ID挂载的共享缓冲区，stats 为服务端最近一次推送的统计"""
+    def __init__(self, address=None, authkey: Optional[bytes] = None):
+        self.address = address or _address()
+        self.authkey = authkey or _authkey()
+        self.conn: Optional[Connection] = None
+        self.rings: Dict[str, SharedSensorRing] = {}
+        self.stats: Dict = {}
+        self.service_pid: Optional[int] = None
+        self.alarm_callbacks: List[Callable[[Dict], None]] = []
+        self.disconnect_callbacks: List[Callable[[], None]] = []
+        self._ids = itertools.count(1)
+        self._pending: Dict[int, list] = {}
+        self._send_lock = threading.Lock()
+        self._pending_lock = threading.Lock()
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def is_connected(self) -> bool:
+        return self.conn is not None
+
+    def connect(self, timeout: Optional[float] = None) -> bool:
+        """在 timeout 秒内反复尝试连接（服务可能刚被拉起）；成功后挂载服务端的全部共享缓冲区"""
+        deadline = time.monotonic() + (IPC_CONFIG['connect_timeout'] if timeout is None else timeout)
+        while True:
+            try:
+                conn = Client(self.address, authkey=self.authkey)
+                break
+            except ConnectionRefusedError:
+                if time.monotonic() >= deadline:
+                    return False
+                time.sleep(0.2)
+        hello = conn.recv()
+        self.service_pid = hello['pid']
+        self.stats = hello['stats']
+        self.rings = {device_id: SharedSensorRing.attach(info['name'], info['fields']) for device_id, info in hello['rings'].items()}
+        self.conn = conn
+        self.thread = threading.Thread(target=self._recv_loop, name='IPCReceiver', daemon=True)
+        self.thread.start()
+        logger.info(f"已连接采集服务 (pid {self.service_pid}), 设备 {list(self.rings)}")
+        return True
+
+    def close(self):
+        conn, self.conn = self.conn, None
+        if conn is not None:
+            conn.close()
+        for ring in self.rings.values():
+            ring.close()
+        self.rings = {}
+
+    def add_alarm_callback(self, callback: Callable[[Dict], None]):
+        """回调在接收线程中执行，参数为 AlarmEvent.to_dict() 的结果"""
+        self.alarm_callbacks.append(callback)
+
+    def call(self, command: str, timeout: float = 5.0, **kwargs):
+        if self.conn is None:
+            raise ConnectionError("未连接采集服务")
+        request_id = next(self._ids)
+        slot = [threading.Event(), None]
+        with self._pending_lock:
+            self._pending[request_id] = slot
+        try:
+            with self._send_lock:
+                self.conn.send({'id': request_id, 'command': command, 'kwargs': kwargs})
+            if not slot[0].wait(timeout):
+                raise TimeoutError(f"采集服务未在 {timeout} 秒内响应命令 {command}")
+        finally:
+            with self._pending_lock:
+                self._pending.pop(request_id, None)
+        reply = slot[1]
+        if reply is None:
+            raise ConnectionError("与采集服务的连接已断开")
+        if not reply['ok']:
+            raise RuntimeError(reply['error'])
+        return reply['result']
+
+    def _recv_loop(self):
+        conn = self.conn
+        while True:
+            try:
+                message = conn.recv()
+            except (OSError, EOFError, TypeError):
+                # close() 在其他线程关闭连接时，阻塞中的 recv 可能抛出 TypeError
+                break
+            kind = message.get('type')
+            if kind == 'stats':
+                self.stats = message['stats']
+            elif kind == 'alarm':
+                for callback in self.alarm_callbacks:
+                    try:
+                        callback(message['alarm'])
+                    except Exception as e:
+                        logger.error(f"报警回调执行失败: {e}")
+            elif kind == 'reply':
+                with self._pending_lock:
+                    slot = self._pending.get(message['id'])
+                if slot is not None:
+                    slot[1] = message
+                    slot[0].set()
+        if self.conn is conn:
+            self.conn = None
+            logger.warning("与采集服务的连接已断开")
+        with self._pending_lock:
+            for slot in self._pending.values():
+                slot[0].set()
+        for callback in self.disconnect_callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.error(f"断开回调执行失败: {e}")
+
+
+def spawn_service(extra_args: Optional[List[str]] = None) -> subprocess.Popen:
+    """在独立会话中启动采集进程，使其不随界面进程退出"""
+    main_script = Path(__file__).resolve().parent.parent / 'main.py'
+    kwargs = {'creationflags': subprocess.CREATE_NEW_PROCESS_GROUP} if sys.platform == 'win32' else {'start_new_session': True}
+    logger.info("未发现运行中的采集服务，正在启动...")
+    env = dict(os.environ, **{AUTHKEY_ENV: _authkey().decode('ascii')})
+    return subprocess.Popen([sys.executable, str(main_script), '--headless', *(extra_args or [])], env=env,
+                            stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, **kwargs)
+
+
+def attach_or_spawn(extra_args: Optional[List[str]] = None) -> Optional[AcquisitionClient]:
+    """连接已有的采集服务，没有则拉起一个再连接"""
+    client = AcquisitionClient()
+    if client.connect(timeout=0):
+        return client
+    spawn_service(extra_args)
+    return client if client.connect() else None
@@ -0,0 +1,68 @@
+"""
+报警状态存储模块
+按 (报警类型, 参数, 等级) 索引抑制状态：每个键只保留最近 max_count_per_hour 次报警的时间戳，
+最小间隔和每小时上限都只需比较队首/队尾，单次判断与累计报警数无关。
+近期报警保存在有界队列中，统计随每次报警增量更新；完整历史和确认状态以数据库为准。
+"""
+import time
+from collections import deque
+from typing import Deque, Dict, Hashable, List, Optional
+from ..config.settings import ALARM_CONFIG
+
+
+class AlarmStateStore:
+    """非线程安全，由 AlarmSystem 在自身的锁内调用；报警时间戳应大致单调递增"""
+    def __init__(self, min_interval: Optional[float] = None, max_count: Optional[int] = None,
+                 rate_window: Optional[float] = None, history_size: Optional[int] = None):
+        self.min_interval = ALARM_CONFIG['min_interval'] if min_interval is None else min_interval
+        self.max_count = max(1, ALARM_CONFIG['max_count_per_hour'] if max_count is None else max_count)
+        self.rate_window = ALARM_CONFIG['rate_window'] if rate_window is None else rate_window
+        self.recent: Deque = deque(maxlen=history_size or ALARM_CONFIG['history_size'])
+        self._windows: Dict[Hashable, Deque[float]] = {}
+        self._day = None
+        self.stats = {'total_alarms': 0, 'alarms_today': 0, 'last_alarm_time': None, 'suppressed': 0, 'by_level': {}}
+
+    def is_suppressed(self, key: Hashable, timestamp: float) -> bool:
+        window = self._windows.get(key)
+        if not window:
+            return False
+        if timestamp - window[-1] < self.min_interval:
+            return True
+        # 队列只保留最近 max_count 次报警：队满且最早一次仍在窗口内，说明窗口内已达上限
+        return len(window) >= self.max_count and timestamp - window[0] < self.rate_window
+
+    def check(self, key: Hashable, timestamp: float) -> bool:
+        """判断是否抑制，被抑制时计入统计"""
+        if self.is_suppressed(key, timestamp):
+            self.stats['suppressed'] += 1
+            return True
+        return False
+
+    def record(self, key: Hashable, event):
+        """登记一条通过抑制规则的报警"""
+        window = self._windows.get(key)
+        if window is None:
+            window = self._windows[key] = deque(maxlen=self.max_count)
+        window.append(event.timestamp)
+        self.recent.append(event)
+        stats = self.stats
+        day = time.localtime(event.timestamp)[:3]
+        if day != self._day:
+            self._day = day
+            stats['alarms_today'] = 0
+        stats['total_alarms'] += 1
+        stats['alarms_today'] += 1
+        stats['last_alarm_time'] = event.timestamp
+        level = event.alarm_level.value
+        stats['by_level'][level] = stats['by_level'].get(level, 0) + 1
+
+    def recent_events(self, limit: Optional[int] = None) -> List:
+        events = list(self.recent)
+        return events if limit is None else events[-limit:]
+
+    def mark_acknowledged(self, alarm_ids=None):
+        """同步内存中近期报警的确认状态，alarm_ids 为 None 时全部标记"""
+        ids = None if alarm_ids is None else set(alarm_ids)
+        for event in self.recent:
+            if ids is None or event.id in ids:
+                event.acknowledged = True
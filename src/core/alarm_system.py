@@ -2,14 +2,22 @@
 智能报警系统模块
 负责检测异常并触发相应的报警机制
 """
+import math
 import time
 import threading
-from typing import Dict, List, Optional, Callable
+from typing import Dict, List, Optional, Callable, Sequence, Tuple
+import numpy as np
 from dataclasses import dataclass
 from enum import Enum
 from loguru import logger
-from ..config.settings import ALARM_THRESHOLDS
-from ..utils.database import DatabaseManager
+from ..config.settings import ALARM_CONFIG, ALARM_THRESHOLDS
+from ..utils.database import get_database_manager
+from ..utils.ring_buffer import SENSOR_FIELDS, TIMESTAMP_ROW as TIMESTAMP_INDEX
+from ..utils.metrics import get_metrics
+from ..utils.profiler import get_tracer
+from .alarm_store import AlarmStateStore
+from .rule_engine import CompiledRuleEngine, LEVEL_NORMAL
+from .stream_detector import StreamAnomalyDetector, Detection
 
 
 class AlarmLevel(Enum):
@@ -18,6 +26,9 @@ class AlarmLevel(Enum):
     DANGER = "danger"
 
 
+LEVEL_BY_CODE = (AlarmLevel.NORMAL, AlarmLevel.WARNING, AlarmLevel.DANGER)
+
+
 class AlarmType(Enum):
     THRESHOLD = "threshold"
     TREND = "trend"
@@ -25,7 +36,7 @@ class AlarmType(Enum):
     SYSTEM = "system"
 
 
-@dataclass
+@dataclass(slots=True)
 class AlarmEvent:
     id: Optional[int]
     alarm_type: AlarmType
@@ -36,8 +47,12 @@ class AlarmEvent:
     message: str
     timestamp: float
     acknowledged: bool = False
+    device_id: Optional[str] = None
+    def as_row(self) -> tuple:
+        """alarm_records 插入所需的行元组"""
+        return (self.alarm_type.value, self.alarm_level.value, self.parameter_name, self.parameter_value, self.threshold_value, self.message, self.timestamp, self.acknowledged)
     def to_dict(self) -> Dict:
-        return {'id': self.id, 'alarm_type': self.alarm_type.value, 'alarm_level': self.alarm_level.value, 'parameter_name': self.parameter_name, 'parameter_value': self.parameter_value, 'threshold_value': self.threshold_value, 'message': self.message, 'timestamp': self.timestamp, 'acknowledged': self.acknowledged}
+        return {'id': self.id, 'alarm_type': self.alarm_type.value, 'alarm_level': self.alarm_level.value, 'parameter_name': self.parameter_name, 'parameter_value': self.parameter_value, 'threshold_value': self.threshold_value, 'message': self.message, 'timestamp': self.timestamp, 'acknowledged': self.acknowledged, 'device_id': self.device_id}
 
 
 class AlarmRule:
@@ -56,15 +71,29 @@ class AlarmRule:
 
 
 class AlarmSystem:
-    def __init__(self):
-        self.db_manager = DatabaseManager()
+    """device_id 不为空时为单个设备的独立报警状态（阈值、流式检测、抑制计数互不影响），报警消息带设备前缀"""
+    def __init__(self, device_id: Optional[str] = None):
+        self.device_id = device_id
+        self.db_manager = get_database_manager()
         self.alarm_rules = self._init_alarm_rules()
+        self.rule_engine = CompiledRuleEngine(ALARM_THRESHOLDS)
+        self.stream_detector = StreamAnomalyDetector(self.rule_engine.parameters)
         self.active_alarms: Dict[str, AlarmEvent] = {}
-        self.alarm_history: List[AlarmEvent] = []
         self.alarm_callbacks: List[Callable] = []
-        self.alarm_suppression = {'min_interval': 60, 'max_count_per_hour': 10}
-        self.alarm_stats = {'total_alarms': 0, 'alarms_today': 0, 'last_alarm_time': None}
+        self.alarm_suppression = {'min_interval': ALARM_CONFIG['min_interval'], 'max_count_per_hour': ALARM_CONFIG['max_count_per_hour']}
+        self.store = AlarmStateStore(self.alarm_suppression['min_interval'], self.alarm_suppression['max_count_per_hour'])
+        # 近期报警（有界）和增量统计由状态存储维护；更早的记录通过 get_alarm_records 从数据库查询
+        self.alarm_history = self.store.recent
+        self.alarm_stats = self.store.stats
         self.lock = threading.Lock()
+        metrics = get_metrics()
+        device = device_id or 'default'
+        self._check_seconds = metrics.histogram('stage_seconds', '各处理阶段单批耗时（秒）', {'stage': 'alarm'})
+        self._alarm_counters = {level: metrics.counter('alarms_total', '已触发的报警数', {'device': device, 'level': level.value})
+                                for level in AlarmLevel}
+        self._tracer = get_tracer()
+        self._suppressed = metrics.counter('alarms_suppressed_total', '被抑制规则过滤的报警数', {'device': device})
+        metrics.gauge('active_alarms', '当前处于报警状态的参数数', {'device': device}, fn=lambda: len(self.active_alarms))
 
     def _init_alarm_rules(self) -> Dict[str, AlarmRule]:
         rules = {}
@@ -72,4 +101,132 @@ class AlarmSystem:
             rules[param] = AlarmRule(param, thresholds)
         return rules
 
-    # ...其余实现省略
+    def add_alarm_callback(self, callback: Callable):
+        self.alarm_callbacks.append(callback)
+
+    def check_sensor_data(self, sensor_data) -> List[AlarmEvent]:
+        """
+        检查一个样本。sensor_data 可以是 SensorData 行元组（按 SENSOR_FIELDS 顺序）或字典，
+        内部作为单行批次交给 check_sensor_batch。
+        """
+        if isinstance(sensor_data, dict):
+            row = [sensor_data.get(name, math.nan) for name in SENSOR_FIELDS]
+            row = [math.nan if v is None else v for v in row]
+        else:
+            row = sensor_data
+        _, events = self.check_sensor_batch([row])
+        return events
+
+    def check_sensor_batch(self, rows) -> Tuple[np.ndarray, List[AlarmEvent]]:
+        """
+        批量检查 (N, len(SENSOR_FIELDS)) 的样本矩阵，一次向量化评估全部参数。
+        返回 (N, M) 等级矩阵（0/1/2 对应 NORMAL/WARNING/DANGER，列顺序见 rule_engine.parameters）和通过抑制规则的报警事件。
+        """
+        started = time.perf_counter()
+        rows = np.asarray(rows, dtype=np.float64)
+        if rows.ndim == 1:
+            rows = rows.reshape(1, -1)
+        values, levels = self.rule_engine.evaluate_rows(rows)
+        events = []
+        if not len(rows):
+            return levels, events
+        parameters = self.rule_engine.parameters
+        sample_idx, param_idx = self.rule_engine.alarm_positions(levels)
+        if len(sample_idx):
+            now = time.time()
+            times = rows[sample_idx, TIMESTAMP_INDEX].tolist()
+            for i, j, timestamp in zip(sample_idx.tolist(), param_idx.tolist(), times):
+                code = int(levels[i, j])
+                level = LEVEL_BY_CODE[code]
+                parameter = parameters[j]
+                timestamp = timestamp if timestamp == timestamp and timestamp else now
+                # 持续越限时绝大多数单元格会被抑制，先判断抑制再构造事件和消息
+                if self._is_suppressed((AlarmType.THRESHOLD, parameter, level), timestamp):
+                    continue
+                value = float(values[i, j])
+                threshold = float(self.rule_engine.level_thresholds[j, code])
+                event = AlarmEvent(None, AlarmType.THRESHOLD, level, parameter, value, threshold,
+                                   f"{parameter} 超出{level.value}阈值: {value:.2f} (阈值 {threshold:g})", timestamp)
+                if self._raise_alarm(event):
+                    events.append(event)
+        for detection in self.stream_detector.update_batch(rows.tolist()):
+            event = self._detection_to_event(detection)
+            if self._raise_alarm(event):
+                events.append(event)
+        for j in np.flatnonzero(levels[-1] == LEVEL_NORMAL).tolist():
+            self.active_alarms.pop(parameters[j], None)
+        self._check_seconds.observe(time.perf_counter() - started)
+        if self._tracer.enabled:
+            self._tracer.mark('alarm', rows[:, TIMESTAMP_INDEX])
+        return levels, events
+
+    def _detection_to_event(self, d: Detection) -> AlarmEvent:
+        if d.kind == 'anomaly':
+            return AlarmEvent(None, AlarmType.ANOMALY, AlarmLevel.WARNING, d.parameter, d.value, d.threshold,
+                              f"{d.parameter} 出现异常值: {d.value:.2f} (z={d.score:+.1f})", d.timestamp)
+        if d.kind == 'trend':
+            return AlarmEvent(None, AlarmType.TREND, AlarmLevel.WARNING, d.parameter, d.value, d.threshold,
+                              f"{d.parameter} 变化过快: {d.score:+.2f}/分钟 (阈值 ±{d.threshold:g})", d.timestamp)
+        return AlarmEvent(None, AlarmType.TREND, AlarmLevel.WARNING, d.parameter, d.value, d.threshold,
+                          f"{d.parameter} 检测到持续{'上升' if d.score > 0 else '下降'}漂移 (CUSUM={abs(d.score):.1f})", d.timestamp)
+
+    def trigger_system_alarm(self, message: str, level: AlarmLevel = AlarmLevel.WARNING) -> Optional[AlarmEvent]:
+        event = AlarmEvent(None, AlarmType.SYSTEM, level, 'system', 0.0, 0.0, message, time.time())
+        return event if self._raise_alarm(event) else None
+
+    def test_alarm_system(self):
+        logger.info(f"报警系统自检: 已加载 {len(self.alarm_rules)} 条阈值规则")
+
+    def get_recent_alarms(self, limit: Optional[int] = None) -> List[AlarmEvent]:
+        with self.lock:
+            return self.store.recent_events(limit)
+
+    def get_alarm_records(self, **filters) -> List[Dict]:
+        """从数据库查询本设备的报警记录，参数见 DatabaseManager.get_alarm_records"""
+        if self.device_id is not None:
+            filters.setdefault('device_id', self.device_id)
+        return self.db_manager.get_alarm_records(**filters)
+
+    def acknowledge_alarms(self, alarm_ids: Optional[Sequence[int]] = None) -> int:
+        """确认报警（alarm_ids 为 None 时确认本设备全部未确认报警），返回数据库中更新的条数"""
+        count = self.db_manager.acknowledge_alarms(alarm_ids, self.device_id)
+        with self.lock:
+            self.store.mark_acknowledged(alarm_ids)
+        return count
+
+    def _is_suppressed(self, key, timestamp: float) -> bool:
+        """构造事件之前的抑制判断，被抑制时计数；通过的报警在 _raise_alarm 中加锁复查并登记"""
+        with self.lock:
+            if not self.store.check(key, timestamp):
+                return False
+        self._suppressed.inc()
+        return True
+
+    def _raise_alarm(self, event: AlarmEvent) -> bool:
+        if self.device_id is not None:
+            event.message = f"[{self.device_id}] {event.message}"
+            event.device_id = self.device_id
+        key = (event.alarm_type, event.parameter_name, event.alarm_level)
+        with self.lock:
+            if self.store.check(key, event.timestamp):
+                self._suppressed.inc()
+                return False
+            self.store.record(key, event)
+            self.active_alarms[event.parameter_name] = event
+        self._alarm_counters[event.alarm_level].inc()
+        event.id = self.db_manager.queue_alarm_record(event.as_row(), self.device_id)
+        for cb in self.alarm_callbacks:
+            try:
+                cb(event)
+            except Exception as e:
+                logger.error(f"报警回调执行失败: {e}")
+        return True
+
+
+_alarm_system_instance = None
+
+def get_alarm_system() -> AlarmSystem:
+    global _alarm_system_instance
+    if _alarm_system_instance is None:
+        _alarm_system_instance = AlarmSystem()
+    return _alarm_system_instance
@@ -0,0 +1,158 @@
+"""
+AI分析结果缓存模块
+按量化后的输入特征指纹缓存分析结果，合并并发的相同请求，可选持久化到 ai_analysis 表
+"""
+import json
+import math
+import time
+import asyncio
+import hashlib
+from collections import OrderedDict
+from dataclasses import asdict
+from typing import Awaitable, Callable, Dict, Optional, Sequence
+from loguru import logger
+from ..config.settings import ANALYSIS_CACHE_CONFIG
+
+CACHE_MARKER = 'cache_fingerprint'
+
+
+def _quantize(value: float, step: float) -> int:
+    return int(math.floor(value / step + 0.5))
+
+
+def _count_bucket(count: int) -> int:
+    """计数按对数分桶：0, 1, 2-3, 4-7, ..."""
+    return int(count).bit_length()
+
+
+class AnalysisCache:
+    def __init__(self, config: Optional[Dict] = None, db_manager=None):
+        cfg = dict(ANALYSIS_CACHE_CONFIG, **(config or {}))
+        self.ttl = cfg['ttl']
+        self.max_entries = cfg['max_entries']
+        self.persist = cfg['persist']
+        self.steps = cfg['quantization']
+        self._db_manager = db_manager
+        self._entries: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self._loaded = not self.persist
+        self.stats = {'hits': 0, 'misses': 0, 'deduplicated': 0, 'evictions': 0, 'expired': 0,
+                      'compute_time_total': 0.0, 'saved_latency': 0.0}
+
+    @property
+    def db_manager(self):
+        if self._db_manager is None:
+            from ..utils.database import get_database_manager
+            self._db_manager = get_database_manager()
+        return self._db_manager
+
+    def fingerprint(self, analysis_type: str, current_data: Sequence[float], summary: Dict) -> str:
+        """对当前值和窗口统计量按 quantization 步长量化后取哈希，近似相同的状态得到相同指纹"""
+        parts = [analysis_type]
+        channels = summary.get('channels', {})
+        for index, name in enumerate(('pressure', 'temperature', 'vibration')):
+            step = self.steps.get(name, 1.0)
+            parts.append(_quantize(current_data[index], step))
+            ch = channels.get(name)
+            if not ch:
+                continue
+            parts.extend(_quantize(ch[k], step) for k in ('mean', 'min', 'max', 'p95') if k in ch)
+            parts.append(_quantize(ch.get('slope_per_min', 0.0), step / 10))
+            parts.extend(_count_bucket(ch.get(k, 0)) for k in ('warning_crossings', 'danger_crossings', 'anomaly_count'))
+        return hashlib.sha1(json.dumps(parts).encode('utf-8')).hexdigest()
+
+    def get(self, key: str):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        result, stored_at = entry
+        if time.time() - stored_at > self.ttl:
+            del self._entries[key]
+            self.stats['expired'] += 1
+            return None
+        self._entries.move_to_end(key)
+        return result
+
+    def put(self, key: str, result, stored_at: Optional[float] = None):
+        self._entries[key] = (result, stored_at or time.time())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats['evictions'] += 1
+
+    async def get_or_compute(self, key: str, compute: Callable[[], Awaitable]):
+        """命中缓存直接返回；同一指纹已有请求在途时等待其结果，否则调用 compute 并缓存非空结果"""
+        if not self._loaded:
+            await asyncio.to_thread(self._load_persisted)
+        cached = self.get(key)
+        if cached is not None:
+            self.stats['hits'] += 1
+            self.stats['saved_latency'] += self.average_compute_time
+            return cached
+        pending = self._in_flight.get(key)
+        if pending is not None:
+            self.stats['deduplicated'] += 1
+            result = await asyncio.shield(pending)
+            self.stats['saved_latency'] += self.average_compute_time
+            return result
+        self.stats['misses'] += 1
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        start = time.perf_counter()
+        try:
+            result = await compute()
+            self.stats['compute_time_total'] += time.perf_counter() - start
+            if result is not None:
+                self.put(key, result)
+                if self.persist:
+                    await asyncio.to_thread(self._persist, key, result)
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # 标记异常已被读取，避免无人等待时产生告警
+            raise
+        finally:
+            self._in_flight.pop(key, None)
+
+    @property
+    def average_compute_time(self) -> float:
+        return self.stats['compute_time_total'] / self.stats['misses'] if self.stats['misses'] else 0.0
+
+    def get_stats(self) -> Dict:
+        lookups = self.stats['hits'] + self.stats['misses'] + self.stats['deduplicated']
+        return dict(self.stats, entries=len(self._entries), in_flight=len(self._in_flight),
+                    hit_rate=(self.stats['hits'] + self.stats['deduplicated']) / lookups if lookups else 0.0)
+
+    def _persist(self, key: str, result):
+        try:
+            with self.db_manager.get_connection() as conn:
+                conn.execute('''
+                    INSERT INTO ai_analysis (analysis_type, input_data, result, confidence, timestamp)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', (result.analysis_type, json.dumps({CACHE_MARKER: key}), json.dumps(asdict(result), ensure_ascii=False),
+                      result.confidence, result.timestamp))
+                conn.commit()
+        except Exception as e:
+            logger.error(f"持久化AI分析缓存失败: {e}")
+
+    def _load_persisted(self):
+        from .deepseek_ai import AnalysisResult
+        self._loaded = True
+        try:
+            with self.db_manager.get_read_connection() as conn:
+                rows = conn.execute('''
+                    SELECT input_data, result, timestamp FROM ai_analysis
+                    WHERE timestamp >= ? AND input_data LIKE ? ORDER BY timestamp
+                ''', (time.time() - self.ttl, f'%{CACHE_MARKER}%')).fetchall()
+            for row in rows:
+                key = json.loads(row['input_data']).get(CACHE_MARKER)
+                if key:
+                    self.put(key, AnalysisResult(**json.loads(row['result'])), row['timestamp'])
+            if rows:
+                logger.info(f"已从数据库恢复 {len(self._entries)} 条AI分析缓存")
+        except Exception as e:
+            logger.error(f"加载AI分析缓存失败: {e}")
@@ -0,0 +1,174 @@
+"""
+异步运行时模块
+在后台线程中运行 asyncio 事件循环，供同步代码线程安全地提交 AI 分析等异步任务
+"""
+import time
+import asyncio
+import threading
+import concurrent.futures
+from typing import Awaitable, Callable, Dict, Optional
+from loguru import logger
+from ..config.settings import AI_SCHEDULER_CONFIG
+
+
+class AsyncLoopThread:
+    """拥有独立事件循环和共享 aiohttp.ClientSession 的后台线程"""
+    def __init__(self, name: str = 'async-loop'):
+        self.name = name
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.thread: Optional[threading.Thread] = None
+        self.session = None
+        self._ready = threading.Event()
+
+    @property
+    def is_running(self) -> bool:
+        return self.loop is not None and self.loop.is_running()
+
+    def start(self, timeout: float = 5.0) -> bool:
+        if self.is_running:
+            return True
+        self._ready.clear()
+        self.thread = threading.Thread(target=self._run, name=self.name)
+        self.thread.daemon = True
+        self.thread.start()
+        if not self._ready.wait(timeout):
+            logger.error("异步事件循环线程启动超时")
+            return False
+        try:
+            self.session = self.submit(self._open_session()).result(timeout)
+        except Exception as e:
+            logger.error(f"创建HTTP会话失败: {e}")
+        logger.info("异步事件循环线程已启动")
+        return True
+
+    def _run(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.loop.call_soon(self._ready.set)
+        try:
+            self.loop.run_forever()
+        finally:
+            self.loop.close()
+
+    async def _open_session(self):
+        import aiohttp
+        return aiohttp.ClientSession()
+
+    def submit(self, coro: Awaitable) -> concurrent.futures.Future:
+        """从任意线程提交协程，返回 concurrent.futures.Future"""
+        if self.loop is None:
+            raise RuntimeError("异步事件循环未启动")
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def call_soon(self, callback: Callable, *args):
+        if self.loop is None:
+            raise RuntimeError("异步事件循环未启动")
+        self.loop.call_soon_threadsafe(callback, *args)
+
+    def stop(self, timeout: float = 5.0):
+        if not self.is_running:
+            return
+        try:
+            self.submit(self._shutdown()).result(timeout)
+        except Exception as e:
+            logger.error(f"关闭异步任务时发生错误: {e}")
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        if self.thread:
+            self.thread.join(timeout=timeout)
+        self.loop = None
+        logger.info("异步事件循环线程已停止")
+
+    async def _shutdown(self):
+        current = asyncio.current_task()
+        tasks = [t for t in asyncio.all_tasks() if t is not current]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+
+class AIJobScheduler:
+    """
+    AI 分析任务调度器。
+    同一 key 的任务在等待执行期间会被合并为最新一次提交；同一 key 在执行中或距上次启动
+    不足 min_interval 秒时新的提交会被跳过；并发数受 max_in_flight 限制，单个任务超时取消。
+    """
+    def __init__(self, runtime: AsyncLoopThread, config: Optional[Dict] = None):
+        cfg = dict(AI_SCHEDULER_CONFIG, **(config or {}))
+        self.runtime = runtime
+        self.max_in_flight = cfg['max_in_flight']
+        self.timeout = cfg['timeout']
+        self.min_interval = cfg['min_interval']
+        self._lock = threading.Lock()
+        self._pending: Dict[str, Callable[[], Awaitable]] = {}
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self._last_start: Dict[str, float] = {}
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._stopped = False
+        self.stats = {'submitted': 0, 'started': 0, 'completed': 0, 'coalesced': 0, 'throttled': 0, 'busy': 0,
+                      'timeouts': 0, 'failed': 0, 'cancelled': 0}
+
+    def submit(self, key: str, factory: Callable[[], Awaitable]) -> bool:
+        """线程安全；factory 在事件循环中被调用并返回要执行的协程"""
+        now = time.monotonic()
+        with self._lock:
+            if self._stopped or not self.runtime.is_running:
+                return False
+            self.stats['submitted'] += 1
+            if key in self._pending:
+                self._pending[key] = factory
+                self.stats['coalesced'] += 1
+                return True
+            if key in self._in_flight:
+                self.stats['busy'] += 1
+                return False
+            if now - self._last_start.get(key, float('-inf')) < self.min_interval:
+                self.stats['throttled'] += 1
+                return False
+            self._pending[key] = factory
+            self._last_start[key] = now
+        self.runtime.call_soon(self._spawn, key)
+        return True
+
+    def _spawn(self, key: str):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        task = asyncio.get_running_loop().create_task(self._run_job(key))
+        with self._lock:
+            self._in_flight[key] = task
+
+    async def _run_job(self, key: str):
+        try:
+            async with self._semaphore:
+                with self._lock:
+                    factory = self._pending.pop(key, None)
+                    self._last_start[key] = time.monotonic()
+                if factory is None:
+                    return
+                self.stats['started'] += 1
+                await asyncio.wait_for(factory(), timeout=self.timeout)
+                self.stats['completed'] += 1
+        except asyncio.TimeoutError:
+            self.stats['timeouts'] += 1
+            logger.warning(f"AI任务 {key} 超时 ({self.timeout}s)，已取消")
+        except asyncio.CancelledError:
+            self.stats['cancelled'] += 1
+            raise
+        except Exception as e:
+            self.stats['failed'] += 1
+            logger.error(f"AI任务 {key} 执行失败: {e}")
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+                self._in_flight.pop(key, None)
+
+    def cancel_all(self):
+        with self._lock:
+            self._stopped = True
+            tasks = list(self._in_flight.values())
+            self._pending.clear()
+        if self.runtime.is_running:
+            for task in tasks:
+                self.runtime.call_soon(task.cancel)
@@ -0,0 +1,262 @@
+"""
+多设备采集管理模块
+同时采集多个设备（串口或本地 TCP/UDP 替身），每个设备拥有独立的帧解析器、环形缓冲区和报警状态。
+所有设备按固定数量的读线程分片：每个读线程用 selectors 等待自己负责的设备（不支持 select 的串口退化为轮询），
+而不是每个端口占用一个线程；解出的样本附带设备ID写入数据库并发布到事件总线。
+"""
+import time
+import selectors
+import threading
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional
+import numpy as np
+from loguru import logger
+
+from .transports import Transport, open_transport
+from .frame_protocol import FrameParser
+from .event_bus import EventBus, Subscription
+from .alarm_system import AlarmSystem
+from .data_collector import SensorData
+from ..utils.database import get_database_manager
+from ..utils.ring_buffer import SensorRingBuffer, SENSOR_FIELDS, TIMESTAMP_ROW
+from ..utils.metrics import get_metrics
+from ..utils.profiler import get_tracer
+from ..config.settings import DEVICES_CONFIG, STM32_CONFIG
+
+
+class DeviceBatch(NamedTuple):
+    """一个设备一次读取解出的样本，rows 形状为 (n, 4)"""
+    device_id: str
+    rows: np.ndarray
+
+
+def _unpack_device_batch(batch: DeviceBatch) -> Iterable[tuple]:
+    """逐条订阅者收到 (device_id, SensorData)"""
+    return [(batch.device_id, SensorData._make(row)) for row in batch.rows.tolist()]
+
+
+class DeviceChannel:
+    """单个设备的采集状态；poll() 只会被负责该设备的读线程调用"""
+    def __init__(self, device_id: str, transport: Transport, protocol: str, buffer_size: int, db_manager, event_bus: EventBus,
+                 buffer_factory: Optional[Callable[[str, int], SensorRingBuffer]] = None):
+        self.device_id = device_id
+        self.transport = transport
+        self.parser = FrameParser(STM32_CONFIG['parser_buffer'], protocol)
+        self.buffer = buffer_factory(device_id, buffer_size) if buffer_factory else SensorRingBuffer(buffer_size)
+        self.alarm_system = AlarmSystem(device_id)
+        self.db_manager = db_manager
+        self.event_bus = event_bus
+        self.is_connected = False
+        self.next_retry = 0.0
+        self.stats = {'reads': 0, 'samples': 0, 'batches': 0, 'read_errors': 0, 'reconnects': 0, 'last_update': None}
+        metrics = get_metrics()
+        labels = {'device': device_id}
+        self._read_bytes = metrics.counter('device_read_bytes_total', '设备读取的字节数', labels)
+        self._samples = metrics.counter('device_samples_total', '设备解出的样本数', labels)
+        self._parse_seconds = metrics.histogram('stage_seconds', '各处理阶段单批耗时（秒）', {'stage': 'parse'})
+        self._buffer_seconds = metrics.histogram('stage_seconds', '各处理阶段单批耗时（秒）', {'stage': 'buffer'})
+        self._tracer = get_tracer()
+        metrics.gauge('device_connected', '设备是否已连接', labels, fn=lambda: self.is_connected)
+        metrics.gauge('buffer_fill', '环形缓冲区中的样本数', labels, fn=lambda: len(self.buffer))
+        metrics.gauge('parser_crc_errors', 'CRC 校验失败的帧数', labels, fn=lambda: self.parser.stats['crc_errors'])
+        metrics.gauge('parser_lost_frames', '按序号推算的丢帧数', labels, fn=lambda: self.parser.stats['lost_frames'])
+
+    def open(self) -> bool:
+        try:
+            self.transport.open()
+            self.parser.reset()
+            self.is_connected = True
+            logger.info(f"设备 {self.device_id} 已连接: {self.transport.uri}")
+            return True
+        except Exception as e:
+            self.is_connected = False
+            self.next_retry = time.monotonic() + DEVICES_CONFIG['reconnect_interval']
+            logger.error(f"设备 {self.device_id} 连接失败 ({self.transport.uri}): {e}")
+            return False
+
+    def close(self):
+        try:
+            self.transport.close()
+        except Exception as e:
+            logger.error(f"关闭设备 {self.device_id} 失败: {e}")
+        self.is_connected = False
+
+    def poll(self, read_chunk: int) -> int:
+        """读取并处理已到达的全部数据，返回本次读到的字节数；连接断开时关闭并安排重连"""
+        total = 0
+        try:
+            while chunk := self.transport.read_available(read_chunk):
+                total += len(chunk)
+                self.stats['reads'] += 1
+                self._read_bytes.inc(len(chunk))
+                started = time.perf_counter()
+                rows = self.parser.feed(chunk)
+                self._parse_seconds.observe(time.perf_counter() - started)
+                if self._tracer.enabled:
+                    self._tracer.mark('parse', rows[:, TIMESTAMP_ROW])
+                self._handle_samples(rows)
+                if len(chunk) < read_chunk:
+                    break
+        except ConnectionError as e:
+            self.stats['read_errors'] += 1
+            logger.error(f"设备 {self.device_id} 读取失败，稍后重连: {e}")
+            self.close()
+            self.next_retry = time.monotonic() + DEVICES_CONFIG['reconnect_interval']
+        return total
+
+    def _handle_samples(self, rows: np.ndarray):
+        if not len(rows):
+            return
+        started = time.perf_counter()
+        self.buffer.extend(rows)
+        self._buffer_seconds.observe(time.perf_counter() - started)
+        if self._tracer.enabled:
+            self._tracer.mark('buffer', rows[:, TIMESTAMP_ROW])
+        self._samples.inc(len(rows))
+        self.stats['samples'] += len(rows)
+        self.stats['batches'] += 1
+        self.stats['last_update'] = float(rows[-1, TIMESTAMP_ROW])
+        self.db_manager.queue_sensor_rows(rows.tolist(), self.device_id)
+        if self._tracer.enabled:
+            self._tracer.mark('db_queue', rows[:, TIMESTAMP_ROW])
+        self.event_bus.publish_batch(DeviceBatch(self.device_id, rows))
+
+    def get_stats(self) -> Dict:
+        return dict(self.stats, **self.parser.get_stats(), uri=self.transport.uri, connected=self.is_connected)
+
+
+class CollectorManager:
+    def __init__(self, devices: Optional[List[Dict]] = None, reader_threads: Optional[int] = None,
+                 buffer_factory: Optional[Callable[[str, int], SensorRingBuffer]] = None):
+        """
+        devices 为 [{'id', 'uri', 'protocol'}]，缺省取 DEVICES_CONFIG['devices']；
+        buffer_factory(device_id, capacity) 用于替换默认的进程内缓冲区
+        """
+        devices = DEVICES_CONFIG['devices'] if devices is None else devices
+        self.db_manager = get_database_manager()
+        self.event_bus = EventBus('devices', unpack=_unpack_device_batch)
+        self.channels: Dict[str, DeviceChannel] = {}
+        for device in devices:
+            device_id = device['id']
+            if device_id in self.channels:
+                raise ValueError(f"设备ID重复: {device_id}")
+            self.channels[device_id] = DeviceChannel(
+                device_id, open_transport(device['uri']), device.get('protocol', STM32_CONFIG['protocol']),
+                device.get('buffer_size', DEVICES_CONFIG['buffer_size']), self.db_manager, self.event_bus, buffer_factory)
+        self.reader_threads = max(1, min(reader_threads or DEVICES_CONFIG['reader_threads'], len(self.channels) or 1))
+        self.poll_interval = DEVICES_CONFIG['poll_interval']
+        self.read_chunk = DEVICES_CONFIG['read_chunk']
+        self.threads: List[threading.Thread] = []
+        self.is_running = False
+        self._owns_writer = False
+        self._alarm_subscription: Optional[Subscription] = None
+
+    def start(self) -> bool:
+        if self.is_running:
+            return True
+        if not self.channels:
+            logger.warning("未配置任何采集设备")
+            return False
+        for channel in self.channels.values():
+            channel.open()
+        # 写入线程可能已由单设备采集器启动，只负责停止自己启动的
+        writer = self.db_manager.sensor_writer
+        self._owns_writer = not (writer and writer.is_running)
+        self.db_manager.start_sensor_writer()
+        # 报警检查在总线订阅线程中进行，不占用读线程；队列满时反压读线程，不丢弃批次
+        self._alarm_subscription = self.event_bus.subscribe(self._check_alarms, name='device_alarm_check', maxsize=10000,
+                                                         policy='wait', batch=True)
+        self.event_bus.start()
+        self.is_running = True
+        channels = list(self.channels.values())
+        for index in range(self.reader_threads):
+            shard = channels[index::self.reader_threads]
+            thread = threading.Thread(target=self._reader_loop, args=(shard,), name=f'DeviceReader-{index}')
+            thread.daemon = True
+            thread.start()
+            self.threads.append(thread)
+        logger.info(f"多设备采集已启动: {len(channels)} 个设备, {self.reader_threads} 个读线程")
+        return True
+
+    def stop(self, timeout: float = 2.0):
+        self.is_running = False
+        for thread in self.threads:
+            thread.join(timeout=timeout)
+        self.threads = []
+        for channel in self.channels.values():
+            channel.close()
+        self.event_bus.stop()
+        if self._alarm_subscription is not None:
+            self.event_bus.unsubscribe(self._alarm_subscription)
+            self._alarm_subscription = None
+        if self._owns_writer:
+            self.db_manager.stop_sensor_writer()
+        logger.info("多设备采集已停止")
+
+    def _reader_loop(self, shard: List[DeviceChannel]):
+        """等待可读的设备并处理；不支持 select 的设备每 poll_interval 轮询一次，断开的设备按间隔重连"""
+        selector = selectors.DefaultSelector()
+        registered: Dict[DeviceChannel, int] = {}
+        try:
+            while self.is_running:
+                polled = []
+                now = time.monotonic()
+                for channel in shard:
+                    if not channel.is_connected:
+                        if channel in registered:
+                            selector.unregister(registered.pop(channel))
+                        if now >= channel.next_retry and channel.open():
+                            channel.stats['reconnects'] += 1
+                        continue
+                    fd = channel.transport.fileno()
+                    if fd is None:
+                        polled.append(channel)
+                    elif channel not in registered:
+                        selector.register(fd, selectors.EVENT_READ, channel)
+                        registered[channel] = fd
+                if registered:
+                    # 有需要轮询的设备时只短暂等待，否则最多等待 0.1 秒以便及时响应停止和重连
+                    for key, _ in selector.select(self.poll_interval if polled else 0.1):
+                        key.data.poll(self.read_chunk)
+                if polled:
+                    received = sum(channel.poll(self.read_chunk) for channel in polled)
+                    if not received and not registered:
+                        time.sleep(self.poll_interval)
+                elif not registered:
+                    time.sleep(0.1)
+        except Exception as e:
+            logger.exception(f"设备读线程异常退出: {e}")
+        finally:
+            selector.close()
+
+    def _check_alarms(self, batch: DeviceBatch):
+        self.channels[batch.device_id].alarm_system.check_sensor_batch(batch.rows)
+
+    def add_alarm_callback(self, callback: Callable):
+        for channel in self.channels.values():
+            channel.alarm_system.add_alarm_callback(callback)
+
+    def subscribe(self, callback, name: Optional[str] = None, maxsize: Optional[int] = None, policy: Optional[str] = None,
+                  batch: bool = False) -> Subscription:
+        """batch 为 True 时回调参数为 DeviceBatch，否则逐条收到 (device_id, SensorData)"""
+        return self.event_bus.subscribe(callback, name=name, maxsize=maxsize, policy=policy, batch=batch)
+
+    def unsubscribe(self, subscription: Subscription):
+        self.event_bus.unsubscribe(subscription)
+
+    def get_recent_array(self, device_id: str, hours: float = 1) -> np.ndarray:
+        """设备最近 hours 小时数据的 (4, n) 零拷贝列视图"""
+        return self.channels[device_id].buffer.since(time.time() - hours * 3600)
+
+    def get_latest_data(self) -> Dict[str, Dict]:
+        latest = {}
+        for device_id, channel in self.channels.items():
+            row = channel.buffer.last()
+            if row is not None:
+                latest[device_id] = dict(zip(SENSOR_FIELDS, row.tolist()))
+        return latest
+
+    def get_stats(self) -> Dict:
+        devices = {device_id: channel.get_stats() for device_id, channel in self.channels.items()}
+        return {'devices': devices, 'reader_threads': self.reader_threads,
+                'total_samples': sum(d['samples'] for d in devices.values()),
+                'connected': sum(1 for d in devices.values() if d['connected'])}
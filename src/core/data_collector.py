@@ -4,21 +4,27 @@
 """
 import time
 import threading
-from typing import Dict, List, Optional
-from dataclasses import dataclass
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+import numpy as np
 from loguru import logger
 
 from .stm32_comm import STM32Communicator, MockSTM32Communicator
-from ..utils.database import DatabaseManager
-from ..config.settings import STM32_CONFIG, ALARM_THRESHOLDS
+from .event_bus import EventBus, Subscription
+from ..utils.database import get_database_manager
+from ..utils.ring_buffer import SensorRingBuffer, SENSOR_FIELDS, TIMESTAMP_ROW
+from ..utils.metrics import get_metrics
+from ..utils.profiler import get_tracer
+from ..config.settings import STM32_CONFIG, ALARM_THRESHOLDS, COLLECTOR_CONFIG, ROLLUP_CONFIG
 
 
-@dataclass
-class SensorData:
+class SensorData(NamedTuple):
+    """传感器样本；本身即为 (pressure, temperature, vibration, timestamp) 行元组，可直接写库和入缓冲区"""
     pressure: float
     temperature: float
     vibration: float
     timestamp: float
+    def as_row(self) -> tuple:
+        return self
     def to_dict(self) -> Dict:
         return {'pressure': self.pressure, 'temperature': self.temperature, 'vibration': self.vibration, 'timestamp': self.timestamp}
     @classmethod
@@ -26,28 +32,54 @@ class SensorData:
         return cls(pressure=data['pressure'], temperature=data['temperature'], vibration=data['vibration'], timestamp=data['timestamp'])
 
 
+def _unpack_samples(rows) -> List[SensorData]:
+    """把整批样本拆分为 SensorData，供逐条订阅者使用"""
+    return list(map(SensorData._make, np.asarray(rows).tolist()))
+
+
 class DataCollector:
-    def __init__(self, use_mock: bool = False):
+    def __init__(self, use_mock: bool = False, device_id: Optional[str] = None,
+                 buffer_factory: Optional[Callable[[str, int], SensorRingBuffer]] = None):
+        """buffer_factory(device_id, capacity) 用于替换默认的进程内缓冲区，例如共享内存缓冲区"""
         self.use_mock = use_mock
+        self.device_id = device_id or COLLECTOR_CONFIG['device_id']
         self.communicator = MockSTM32Communicator() if use_mock else STM32Communicator()
-        self.db_manager = DatabaseManager()
-        self.data_buffer: List[SensorData] = []
-        self.buffer_lock = threading.Lock()
-        self.max_buffer_size = 1000
+        self.db_manager = get_database_manager()
+        self.max_buffer_size = COLLECTOR_CONFIG['buffer_size']
+        self.data_buffer = buffer_factory(self.device_id, self.max_buffer_size) if buffer_factory \
+            else SensorRingBuffer(self.max_buffer_size)
         self.processing_thread = None
         self.is_processing = False
-        self.subscribers = []
-        self.stats = {'total_samples': 0, 'last_update': None, 'data_rate': 0.0, 'connection_status': False}
-        self.communicator.set_data_callback(self._on_data_received)
+        self.event_bus = EventBus('collector', unpack=_unpack_samples)
+        self.stats = {'total_samples': 0, 'total_batches': 0, 'last_update': None, 'data_rate': 0.0, 'connection_status': False}
+        metrics = get_metrics()
+        labels = {'device': self.device_id}
+        self._samples = metrics.counter('device_samples_total', '设备解出的样本数', labels)
+        self._buffer_seconds = metrics.histogram('stage_seconds', '各处理阶段单批耗时（秒）', {'stage': 'buffer'})
+        metrics.gauge('device_connected', '设备是否已连接', labels, fn=lambda: self.communicator.is_connected)
+        metrics.gauge('device_data_rate', '最近的采样速率（条/秒）', labels, fn=lambda: self.stats['data_rate'])
+        metrics.gauge('buffer_fill', '环形缓冲区中的样本数', labels, fn=lambda: len(self.data_buffer))
+        self._tracer = get_tracer()
+        parser = self.communicator.parser
+        metrics.gauge('parser_crc_errors', 'CRC 校验失败的帧数', labels, fn=lambda: parser.stats['crc_errors'])
+        metrics.gauge('parser_lost_frames', '按序号推算的丢帧数', labels, fn=lambda: parser.stats['lost_frames'])
+        if COLLECTOR_CONFIG['batch_mode'] and hasattr(self.communicator, 'set_batch_callback'):
+            self.communicator.set_batch_callback(self._on_batch_received)
+        else:
+            self.communicator.set_data_callback(self._on_data_received)
 
     def start(self, port: str = None, baudrate: int = None) -> bool:
         try:
             if not self.communicator.connect(port, baudrate):
                 return False
+            self._warm_start_buffer()
+            self.db_manager.start_sensor_writer()
             if not self.communicator.start_receiving():
+                self.db_manager.stop_sensor_writer()
                 return False
+            self.event_bus.start()
             self.is_processing = True
-            self.processing_thread = threading.Thread(target=self._processing_loop)
+            self.processing_thread = threading.Thread(target=self._processing_loop, name='DataProcessing')
             self.processing_thread.daemon = True
             self.processing_thread.start()
             self.stats['connection_status'] = True
@@ -63,13 +95,23 @@ class DataCollector:
             if self.processing_thread and self.processing_thread.is_alive():
                 self.processing_thread.join(timeout=1)
             self.communicator.stop_receiving()
+            self.event_bus.stop()
+            self.db_manager.stop_sensor_writer()
             self.stats['connection_status'] = False
             logger.info("数据采集器已停止")
         except Exception as e:
             logger.error(f"停止失败: {e}")
 
-    def subscribe(self, callback):
-        self.subscribers.append(callback)
+    def subscribe(self, callback, name: Optional[str] = None, maxsize: Optional[int] = None, policy: Optional[str] = None,
+                  batch: bool = False) -> Subscription:
+        """
+        订阅新样本；回调在订阅者自己的工作线程中执行，policy 见 event_bus.OVERFLOW_POLICIES。
+        batch 为 True 时回调参数为 (n, 4) 样本数组（单条接收路径下为 SensorData 列表），否则逐条收到 SensorData。
+        """
+        return self.event_bus.subscribe(callback, name=name, maxsize=maxsize, policy=policy, batch=batch)
+
+    def unsubscribe(self, subscription: Subscription):
+        self.event_bus.unsubscribe(subscription)
 
     def _on_data_received(self, raw_data):
         try:
@@ -77,30 +119,114 @@ class DataCollector:
                 data = SensorData.from_dict(raw_data)
             else:
                 data = SensorData(pressure=raw_data.get('pressure', 0.0), temperature=raw_data.get('temperature', 0.0), vibration=raw_data.get('vibration', 0.0), timestamp=time.time())
-            with self.buffer_lock:
-                self.data_buffer.append(data)
-                if len(self.data_buffer) > self.max_buffer_size:
-                    self.data_buffer.pop(0)
-                self.stats['total_samples'] += 1
-                self.stats['last_update'] = data.timestamp
-            self.db_manager.save_sensor_data(data.to_dict())
-            for cb in self.subscribers:
-                try:
-                    cb(data)
-                except Exception:
-                    pass
+            self.data_buffer.append(data)
+            self._samples.inc()
+            self.stats['total_samples'] += 1
+            self.stats['last_update'] = data.timestamp
+            self.db_manager.queue_sensor_row(data, self.device_id)
+            self.event_bus.publish(data)
+        except Exception as e:
+            logger.bind(log_key=f"collector.sample_error:{self.device_id}").error(f"处理接收数据失败: {e}")
+
+    def _on_batch_received(self, rows: np.ndarray):
+        """批量接收路径：一次串口读取的全部样本整批写入缓冲区、数据库写入队列和订阅者"""
+        try:
+            rows = np.asarray(rows, dtype=np.float64).reshape(-1, len(SENSOR_FIELDS))
+            if not len(rows):
+                return
+            started = time.perf_counter()
+            self.data_buffer.extend(rows)
+            self._buffer_seconds.observe(time.perf_counter() - started)
+            if self._tracer.enabled:
+                self._tracer.mark('buffer', rows[:, TIMESTAMP_ROW])
+            self._samples.inc(len(rows))
+            self.stats['total_samples'] += len(rows)
+            self.stats['total_batches'] += 1
+            self.stats['last_update'] = float(rows[-1, TIMESTAMP_ROW])
+            self.db_manager.queue_sensor_rows(rows.tolist(), self.device_id)
+            if self._tracer.enabled:
+                self._tracer.mark('db_queue', rows[:, TIMESTAMP_ROW])
+            self.event_bus.publish_batch(rows)
         except Exception as e:
-            logger.error(f"处理接收数据失败: {e}")
+            logger.bind(log_key=f"collector.batch_error:{self.device_id}").error(f"处理批量数据失败: {e}")
+
+    def _warm_start_buffer(self):
+        """启动时从数据库加载最近的数据，使缓冲区与已持久化的数据保持一致"""
+        if self.data_buffer.total_count:
+            return
+        since = time.time() - COLLECTOR_CONFIG['warm_start_seconds']
+        rows = [r for r in self.db_manager.get_latest_sensor_data(self.max_buffer_size, self.device_id) if r['timestamp'] >= since]
+        if rows:
+            self.data_buffer.extend([(r['pressure'], r['temperature'], r['vibration'], r['timestamp']) for r in rows])
+            logger.info(f"已从数据库预加载 {len(rows)} 条历史数据")
+
+    def get_recent_window(self, hours: float = 1):
+        """最近 hours 小时数据的零拷贝列视图 (pressure, temperature, vibration, timestamp)"""
+        return self.data_buffer.since(time.time() - hours * 3600)
+
+    def get_recent_array(self, hours: float = 1) -> np.ndarray:
+        """
+        最近 hours 小时原始数据的 (4, n) 列数组；缓冲区覆盖整个窗口时为零拷贝视图，
+        否则较早的部分按列从数据库读取（不构造字典）。
+        """
+        start_time = time.time() - hours * 3600
+        window = self.data_buffer.since(start_time)
+        oldest = self.data_buffer.oldest_timestamp()
+        if oldest is not None and oldest <= start_time:
+            return window
+        older = self._older_columns(start_time, oldest)
+        return np.concatenate([older, window], axis=1) if older.shape[1] else window
+
+    def get_analysis_window(self, hours: float = 1) -> Tuple[np.ndarray, Optional[Dict]]:
+        """
+        AI 分析用的历史窗口，返回 (原始样本 (4, n), 较早部分的 1 分钟汇总或 None)。
+        缓冲区不够长时（1kHz 下默认缓冲区只有约 65 秒），整分钟的较早部分不读原始数据，
+        而是直接返回汇总表的 {'seconds', 'channels': {通道: {timestamp, min, max, avg, count}}}，由 summarize_window 合并
+        （窗口起点不足一分钟的零头舍去）；
+        最后一个整分钟到缓冲区之间的零头按列读取原始数据，读取量与窗口长度基本无关。
+        """
+        start_time = time.time() - hours * 3600
+        window = self.data_buffer.since(start_time)
+        oldest = self.data_buffer.oldest_timestamp()
+        if oldest is not None and oldest <= start_time:
+            return window, None
+        end_time = oldest if oldest is not None else time.time()
+        seconds = ROLLUP_CONFIG['resolutions'].get('1m') if ROLLUP_CONFIG['enabled'] else None
+        rollup = None
+        raw_from = start_time
+        if seconds:
+            # 只取完整落在窗口内的桶，窗口起点不足一分钟的零头舍去
+            first = -(-start_time // seconds) * seconds
+            split = end_time // seconds * seconds
+            if split > first:
+                history = self.db_manager.get_sensor_history(first, split - seconds, resolution='1m', device_id=self.device_id)
+                if history['channels'] and history['channels']['pressure']['timestamp'].size:
+                    rollup = {'seconds': seconds, 'channels': history['channels']}
+                    raw_from = split
+        older = self._older_columns(raw_from, oldest)
+        return (np.concatenate([older, window], axis=1) if older.shape[1] else window), rollup
+
+    def _older_columns(self, start_time: float, oldest: Optional[float]) -> np.ndarray:
+        """缓冲区最早样本之前的原始数据；缓冲区为空时读到当前时间"""
+        older = self.db_manager.get_sensor_columns(start_time, oldest, device_id=self.device_id)
+        if oldest is not None and older.shape[1]:
+            older = older[:, older[TIMESTAMP_ROW] < oldest]
+        return older
 
-    def get_recent_data(self, hours: int = 1) -> List[SensorData]:
-        # 返回最近 hours 小时的数据（简化）
-        return list(self.data_buffer[-(hours * 60):])
+    def get_recent_data(self, hours: float = 1) -> List[SensorData]:
+        return list(map(SensorData._make, self.get_recent_array(hours).T.tolist()))
 
     def _processing_loop(self):
+        """每 0.5 秒按样本计数的增量更新 data_rate（条/秒）"""
+        last_count, last_time = self.stats['total_samples'], time.monotonic()
         while self.is_processing:
             try:
                 time.sleep(0.5)
             except Exception:
                 break
+            count, now = self.stats['total_samples'], time.monotonic()
+            self.stats['data_rate'] = (count - last_count) / (now - last_time)
+            last_count, last_time = count, now
+        self.stats['data_rate'] = 0.0
 
     # ...其余实现省略
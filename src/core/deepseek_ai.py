@@ -5,12 +5,17 @@ DeepSeek AI分析模块
 import json
 import time
 import asyncio
-import aiohttp
-from typing import Dict, List, Optional, Any
+from typing import TYPE_CHECKING, Dict, List, Optional, Any
 from dataclasses import dataclass
 from loguru import logger
-from ..config.settings import DEEPSEEK_CONFIG
+from ..config.settings import DEEPSEEK_CONFIG, ANALYSIS_CACHE_CONFIG
 from ..utils.helpers import RateLimiter
+from ..utils.metrics import get_metrics
+from .feature_extractor import summarize_window, format_summary
+from .analysis_cache import AnalysisCache
+
+if TYPE_CHECKING:
+    import aiohttp
 
 
 @dataclass
@@ -30,7 +35,99 @@ class DeepSeekAnalyzer:
         self.model = DEEPSEEK_CONFIG['model']
         self.max_tokens = DEEPSEEK_CONFIG['max_tokens']
         self.temperature = DEEPSEEK_CONFIG['temperature']
+        self.context_token_budget = DEEPSEEK_CONFIG['context_token_budget']
         self.rate_limiter = RateLimiter(max_calls=20, time_window=60)
+        self.session: Optional['aiohttp.ClientSession'] = None
+        self.cache: Optional[AnalysisCache] = AnalysisCache() if ANALYSIS_CACHE_CONFIG['enabled'] else None
+        metrics = get_metrics()
+        self._request_seconds = metrics.histogram('ai_request_seconds', 'DeepSeek API 请求耗时（秒）')
+        self._requests = {outcome: metrics.counter('ai_requests_total', 'DeepSeek API 请求数', {'outcome': outcome})
+                          for outcome in ('ok', 'error', 'rate_limited')}
+        if self.cache:
+            stats = self.cache.stats
+            metrics.gauge('ai_cache_hits', 'AI分析缓存命中次数（含合并的并发请求）', fn=lambda: stats['hits'] + stats['deduplicated'])
+            metrics.gauge('ai_cache_misses', 'AI分析缓存未命中次数', fn=lambda: stats['misses'])
+            metrics.gauge('ai_cache_saved_seconds', 'AI分析缓存节省的估计耗时（秒）', fn=lambda: stats['saved_latency'])
+
+    def set_session(self, session: Optional['aiohttp.ClientSession']):
+        """使用后台事件循环持有的共享会话；会话只能在该事件循环中使用"""
+        self.session = session
+
+    async def _call_api(self, messages: List[Dict]) -> Optional[str]:
+        if not self.api_key:
+            logger.warning("未配置DeepSeek API密钥，跳过AI分析")
+            return None
+        if not self.rate_limiter.is_allowed():
+            self._requests['rate_limited'].inc()
+            logger.warning("DeepSeek API调用过于频繁，已被限流")
+            return None
+        headers = {'Authorization': f'Bearer {self.api_key}', 'Content-Type': 'application/json'}
+        payload = {'model': self.model, 'messages': messages, 'max_tokens': self.max_tokens, 'temperature': self.temperature}
+        session = self.session
+        own_session = session is None or session.closed
+        if own_session:
+            import aiohttp
+            session = aiohttp.ClientSession()
+        started = time.perf_counter()
+        outcome = 'error'
+        try:
+            async with session.post(self.api_url, headers=headers, json=payload) as response:
+                if response.status != 200:
+                    logger.error(f"DeepSeek API返回错误: {response.status} {await response.text()}")
+                    return None
+                body = await response.json()
+                content = body['choices'][0]['message']['content']
+                outcome = 'ok'
+                return content
+        finally:
+            self._request_seconds.observe(time.perf_counter() - started)
+            self._requests[outcome].inc()
+            if own_session:
+                await session.close()
+
+    def _parse_result(self, analysis_type: str, content: str) -> AnalysisResult:
+        try:
+            start, end = content.find('{'), content.rfind('}')
+            data = json.loads(content[start:end + 1])
+            return AnalysisResult(analysis_type, str(data.get('result', '')), float(data.get('confidence', 0.0)),
+                                  list(data.get('recommendations', [])), str(data.get('risk_level', '未知')), time.time())
+        except (ValueError, TypeError):
+            return AnalysisResult(analysis_type, content.strip(), 0.0, [], '未知', time.time())
+
+    def build_safety_prompt(self, current_data, historical_data, rollup: Optional[Dict] = None) -> str:
+        """
+        current_data 为 SensorData 行元组；historical_data 为环形缓冲区列视图 (4, n) 或行序列，
+        rollup 为更早部分的 1 分钟汇总（见 DataCollector.get_analysis_window）。
+        历史数据先压缩为固定大小的统计摘要，提示词长度不随采样率增长。
+        """
+        return self._build_prompt_from_summary(current_data, summarize_window(historical_data, rollup=rollup))
+
+    def _build_prompt_from_summary(self, current_data, summary: Dict) -> str:
+        pressure, temperature, vibration = current_data[:3]
+        return (
+            "你是矿井安全监测专家。请根据以下传感器数据评估当前安全状态。\n"
+            f"当前数据: 围压 {pressure:.2f} MPa, 温度 {temperature:.2f} °C, 扰动 {vibration:.2f} mm/s\n"
+            f"历史窗口统计摘要(slope_per_min 为每分钟变化量, crossings 为向上穿越阈值次数, anomalies 为 |z|>3 的点; "
+            f"给出 raw_samples 时 std、分位数、超限占比和 anomalies 只基于最近 raw_duration_s 秒的原始样本): "
+            f"{format_summary(summary, self.context_token_budget)}\n"
+            '请只返回JSON: {"risk_level": "正常|警告|危险", "result": "结论", "confidence": 0到1, "recommendations": ["建议"]}'
+        )
+
+    async def _analyze_summary(self, current_data, summary: Dict) -> Optional[AnalysisResult]:
+        prompt = self._build_prompt_from_summary(current_data, summary)
+        messages = [{'role': 'system', 'content': '你是专业的矿井安全分析助手。'}, {'role': 'user', 'content': prompt}]
+        content = await self._call_api(messages)
+        if content is None:
+            return None
+        return self._parse_result('safety', content)
+
+    async def analyze_safety_status(self, current_data, historical_data, rollup: Optional[Dict] = None) -> Optional[AnalysisResult]:
+        # 特征提取可能涉及数十万个样本，放到工作线程中执行，避免阻塞事件循环
+        summary = await asyncio.to_thread(summarize_window, historical_data, rollup=rollup)
+        if self.cache is None:
+            return await self._analyze_summary(current_data, summary)
+        key = self.cache.fingerprint('safety', current_data, summary)
+        return await self.cache.get_or_compute(key, lambda: self._analyze_summary(current_data, summary))
 
     # ...其余实现省略（仓库中有完整实现）
 
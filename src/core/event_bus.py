@@ -0,0 +1,202 @@
+"""
+数据分发总线模块
+为每个订阅者维护独立的有界队列和工作线程，避免慢订阅者阻塞串口接收线程。
+publish_batch 以整批为单位入队：批量订阅者一次收到整批，逐条订阅者由工作线程拆分后逐条回调。
+"""
+import time
+import threading
+from collections import deque
+from typing import Callable, Dict, Iterable, List, Optional
+from loguru import logger
+from ..config.settings import EVENT_BUS_CONFIG
+from ..utils.metrics import get_metrics, NULL_METRIC
+
+# drop_oldest: 队列满时丢弃最旧的数据；latest: 只保留最新一条（适合界面刷新）；
+# block: 队列满时发布方最多等待 block_timeout 秒，超时则丢弃新数据；
+# wait: 队列满时发布方一直等待（无损反压，只有订阅停止时才丢弃），用于报警检查等不允许漏检的订阅者
+OVERFLOW_POLICIES = ('drop_oldest', 'latest', 'block', 'wait')
+
+
+class Subscription:
+    """
+    batch 为 True 时回调参数为一整批；否则为逐条订阅者，收到的批次在工作线程中经 unpack 拆分后逐条回调
+    （latest 策略下只回调批内最后一条）。队列长度与溢出策略均以入队项（单条或整批）计。
+    """
+    def __init__(self, callback: Callable, name: str, maxsize: int, policy: str, block_timeout: float,
+                 error_handler: Optional[Callable] = None, batch: bool = False,
+                 unpack: Optional[Callable[[object], Iterable]] = None):
+        if policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"未知的溢出策略: {policy}")
+        self.callback = callback
+        self.name = name
+        self.maxsize = maxsize
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.error_handler = error_handler
+        self.batch = batch
+        self.unpack = unpack or iter
+        self._queue: deque = deque()
+        self._cond = threading.Condition()
+        self._running = False
+        self.thread: Optional[threading.Thread] = None
+        self.stats = {'published': 0, 'delivered': 0, 'dropped': 0, 'coalesced': 0, 'waited': 0, 'errors': 0, 'last_error': None,
+                      'max_lag': 0, 'latency_avg': 0.0, 'latency_max': 0.0}
+        self._latency = NULL_METRIC
+
+    def register_metrics(self, bus_name: str):
+        """以 bus/subscriber 为标签登记投递延迟直方图和队列积压、丢弃计数"""
+        metrics = get_metrics()
+        labels = {'bus': bus_name, 'subscriber': self.name}
+        self._latency = metrics.histogram('subscriber_delivery_seconds', '从入队到回调完成的耗时（秒）', labels)
+        metrics.gauge('subscriber_lag', '订阅队列中等待的项数', labels, fn=lambda: len(self._queue))
+        metrics.gauge('subscriber_dropped', '因队列溢出丢弃的项数', labels, fn=lambda: self.stats['dropped'])
+        metrics.gauge('subscriber_errors', '回调失败次数', labels, fn=lambda: self.stats['errors'])
+
+    @property
+    def lag(self) -> int:
+        return len(self._queue)
+
+    @property
+    def is_running(self) -> bool:
+        return self._running
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self.thread = threading.Thread(target=self._run, name=f"subscriber-{self.name}")
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self, timeout: float = 1.0):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self.thread and self.thread is not threading.current_thread():
+            self.thread.join(timeout=timeout)
+
+    def put(self, item, is_batch: bool = False) -> bool:
+        entry = (time.perf_counter(), item, is_batch)
+        with self._cond:
+            self.stats['published'] += 1
+            if self.policy == 'latest':
+                self.stats['coalesced'] += len(self._queue)
+                self._queue.clear()
+            elif len(self._queue) >= self.maxsize:
+                if self.policy == 'drop_oldest':
+                    self._queue.popleft()
+                    self.stats['dropped'] += 1
+                elif self.policy == 'wait':
+                    self.stats['waited'] += 1
+                    self._cond.wait_for(lambda: len(self._queue) < self.maxsize or not self._running)
+                    if not self._running:
+                        self.stats['dropped'] += 1
+                        return False
+                elif not self._cond.wait_for(lambda: len(self._queue) < self.maxsize or not self._running, self.block_timeout) \
+                        or not self._running:
+                    self.stats['dropped'] += 1
+                    return False
+            self._queue.append(entry)
+            lag = len(self._queue)
+            if lag > self.stats['max_lag']:
+                self.stats['max_lag'] = lag
+            self._cond.notify_all()
+        return True
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._queue or not self._running)
+                if not self._queue:
+                    return
+                enqueued, item, is_batch = self._queue.popleft()
+                self._cond.notify_all()
+            try:
+                if is_batch and not self.batch:
+                    self._deliver_each(item)
+                else:
+                    self.callback(item)
+            except Exception as e:
+                self._on_callback_error(item, e)
+            latency = time.perf_counter() - enqueued
+            self._latency.observe(latency)
+            delivered = self.stats['delivered'] + 1
+            self.stats['delivered'] = delivered
+            self.stats['latency_avg'] += (latency - self.stats['latency_avg']) / delivered
+            if latency > self.stats['latency_max']:
+                self.stats['latency_max'] = latency
+
+    def _deliver_each(self, batch):
+        """逐条订阅者的适配器；单条回调失败不影响批内其余数据"""
+        items = self.unpack(batch)
+        if self.policy == 'latest':
+            items = list(items)[-1:]
+        for item in items:
+            try:
+                self.callback(item)
+            except Exception as e:
+                self._on_callback_error(item, e)
+
+    def _on_callback_error(self, item, e: Exception):
+        self.stats['errors'] += 1
+        self.stats['last_error'] = repr(e)
+        logger.error(f"订阅者 {self.name} 处理数据失败: {e}")
+        if self.error_handler:
+            try:
+                self.error_handler(self, item, e)
+            except Exception:
+                logger.exception("订阅者错误处理回调失败")
+
+    def get_metrics(self) -> Dict:
+        return dict(self.stats, lag=self.lag, policy=self.policy, batch=self.batch)
+
+
+class EventBus:
+    def __init__(self, name: str = 'bus', unpack: Optional[Callable[[object], Iterable]] = None):
+        """unpack 把 publish_batch 的批次拆分为逐条数据，默认直接迭代批次"""
+        self.name = name
+        self.unpack = unpack
+        self.subscriptions: List[Subscription] = []
+        self._lock = threading.Lock()
+        self.error_handler: Optional[Callable] = None
+
+    def subscribe(self, callback: Callable, name: Optional[str] = None, maxsize: Optional[int] = None,
+                  policy: Optional[str] = None, batch: bool = False) -> Subscription:
+        sub = Subscription(callback, name or getattr(callback, '__name__', 'subscriber'),
+                           maxsize or EVENT_BUS_CONFIG['queue_size'], policy or EVENT_BUS_CONFIG['policy'],
+                           EVENT_BUS_CONFIG['block_timeout'], self._on_error, batch, self.unpack)
+        sub.register_metrics(self.name)
+        sub.start()
+        with self._lock:
+            self.subscriptions = self.subscriptions + [sub]
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        with self._lock:
+            self.subscriptions = [s for s in self.subscriptions if s is not sub]
+        sub.stop()
+
+    def publish(self, item):
+        # 订阅列表采用写时复制，发布路径无需加锁；批量订阅者收到只含一条数据的批次
+        for sub in self.subscriptions:
+            sub.put([item] if sub.batch else item)
+
+    def publish_batch(self, batch):
+        """整批入队，每个订阅者每批只入队一次"""
+        for sub in self.subscriptions:
+            sub.put(batch, is_batch=True)
+
+    def start(self):
+        for sub in self.subscriptions:
+            sub.start()
+
+    def stop(self, timeout: float = 1.0):
+        for sub in self.subscriptions:
+            sub.stop(timeout)
+
+    def get_metrics(self) -> Dict[str, Dict]:
+        return {sub.name: sub.get_metrics() for sub in self.subscriptions}
+
+    def _on_error(self, sub: Subscription, item, error: Exception):
+        if self.error_handler:
+            self.error_handler(sub.name, item, error)
@@ -0,0 +1,155 @@
+"""
+特征提取模块
+将一段时间窗口内的传感器数据压缩为固定大小的统计摘要，用于构造AI提示词
+"""
+import json
+import math
+from typing import Dict, Optional
+import numpy as np
+from ..config.settings import ALARM_THRESHOLDS
+from ..utils.ring_buffer import SENSOR_FIELDS, TIMESTAMP_ROW
+
+CHANNELS = ('pressure', 'temperature', 'vibration')
+
+
+def _as_columns(window) -> np.ndarray:
+    """接受环形缓冲区视图 (4, n) 或 SensorData 行序列，统一为 (4, n) 数组"""
+    if isinstance(window, np.ndarray) and window.ndim == 2 and window.shape[0] == len(SENSOR_FIELDS):
+        return window
+    arr = np.asarray(window, dtype=np.float64)
+    if arr.size == 0:
+        return np.empty((len(SENSOR_FIELDS), 0))
+    return arr[:, :len(SENSOR_FIELDS)].T
+
+
+def _upward_crossings(values: np.ndarray, level: float) -> int:
+    above = values >= level
+    return int(np.count_nonzero(above[1:] & ~above[:-1]) + (1 if above.size and above[0] else 0))
+
+
+def _summarize_channel(values: np.ndarray, times: np.ndarray, thresholds: Optional[Dict], anomaly_z: float,
+                       max_anomalies: int) -> Dict:
+    mean = float(values.mean())
+    std = float(values.std())
+    p5, p50, p95 = np.percentile(values, (5, 50, 95))
+    summary = {'last': float(values[-1]), 'min': float(values.min()), 'max': float(values.max()), 'mean': mean, 'std': std,
+               'p5': float(p5), 'p50': float(p50), 'p95': float(p95)}
+    span = float(times[-1] - times[0])
+    if values.size >= 2 and span > 0:
+        t = times - times.mean()
+        summary['slope_per_min'] = float((t * (values - mean)).sum() / (t * t).sum() * 60.0)
+    else:
+        summary['slope_per_min'] = 0.0
+    if thresholds:
+        summary['warning_crossings'] = _upward_crossings(values, thresholds['warning'][0])
+        summary['danger_crossings'] = _upward_crossings(values, thresholds['danger'][0])
+        summary['time_above_warning_pct'] = float(np.count_nonzero(values >= thresholds['warning'][0]) / values.size * 100)
+    anomalies = []
+    if std > 0:
+        z = np.abs(values - mean) / std
+        idx = np.flatnonzero(z > anomaly_z)
+        if idx.size:
+            top = idx[np.argsort(z[idx])[::-1][:max_anomalies]]
+            anomalies = [{'t_offset_s': round(float(times[i] - times[-1]), 1), 'value': round(float(values[i]), 3), 'z': round(float(z[i]), 2)}
+                         for i in sorted(top)]
+        summary['anomaly_count'] = int(idx.size)
+    else:
+        summary['anomaly_count'] = 0
+    summary['anomalies'] = anomalies
+    return summary
+
+
+def _merge_rollup(summary: Dict, values: np.ndarray, times: np.ndarray, rollup: Dict, seconds: float,
+                  thresholds: Optional[Dict]):
+    """
+    把原始样本之前的 1 分钟汇总并入通道摘要：min/max/mean 精确合并；斜率以桶均值（桶中点、按样本数加权）参与拟合；
+    阈值穿越按每分钟最大值判断，同一分钟内的多次穿越只计一次。std、分位数、超限时间占比和异常点仍只基于原始样本。
+    """
+    counts = rollup['count'].astype(np.float64)
+    sums = rollup['avg'] * counts
+    total = counts.sum() + values.size
+    summary['min'] = float(min(summary['min'], rollup['min'].min()))
+    summary['max'] = float(max(summary['max'], rollup['max'].max()))
+    summary['mean'] = float((sums.sum() + values.sum()) / total)
+    t = np.concatenate([rollup['timestamp'] + seconds / 2, times])
+    x = np.concatenate([rollup['avg'], values])
+    w = np.concatenate([counts, np.ones(values.size)])
+    t = t - (w * t).sum() / total
+    denom = (w * t * t).sum()
+    summary['slope_per_min'] = float((w * t * (x - summary['mean'])).sum() / denom * 60.0) if denom > 0 else 0.0
+    if thresholds:
+        for key, level in (('warning_crossings', thresholds['warning'][0]), ('danger_crossings', thresholds['danger'][0])):
+            summary[key] = _upward_crossings(np.concatenate([rollup['max'], values]), level)
+
+
+def summarize_window(window, thresholds: Dict = ALARM_THRESHOLDS, anomaly_z: float = 3.0, max_anomalies: int = 5,
+                     rollup: Optional[Dict] = None) -> Dict:
+    """
+    计算每个通道的 min/max/mean/std、分位数、线性斜率、阈值穿越次数和异常点，
+    输出大小与样本数无关。
+    rollup 为原始样本之前那段时间的 1 分钟汇总（见 DataCollector.get_analysis_window），
+    其 min/max/sum/count 直接并入统计，不作为样本参与计算；此时 window 中另给出原始样本的条数和时长。
+    """
+    cols = _as_columns(window)
+    n = cols.shape[1]
+    if n == 0:
+        return {'window': {'samples': 0}, 'channels': {}}
+    times = cols[TIMESTAMP_ROW]
+    start = float(times[0])
+    samples = int(n)
+    if rollup is not None:
+        buckets = rollup['channels']['pressure']
+        start = float(buckets['timestamp'][0])
+        samples += int(buckets['count'].sum())
+    summary = {'window': {'samples': samples, 'start': start, 'end': float(times[-1]),
+                          'duration_s': round(float(times[-1] - start), 1)},
+               'channels': {}}
+    if rollup is not None:
+        summary['window'].update(raw_samples=int(n), raw_duration_s=round(float(times[-1] - times[0]), 1))
+    for name in CHANNELS:
+        values = cols[SENSOR_FIELDS.index(name)]
+        channel = _summarize_channel(values, times, thresholds.get(name), anomaly_z, max_anomalies)
+        if rollup is not None:
+            _merge_rollup(channel, values, times, rollup['channels'][name], rollup['seconds'], thresholds.get(name))
+        summary['channels'][name] = channel
+    return summary
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算token数：中文字符约0.6个token，其余字符约0.3个token"""
+    cjk = sum(1 for ch in text if '一' <= ch <= '鿿')
+    return int(math.ceil(cjk * 0.6 + (len(text) - cjk) * 0.3))
+
+
+# 超出预算时依次裁剪的字段
+_TRIM_STEPS = (
+    ('anomalies', 2), ('p5', None), ('p95', None), ('time_above_warning_pct', None),
+    ('anomalies', 0), ('p50', None), ('std', None),
+)
+
+
+def _round_summary(summary: Dict, digits: int = 3) -> Dict:
+    out = {'window': dict(summary['window']), 'channels': {}}
+    out['window'].pop('start', None)
+    out['window'].pop('end', None)
+    for name, ch in summary['channels'].items():
+        out['channels'][name] = {k: (round(v, digits) if isinstance(v, float) else v) for k, v in ch.items()}
+    return out
+
+
+def format_summary(summary: Dict, token_budget: int) -> str:
+    """把摘要序列化为紧凑JSON，超出 token_budget 时按 _TRIM_STEPS 逐步删减次要字段"""
+    compact = _round_summary(summary)
+    text = json.dumps(compact, ensure_ascii=False, separators=(',', ':'))
+    for key, keep in _TRIM_STEPS:
+        if estimate_tokens(text) <= token_budget:
+            break
+        for ch in compact['channels'].values():
+            if key not in ch:
+                continue
+            if keep:
+                ch[key] = ch[key][:keep]
+            else:
+                del ch[key]
+        text = json.dumps(compact, ensure_ascii=False, separators=(',', ':'))
+    return text
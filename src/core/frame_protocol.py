@@ -0,0 +1,259 @@
+"""
+STM32二进制帧协议模块
+帧格式（小端，共22字节）:
+    sync 0xAA 0x55 | seq u16 | ts u32 (设备毫秒计数) | pressure f32 | temperature f32 | vibration f32 | crc16
+crc16 为 CRC-16/CCITT-FALSE（binascii.crc_hqx，初值0xFFFF），覆盖 seq 到 vibration 的18个字节。
+解析器把串口数据追加到预分配的 bytearray 中，用 NumPy 按结构化 dtype 一次解码整批帧并向量化校验CRC；
+旧固件发送的 JSON 行在帧之间的空隙中识别并解析。
+设备时间戳换算为主机时间时，整个解析会话只维护一个 设备毫秒计数 -> 主机时间 的偏移：首帧建立，
+u32 毫秒计数回绕后继续累加；之后只按 CLOCK_SLEW 的速率跟踪时钟漂移，积压数据分多次读出时时间戳也保持单调。
+"""
+import json
+import struct
+import time
+import binascii
+from typing import Dict, List, Optional
+import numpy as np
+
+SYNC = b'\xaa\x55'
+SYNC_WORD = 0x55AA  # 按小端 u16 读取 SYNC 得到的值
+FRAME_STRUCT = struct.Struct('<2sHI3fH')
+FRAME_SIZE = FRAME_STRUCT.size
+CRC_SPAN = slice(2, FRAME_SIZE - 2)
+FRAME_DTYPE = np.dtype([('sync', '<u2'), ('seq', '<u2'), ('ts', '<u4'), ('values', '<f4', (3,)), ('crc', '<u2')])
+MAX_LINE = 4096
+PROTOCOLS = ('auto', 'binary', 'json')
+CRC_SCALAR_MAX = 256  # 不超过该帧数时逐帧计算CRC
+TS_WRAP = 1 << 32
+# 时钟偏移每经过 1 秒设备时间最多调整的秒数；小于 1 保证调整期间时间戳仍严格递增
+CLOCK_SLEW = 0.005
+# 主机时间超前偏移估计的幅度超过该秒数时（主机休眠、设备长时间停发等）直接向前重新对齐
+CLOCK_RESYNC = 30.0
+
+
+def _crc_table() -> np.ndarray:
+    table = np.zeros(256, dtype=np.uint16)
+    for i in range(256):
+        crc = i << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x1021) if crc & 0x8000 else (crc << 1)
+        table[i] = crc & 0xFFFF
+    return table
+
+
+CRC_TABLE = _crc_table()
+
+
+def crc16(data) -> int:
+    return binascii.crc_hqx(data, 0xFFFF)
+
+
+def crc16_batch(payload: np.ndarray) -> np.ndarray:
+    """
+    payload 形状为 (n, 18) 的 uint8，逐列查表，一次计算 n 个帧的CRC。
+    逐列查表有约 0.1ms 的固定开销，多设备低速率时每批只有几帧，此时逐帧调用 crc_hqx 更快。
+    """
+    if payload.shape[0] <= CRC_SCALAR_MAX:
+        return np.fromiter((binascii.crc_hqx(row, 0xFFFF) for row in payload), dtype=np.uint16, count=payload.shape[0])
+    crc = np.full(payload.shape[0], 0xFFFF, dtype=np.uint16)
+    for column in payload.T:
+        crc = (crc << 8) ^ CRC_TABLE[(crc >> 8) ^ column]
+    return crc
+
+
+def encode_frame(seq: int, ts_ms: int, pressure: float, temperature: float, vibration: float) -> bytes:
+    body = struct.pack('<HI3f', seq & 0xFFFF, ts_ms & 0xFFFFFFFF, pressure, temperature, vibration)
+    return SYNC + body + struct.pack('<H', crc16(body))
+
+
+def encode_frames(seq: np.ndarray, ts_ms: np.ndarray, values: np.ndarray) -> bytes:
+    """encode_frame 的向量化版本，values 形状为 (n, 3)，用于模拟设备和基准测试批量生成帧"""
+    frames = np.zeros(len(seq), dtype=FRAME_DTYPE)
+    frames['sync'] = SYNC_WORD
+    frames['seq'] = np.asarray(seq, dtype=np.int64) & 0xFFFF
+    frames['ts'] = np.asarray(ts_ms, dtype=np.int64) & 0xFFFFFFFF
+    frames['values'] = values
+    raw = frames.view(np.uint8).reshape(len(frames), FRAME_SIZE)
+    frames['crc'] = crc16_batch(raw[:, CRC_SPAN])
+    return frames.tobytes()
+
+
+class FrameParser:
+    """
+    feed() 返回本次新解出的样本，形状为 (n, 4) 的 (pressure, temperature, vibration, timestamp)。
+    二进制帧的时间戳 = 偏移 + 累计设备毫秒 / 1000。每批以最后一帧的到达时间得到一个偏移估计，
+    估计值含传输延迟且积压时偏大，因此偏移不随单批重定，而是在本批帧之间线性地向估计值靠拢，
+    幅度不超过 CLOCK_SLEW × 本批设备时长。设备计数倒退（重启）或偏差超过 CLOCK_RESYNC 时只向前重新对齐。
+    """
+    def __init__(self, capacity: int = 65536, protocol: str = 'auto'):
+        if protocol not in PROTOCOLS:
+            raise ValueError(f"未知的协议类型: {protocol}")
+        self.protocol = protocol
+        self.buffer = bytearray(capacity)
+        self.max_line = min(MAX_LINE, capacity // 2)
+        self.view = memoryview(self.buffer)
+        self.start = 0
+        self.end = 0
+        self.last_seq: Optional[int] = None
+        self.clock_offset: Optional[float] = None
+        self.last_time: Optional[float] = None  # 上次输出的最后一个时间戳，重连后新的对齐不早于它
+        self._last_raw_ts = 0
+        self._device_ms = 0
+        self.stats = {'bytes': 0, 'frames': 0, 'crc_errors': 0, 'seq_gaps': 0, 'lost_frames': 0,
+                      'json_lines': 0, 'json_errors': 0, 'discarded_bytes': 0, 'overflows': 0, 'clock_resyncs': 0}
+
+    def _append(self, data):
+        size = len(data)
+        if self.end + size > len(self.buffer):
+            # 先把未处理的尾部移到缓冲区开头，仍放不下说明数据全是无法同步的垃圾，整体丢弃
+            pending = self.end - self.start
+            self.view[:pending] = self.view[self.start:self.end]
+            self.start, self.end = 0, pending
+            if pending + size > len(self.buffer):
+                self.stats['overflows'] += 1
+                self.stats['discarded_bytes'] += pending
+                self.start = self.end = 0
+                if size > len(self.buffer):
+                    self.stats['discarded_bytes'] += size - len(self.buffer)
+                    data = data[-len(self.buffer):]
+                    size = len(data)
+        self.view[self.end:self.end + size] = data
+        self.end += size
+
+    def feed(self, data, now: Optional[float] = None) -> np.ndarray:
+        if data:
+            self.stats['bytes'] += len(data)
+            self._append(data)
+        now = now if now is not None else time.time()
+        batches: List[np.ndarray] = []
+        pos = self.start
+        while pos < self.end:
+            sync_at = -1 if self.protocol == 'json' else self.buffer.find(SYNC, pos, self.end)
+            gap_end = self.end if sync_at < 0 else sync_at
+            if gap_end > pos:
+                pos = self._consume_gap(pos, gap_end, batches, now, final=sync_at >= 0)
+                if sync_at < 0:
+                    break
+            if self.end - sync_at < FRAME_SIZE:
+                pos = sync_at
+                break
+            pos = self._consume_frames(sync_at, batches, now)
+        self.start = pos
+        if self.start == self.end:
+            self.start = self.end = 0
+        if not batches:
+            return np.empty((0, 4))
+        return batches[0] if len(batches) == 1 else np.concatenate(batches)
+
+    def _consume_frames(self, pos: int, batches: List[np.ndarray], now: float) -> int:
+        count = (self.end - pos) // FRAME_SIZE
+        frames = np.frombuffer(self.buffer, dtype=FRAME_DTYPE, count=count, offset=pos)
+        raw = np.frombuffer(self.buffer, dtype=np.uint8, count=count * FRAME_SIZE, offset=pos).reshape(count, FRAME_SIZE)
+        bad = np.flatnonzero((frames['sync'] != SYNC_WORD) | (crc16_batch(raw[:, CRC_SPAN]) != frames['crc']))
+        good = int(bad[0]) if bad.size else count
+        if good:
+            batches.append(self._decode(frames[:good], now))
+        pos += good * FRAME_SIZE
+        if good < count and frames['sync'][good] == SYNC_WORD:
+            # 同步字正确但CRC错误：可能是误同步或传输错误，跳过一个字节重新查找同步字
+            self.stats['crc_errors'] += 1
+            pos += 1
+        return pos
+
+    def _decode(self, frames: np.ndarray, now: float) -> np.ndarray:
+        seq = frames['seq'].astype(np.int64)
+        if self.last_seq is not None:
+            steps = np.diff(np.r_[self.last_seq, seq]) & 0xFFFF
+        else:
+            steps = np.r_[1, np.diff(seq) & 0xFFFF]
+        missing = steps[steps != 1]
+        if missing.size:
+            self.stats['seq_gaps'] += int(missing.size)
+            self.stats['lost_frames'] += int((missing - 1).clip(min=0).sum())
+        self.last_seq = int(seq[-1])
+        rows = np.empty((len(frames), 4))
+        rows[:, :3] = frames['values']
+        rows[:, 3] = self._timestamps(frames['ts'].astype(np.int64), now)
+        self.stats['frames'] += len(frames)
+        return rows
+
+    def _timestamps(self, ts: np.ndarray, now: float) -> np.ndarray:
+        """把 u32 设备毫秒计数换算为主机时间，见类说明"""
+        first = self.clock_offset is None
+        steps = np.diff(np.r_[ts[0] if first else self._last_raw_ts, ts]) % TS_WRAP
+        # 按有符号差值判断：回绕后的正常步进很小，设备重启导致的倒退表现为接近 2^32 的步进
+        restarted = steps >= TS_WRAP // 2
+        if restarted.any():
+            steps[restarted] = 0
+        device_ms = self._device_ms + np.cumsum(steps)
+        self._last_raw_ts = int(ts[-1])
+        start_ms, self._device_ms = self._device_ms, int(device_ms[-1])
+        estimate = now - self._device_ms / 1000.0
+        if first or restarted.any() or estimate - self.clock_offset > CLOCK_RESYNC:
+            offset = estimate if first else max(self.clock_offset, estimate)
+            if self.last_time is not None:
+                offset = max(offset, self.last_time - device_ms[0] / 1000.0 + 1e-6)
+            if not first:
+                self.stats['clock_resyncs'] += 1
+            self.clock_offset = offset
+            times = offset + device_ms / 1000.0
+        else:
+            span = self._device_ms - start_ms
+            limit = CLOCK_SLEW * span / 1000.0
+            delta = min(max(estimate - self.clock_offset, -limit), limit)
+            ramp = (device_ms - start_ms) / span if span else np.ones(len(ts))
+            times = self.clock_offset + device_ms / 1000.0 + delta * ramp
+            self.clock_offset += delta
+        self.last_time = float(times[-1])
+        return times
+
+    def _consume_gap(self, pos: int, end: int, batches: List[np.ndarray], now: float, final: bool) -> int:
+        """处理同步字之前的字节：完整的 JSON 行按旧协议解析，其余丢弃；final 为 False 时保留末尾不完整的行"""
+        if self.protocol == 'binary':
+            # 末尾可能是被两次读取拆开的同步字前半部分，保留到下次再判断
+            keep = len(SYNC) - 1 if not final and self.buffer[end - 1] == SYNC[0] else 0
+            self.stats['discarded_bytes'] += end - keep - pos
+            return end - keep
+        last_newline = self.buffer.rfind(b'\n', pos, end)
+        stop = end if final else last_newline + 1
+        if not final and last_newline < 0:
+            if end - pos > self.max_line:
+                self.stats['discarded_bytes'] += end - pos
+                return end
+            return pos
+        rows = []
+        for line in bytes(self.view[pos:stop]).split(b'\n'):
+            line = line.strip()
+            if not line:
+                continue
+            if not line.startswith(b'{'):
+                self.stats['discarded_bytes'] += len(line)
+                continue
+            row = self._parse_json(line, now)
+            if row is not None:
+                rows.append(row)
+        if rows:
+            batches.append(np.asarray(rows, dtype=np.float64))
+        return stop
+
+    def _parse_json(self, line: bytes, now: float) -> Optional[tuple]:
+        try:
+            data = json.loads(line)
+            row = (float(data.get('pressure', 0.0)), float(data.get('temperature', 0.0)),
+                   float(data.get('vibration', 0.0)), float(data.get('timestamp', now)))
+        except (ValueError, TypeError, AttributeError):
+            self.stats['json_errors'] += 1
+            return None
+        self.stats['json_lines'] += 1
+        return row
+
+    def reset(self):
+        """清空缓冲并在下一帧重新对齐时钟（重连后设备可能已重启），last_time 保留以保证时间戳不倒退"""
+        self.start = self.end = 0
+        self.last_seq = None
+        self.clock_offset = None
+        self._last_raw_ts = 0
+        self._device_ms = 0
+
+    def get_stats(self) -> Dict:
+        return dict(self.stats)
@@ -0,0 +1,101 @@
+"""
+模拟设备负载生成模块
+按配置速率（1 Hz ~ 10 kHz）生成与真实固件相同的二进制帧，用于 --mock 运行、负载测试和性能基准。
+信号模型包括：基线 + 噪声、线性漂移与慢速周期波动、随机尖峰、发送速率突增（burst）和掉线（dropout，序号照常递增，
+接收端表现为丢帧）。所有随机过程由 seed 决定，便于复现。
+"""
+import math
+import time
+from typing import Dict, Optional
+import numpy as np
+from ..config.settings import MOCK_CONFIG
+from .frame_protocol import encode_frames
+
+CHANNELS = ('pressure', 'temperature', 'vibration')
+
+
+class SignalModel:
+    def __init__(self, config: Dict, rng: np.random.Generator):
+        self.rng = rng
+        self.baseline = np.array([config['baseline'][c] for c in CHANNELS], dtype=np.float64)
+        self.noise = np.array([config['noise'][c] for c in CHANNELS], dtype=np.float64)
+        self.drift = np.array([config['drift_per_hour'][c] for c in CHANNELS], dtype=np.float64) / 3600.0
+        self.wave = np.array([config['wave_amplitude'][c] for c in CHANNELS], dtype=np.float64)
+        self.wave_period = config['wave_period']
+        self.spike_prob = config['spike_prob']
+        self.spike_scale = config['spike_scale']
+        self.phase = rng.uniform(0, 2 * math.pi, len(CHANNELS))
+        self.spikes = 0
+
+    def sample(self, elapsed: np.ndarray) -> np.ndarray:
+        """elapsed 为自设备启动起的秒数，返回 (n, 3) 的 (pressure, temperature, vibration)"""
+        t = elapsed[:, None]
+        values = (self.baseline + self.drift * t + self.wave * np.sin(2 * math.pi * t / self.wave_period + self.phase)
+                  + self.noise * self.rng.standard_normal((len(elapsed), len(CHANNELS))))
+        if self.spike_prob:
+            rows = np.flatnonzero(self.rng.random(len(elapsed)) < self.spike_prob)
+            if rows.size:
+                cols = self.rng.integers(0, len(CHANNELS), rows.size)
+                values[rows, cols] += self.spike_scale * self.noise[cols] * self.rng.choice((-1.0, 1.0), rows.size)
+                self.spikes += int(rows.size)
+        values[:, CHANNELS.index('vibration')] = np.abs(values[:, CHANNELS.index('vibration')])
+        return values
+
+
+class MockDevice:
+    """
+    emit() 返回自上次调用以来应发送的帧字节；速率按实际经过的时间折算，调用不均匀时总速率仍然准确。
+    max_frames 限制单次输出的帧数，未输出的部分顺延到下次调用。
+    """
+    def __init__(self, rate: Optional[float] = None, seed: Optional[int] = None, config: Optional[Dict] = None):
+        self.config = dict(MOCK_CONFIG, **(config or {}))
+        self.rate = float(rate or self.config['rate'])
+        if not 0 < self.rate <= self.config['max_rate']:
+            raise ValueError(f"模拟设备速率应在 (0, {self.config['max_rate']}] Hz 之间: {self.rate}")
+        self.rng = np.random.default_rng(self.config['seed'] if seed is None else seed)
+        self.model = SignalModel(self.config, self.rng)
+        self.started = self.last = time.monotonic()
+        self.owed = 0.0
+        self.seq = 0
+        self.burst_until = 0.0
+        self.dropout_until = 0.0
+        self.stats = {'frames': 0, 'dropped_frames': 0, 'bursts': 0, 'dropouts': 0}
+
+    def _episode(self, now: float, dt: float, prob: float, until: float, duration: float, key: str) -> float:
+        """按每秒发生概率 prob 随机开始一段持续 duration 秒的事件，返回事件结束时间"""
+        if now >= until and prob and self.rng.random() < 1.0 - math.exp(-prob * dt):
+            self.stats[key] += 1
+            return now + duration
+        return until
+
+    def emit(self, now: Optional[float] = None, max_frames: Optional[int] = None) -> bytes:
+        now = time.monotonic() if now is None else now
+        dt = now - self.last
+        if dt <= 0:
+            return b''
+        cfg = self.config
+        self.burst_until = self._episode(now, dt, cfg['burst_prob'], self.burst_until, cfg['burst_duration'], 'bursts')
+        self.dropout_until = self._episode(now, dt, cfg['dropout_prob'], self.dropout_until, cfg['dropout_duration'], 'dropouts')
+        rate = self.rate * (cfg['burst_factor'] if now < self.burst_until else 1.0)
+        self.owed += dt * rate
+        n = int(self.owed)
+        if max_frames is not None:
+            n = min(n, max_frames)
+        if n <= 0:
+            self.last = now
+            return b''
+        # 本批帧的设备时间在 [last, 本批结束] 内均匀分布；被截断时只推进到已输出的部分
+        span = dt if n == int(self.owed) else n / rate
+        elapsed = (self.last - self.started) + span * np.arange(1, n + 1) / n
+        self.owed -= n
+        self.last += span
+        seq = self.seq + np.arange(n)
+        self.seq += n
+        if now < self.dropout_until:
+            self.stats['dropped_frames'] += n
+            return b''
+        self.stats['frames'] += n
+        return encode_frames(seq, (elapsed * 1000).astype(np.int64), self.model.sample(elapsed))
+
+    def get_stats(self) -> Dict:
+        return dict(self.stats, rate=self.rate, spikes=self.model.spikes)
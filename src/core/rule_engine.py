@@ -0,0 +1,47 @@
+"""
+向量化报警规则引擎
+将 ALARM_THRESHOLDS 编译为NumPy数组，一次性评估 N 个样本 × M 个参数
+"""
+from typing import Dict, List, Sequence, Tuple
+import numpy as np
+from ..config.settings import ALARM_THRESHOLDS
+from ..utils.ring_buffer import SENSOR_FIELDS
+
+# 报警等级编码，与 AlarmLevel 的顺序一致
+LEVEL_NORMAL, LEVEL_WARNING, LEVEL_DANGER = 0, 1, 2
+
+
+class CompiledRuleEngine:
+    """
+    与 AlarmRule.evaluate 语义一致：value >= danger 下限为 DANGER；
+    落在 warning 闭区间内为 WARNING；其余（含 NaN）为 NORMAL。
+    """
+    def __init__(self, thresholds: Dict = ALARM_THRESHOLDS, fields: Sequence[str] = SENSOR_FIELDS):
+        self.fields = tuple(fields)
+        self.parameters: List[str] = [p for p in thresholds if p in self.fields]
+        self.columns = np.array([self.fields.index(p) for p in self.parameters], dtype=np.intp)
+        self.warning_low = np.array([thresholds[p]['warning'][0] for p in self.parameters], dtype=np.float64)
+        self.warning_high = np.array([thresholds[p]['warning'][1] for p in self.parameters], dtype=np.float64)
+        self.danger_low = np.array([thresholds[p]['danger'][0] for p in self.parameters], dtype=np.float64)
+        # 每个等级对应报告的阈值，按 [参数, 等级] 索引
+        self.level_thresholds = np.column_stack([np.zeros(len(self.parameters)), self.warning_low, self.danger_low])
+
+    def evaluate(self, values: np.ndarray) -> np.ndarray:
+        """values 形状为 (N, M)，列顺序与 parameters 一致；返回 int8 等级矩阵"""
+        values = np.asarray(values, dtype=np.float64)
+        levels = np.zeros(values.shape, dtype=np.int8)
+        levels[(values >= self.warning_low) & (values <= self.warning_high)] = LEVEL_WARNING
+        levels[values >= self.danger_low] = LEVEL_DANGER
+        return levels
+
+    def evaluate_rows(self, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """rows 形状为 (N, len(fields))，返回 (参数值矩阵, 等级矩阵)"""
+        rows = np.asarray(rows, dtype=np.float64)
+        if rows.ndim == 1:
+            rows = rows.reshape(1, -1)
+        values = rows[:, self.columns]
+        return values, self.evaluate(values)
+
+    def alarm_positions(self, levels: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """非 NORMAL 的 (样本下标, 参数下标)，按样本时间顺序排列"""
+        return np.nonzero(levels)
@@ -2,30 +2,42 @@
 STM32通信模块
 负责与STM32硬件串口通信，接收传感器数据
 """
-import serial
 import threading
 import time
-import json
 from queue import Queue
 from typing import Dict, Optional, Callable
 from loguru import logger
-from ..config.settings import STM32_CONFIG
+from ..config.settings import STM32_CONFIG, MOCK_CONFIG
+from ..utils.metrics import get_metrics
+from ..utils.profiler import get_tracer
+from ..utils.ring_buffer import TIMESTAMP_ROW
+from .frame_protocol import FrameParser, FRAME_SIZE
+from .load_generator import MockDevice
 
 
 class STM32Communicator:
     def __init__(self):
-        self.serial_port: Optional[serial.Serial] = None
+        self.serial_port = None
         self.is_connected = False
         self.is_running = False
         self.data_queue = Queue()
         self.receive_thread = None
         self.data_callback: Optional[Callable] = None
+        self.batch_callback: Optional[Callable] = None
         self.latest_data = {'pressure': 0.0, 'temperature': 0.0, 'vibration': 0.0, 'timestamp': time.time()}
+        self.read_chunk = STM32_CONFIG['read_chunk']
+        self.parser = FrameParser(STM32_CONFIG['parser_buffer'], STM32_CONFIG['protocol'])
+        self.stats = {'reads': 0, 'samples': 0, 'read_errors': 0, 'callback_errors': 0}
+        metrics = get_metrics()
+        self._read_bytes = metrics.counter('serial_read_bytes_total', '串口读取的字节数')
+        self._parse_seconds = metrics.histogram('stage_seconds', '各处理阶段单批耗时（秒）', {'stage': 'parse'})
+        self._tracer = get_tracer()
 
     def connect(self, port: str = None, baudrate: int = None) -> bool:
         try:
             port = port or STM32_CONFIG['port']
             baudrate = baudrate or STM32_CONFIG['baudrate']
+            import serial
             self.serial_port = serial.Serial(port=port, baudrate=baudrate, timeout=STM32_CONFIG['timeout'])
             self.is_connected = True
             logger.info(f"成功连接STM32设备: {port}")
@@ -42,4 +54,134 @@ class STM32Communicator:
         self.is_connected = False
         logger.info("STM32设备连接已断开")
 
-    # ...其余实现省略（仓库中有完整实现）
+    def set_data_callback(self, callback: Callable):
+        self.data_callback = callback
+
+    def set_batch_callback(self, callback: Callable):
+        """设置后每次串口读取解出的全部样本以 (n, 4) 数组一次性交给 callback，不再逐条回调 data_callback"""
+        self.batch_callback = callback
+
+    def start_receiving(self) -> bool:
+        if not self.is_connected:
+            logger.error("STM32设备未连接，无法开始接收")
+            return False
+        if self.is_running:
+            return True
+        self.parser.reset()
+        self.is_running = True
+        self.receive_thread = threading.Thread(target=self._receive_loop, name='STM32Receiver')
+        self.receive_thread.daemon = True
+        self.receive_thread.start()
+        logger.info(f"开始接收STM32数据 (协议: {self.parser.protocol})")
+        return True
+
+    def stop_receiving(self):
+        self.is_running = False
+        if self.receive_thread and self.receive_thread.is_alive() and self.receive_thread is not threading.current_thread():
+            self.receive_thread.join(timeout=2)
+        self.receive_thread = None
+
+    def _receive_loop(self):
+        """按块读取串口数据：有积压时一次读完，否则阻塞读取至少1字节（受串口 timeout 限制）"""
+        while self.is_running:
+            try:
+                waiting = self.serial_port.in_waiting
+                chunk = self.serial_port.read(min(max(waiting, 1), self.read_chunk))
+            except Exception as e:
+                self.stats['read_errors'] += 1
+                logger.bind(log_key="serial.read_error").error(f"读取串口数据失败: {e}")
+                time.sleep(0.1)
+                continue
+            if not chunk:
+                continue
+            self._feed(chunk)
+
+    def _feed(self, chunk: bytes):
+        self.stats['reads'] += 1
+        self._read_bytes.inc(len(chunk))
+        started = time.perf_counter()
+        rows = self.parser.feed(chunk)
+        self._parse_seconds.observe(time.perf_counter() - started)
+        if self._tracer.enabled:
+            self._tracer.mark('parse', rows[:, TIMESTAMP_ROW])
+        self._handle_samples(rows)
+
+    def _handle_samples(self, rows):
+        if not len(rows):
+            return
+        self.stats['samples'] += len(rows)
+        if self.batch_callback:
+            pressure, temperature, vibration, timestamp = rows[-1].tolist()
+            self.latest_data = {'pressure': pressure, 'temperature': temperature, 'vibration': vibration, 'timestamp': timestamp}
+            try:
+                self.batch_callback(rows)
+            except Exception as e:
+                self.stats['callback_errors'] += 1
+                logger.bind(log_key="serial.batch_callback_error").error(f"批量数据回调执行失败: {e}")
+            return
+        for pressure, temperature, vibration, timestamp in rows.tolist():
+            data = {'pressure': pressure, 'temperature': temperature, 'vibration': vibration, 'timestamp': timestamp}
+            self.latest_data = data
+            if self.data_callback:
+                try:
+                    self.data_callback(data)
+                except Exception as e:
+                    self.stats['callback_errors'] += 1
+                    logger.bind(log_key="serial.data_callback_error").error(f"数据回调执行失败: {e}")
+
+    def get_latest_data(self) -> Dict:
+        return self.latest_data
+
+    def get_stats(self) -> Dict:
+        """连接与解析统计，包括 CRC 错误数 crc_errors 和序号缺口 seq_gaps / lost_frames"""
+        return dict(self.stats, **self.parser.get_stats(), connected=self.is_connected, running=self.is_running)
+
+
+class MockSTM32Communicator(STM32Communicator):
+    """
+    用 MockDevice 代替串口：接收线程每 tick 秒生成一批二进制帧，经同一个 FrameParser 和批量回调进入采集管道，
+    因此解析、写库和报警的开销与真实设备一致。速率和信号模型见 MOCK_CONFIG。
+    """
+    def __init__(self, rate: Optional[float] = None, seed: Optional[int] = None, config: Optional[Dict] = None):
+        super().__init__()
+        self.rate = rate
+        self.seed = seed
+        self.config = config
+        self.tick = dict(MOCK_CONFIG, **(config or {}))['tick']
+        self.device: Optional[MockDevice] = None
+
+    def connect(self, port: str = None, baudrate: int = None) -> bool:
+        try:
+            self.device = MockDevice(self.rate, self.seed, self.config)
+        except ValueError as e:
+            logger.error(f"创建模拟设备失败: {e}")
+            return False
+        self.is_connected = True
+        logger.info(f"已连接模拟STM32设备 ({self.device.rate:g} Hz)")
+        return True
+
+    def disconnect(self):
+        self.stop_receiving()
+        self.is_connected = False
+        logger.info("模拟STM32设备连接已断开")
+
+    def _receive_loop(self):
+        # 单次生成的帧数不超过解析缓冲区容量，积压部分顺延到下一个 tick
+        max_frames = len(self.parser.buffer) // FRAME_SIZE // 2
+        next_tick = time.monotonic()
+        while self.is_running:
+            chunk = self.device.emit(max_frames=max_frames)
+            if chunk:
+                self._feed(chunk)
+            next_tick += self.tick
+            delay = next_tick - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_tick = time.monotonic()
+
+    def get_stats(self) -> Dict:
+        stats = super().get_stats()
+        if self.device is not None:
+            stats['mock'] = self.device.get_stats()
+        return stats
@@ -0,0 +1,216 @@
+"""
+流式趋势与异常检测模块
+每个通道以O(1)的增量统计量（Welford、EWMA、按时间分桶的滚动斜率、CUSUM）实时检测异常点和漂移
+"""
+import math
+from collections import deque
+from typing import Dict, List, NamedTuple, Optional, Sequence
+from ..config.settings import TREND_DETECTION_CONFIG
+from ..utils.ring_buffer import SENSOR_FIELDS, TIMESTAMP_ROW
+
+CUSUM_CLIP = 3.0
+
+
+class Detection(NamedTuple):
+    kind: str          # 'anomaly' | 'trend' | 'drift'
+    parameter: str
+    value: float
+    score: float       # z 分数 / 每分钟斜率 / CUSUM 统计量
+    threshold: float
+    timestamp: float
+
+
+class SlopeWindow:
+    """
+    按时间定义的滚动最小二乘斜率：最近 seconds 秒分成 buckets 个等宽时间桶，每桶只保存累加和，
+    内存和单样本开销与采样率无关。样本先累加到当前桶，桶结束时才滚动窗口并重新合计（O(buckets)），
+    因此斜率和显著性每个桶宽评估一次。累加和以桶起点为时间原点、以首个样本为数值原点，避免大偏移下的精度损失。
+    """
+    def __init__(self, seconds: float, buckets: int):
+        self.seconds = seconds
+        self.buckets = max(2, buckets)
+        self.width = seconds / self.buckets
+        self._origin: Optional[float] = None
+        self._x0 = 0.0
+        self._index = 0
+        self._current = [0, 0.0, 0.0, 0.0, 0.0, 0.0]  # n, Σt, Σx, Σt², Σtx, Σx²
+        self._done: deque = deque()  # (桶序号, 累加和)
+        self.total = (0, 0.0, 0.0, 0.0, 0.0, 0.0)  # 已完成桶的合计，时间原点为最早一个桶的起点
+
+    def add(self, t: float, x: float) -> bool:
+        """加入一个样本，返回是否有桶刚刚结束（即窗口统计量已更新）"""
+        if self._origin is None:
+            self._origin, self._x0 = t, x
+        index = int((t - self._origin) // self.width)
+        rolled = False
+        if index > self._index:
+            self._roll(index)
+            rolled = True
+        rt = t - self._origin - self._index * self.width
+        x -= self._x0
+        cur = self._current
+        cur[0] += 1
+        cur[1] += rt
+        cur[2] += x
+        cur[3] += rt * rt
+        cur[4] += rt * x
+        cur[5] += x * x
+        return rolled
+
+    def _roll(self, index: int):
+        if self._current[0]:
+            self._done.append((self._index, tuple(self._current)))
+        self._index = index
+        self._current = [0, 0.0, 0.0, 0.0, 0.0, 0.0]
+        while self._done and self._done[0][0] <= index - self.buckets:
+            self._done.popleft()
+        n = st = sx = stt = stx = sxx = 0.0
+        if self._done:
+            first = self._done[0][0]
+            for bucket, (bn, bt, bx, btt, btx, bxx) in self._done:
+                # 把桶内相对时间平移到窗口起点
+                d = (bucket - first) * self.width
+                n += bn
+                st += bt + bn * d
+                sx += bx
+                stt += btt + 2 * d * bt + bn * d * d
+                stx += btx + d * bx
+                sxx += bxx
+        self.total = (n, st, sx, stt, stx, sxx)
+
+    @property
+    def full(self) -> bool:
+        """最早一个桶已在窗口起点，即已完成的桶覆盖了整个窗口"""
+        return bool(self._done) and self._done[0][0] == self._index - self.buckets + 1
+
+    def fit(self):
+        """返回 (斜率 单位/秒, 斜率标准误)，样本不足时返回 (0.0, inf)"""
+        n, st, sx, stt, stx, sxx = self.total
+        if n < 3:
+            return 0.0, math.inf
+        ctt = stt - st * st / n
+        if ctt <= 0:
+            return 0.0, math.inf
+        ctx = stx - st * sx / n
+        cxx = sxx - sx * sx / n
+        slope = ctx / ctt
+        residual = max(cxx - slope * ctx, 0.0)
+        return slope, math.sqrt(residual / (n - 2) / ctt)
+
+
+class OnlineChannelDetector:
+    """
+    单通道在线检测器，内存占用固定。趋势窗口按秒定义（slope_window），与采样率无关；
+    TREND 要求斜率既超过 slope_limits，又在统计上显著（|斜率 / 标准误| > slope_t），平稳噪声不会触发。
+    """
+    def __init__(self, parameter: str, config: Dict):
+        self.parameter = parameter
+        self.alpha = config['ewma_alpha']
+        self.baseline_alpha = config['baseline_alpha']
+        self.warmup = config['warmup']
+        self.anomaly_z = config['anomaly_z']
+        self.slope_limit = config['slope_limits'].get(parameter)
+        self.slope_t = config['slope_t']
+        self.cusum_k = config['cusum_k']
+        self.cusum_h = config['cusum_h']
+        # Welford 全局统计量
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        # 快速 EWMA 用于异常点，慢速 EWMA 作为 CUSUM 的基线
+        self.ewma = 0.0
+        self.ewvar = 0.0
+        self.baseline = 0.0
+        self.baseline_var = 0.0
+        self.cusum_pos = 0.0
+        self.cusum_neg = 0.0
+        self.window = SlopeWindow(config['slope_window'], config['slope_buckets'])
+
+    @property
+    def variance(self) -> float:
+        return self.m2 / self.count if self.count else 0.0
+
+    @property
+    def slope(self) -> float:
+        """最近 slope_window 秒的最小二乘斜率（单位/秒）"""
+        return self.window.fit()[0]
+
+    def update(self, t: float, x: float) -> List[Detection]:
+        if x != x:
+            return []
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+        if self.count == 1:
+            self.ewma = self.baseline = x
+            self.window.add(t, x)
+            return []
+        detections = []
+        warmed = self.count > self.warmup
+        std = math.sqrt(self.ewvar)
+        if warmed and std > 0:
+            z = (x - self.ewma) / std
+            if abs(z) > self.anomaly_z:
+                detections.append(Detection('anomaly', self.parameter, x, z, self.anomaly_z, t))
+        # 启动阶段使用 1/count 作为平滑系数（等价于算术平均），避免 EWMA 被首个样本带偏
+        diff = x - self.ewma
+        incr = max(self.alpha, 1.0 / self.count) * diff
+        self.ewma += incr
+        self.ewvar = (1 - max(self.alpha, 1.0 / self.count)) * (self.ewvar + diff * incr)
+        # 慢速 EWMA 方差在启动阶段收敛较慢，取其与 Welford 方差中的较大者避免低估；
+        # 单点偏差截断到 ±CUSUM_CLIP，防止孤立尖峰被当作漂移
+        base_std = math.sqrt(max(self.baseline_var, self.variance))
+        if warmed and base_std > 0:
+            zb = min(max((x - self.baseline) / base_std, -CUSUM_CLIP), CUSUM_CLIP)
+            self.cusum_pos = max(0.0, self.cusum_pos + zb - self.cusum_k)
+            self.cusum_neg = max(0.0, self.cusum_neg - zb - self.cusum_k)
+            score = max(self.cusum_pos, self.cusum_neg)
+            if score > self.cusum_h:
+                detections.append(Detection('drift', self.parameter, x, score if self.cusum_pos >= self.cusum_neg else -score, self.cusum_h, t))
+                self.cusum_pos = self.cusum_neg = 0.0
+        alpha = max(self.baseline_alpha, 1.0 / self.count)
+        diff = x - self.baseline
+        incr = alpha * diff
+        self.baseline += incr
+        self.baseline_var = (1 - alpha) * (self.baseline_var + diff * incr)
+        if self.window.add(t, x) and warmed and self.slope_limit and self.window.full:
+            slope, stderr = self.window.fit()
+            per_min = slope * 60.0
+            if abs(per_min) > self.slope_limit and abs(slope) > self.slope_t * stderr:
+                detections.append(Detection('trend', self.parameter, x, per_min, self.slope_limit, t))
+        return detections
+
+
+class StreamAnomalyDetector:
+    """为每个参数维护一个 OnlineChannelDetector"""
+    def __init__(self, parameters: Sequence[str] = ('pressure', 'temperature', 'vibration'), config: Optional[Dict] = None):
+        cfg = dict(TREND_DETECTION_CONFIG, **(config or {}))
+        self.enabled = cfg['enabled']
+        self.channels = [(SENSOR_FIELDS.index(p), OnlineChannelDetector(p, cfg)) for p in parameters]
+
+    def update(self, row: Sequence[float]) -> List[Detection]:
+        if not self.enabled:
+            return []
+        t = row[TIMESTAMP_ROW]
+        detections = []
+        for index, detector in self.channels:
+            found = detector.update(t, row[index])
+            if found:
+                detections.extend(found)
+        return detections
+
+    def update_batch(self, rows) -> List[Detection]:
+        if not self.enabled:
+            return []
+        detections = []
+        for row in rows:
+            found = self.update(row)
+            if found:
+                detections.extend(found)
+        return detections
+
+    def get_state(self) -> Dict[str, Dict]:
+        return {d.parameter: {'count': d.count, 'mean': d.mean, 'std': math.sqrt(d.variance), 'ewma': d.ewma,
+                              'slope_per_min': d.slope * 60.0, 'cusum': max(d.cusum_pos, d.cusum_neg)}
+                for _, d in self.channels}
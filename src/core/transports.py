@@ -0,0 +1,174 @@
+"""
+设备传输层模块
+把串口、TCP、UDP 统一为非阻塞的字节源，供多设备采集管理器在少量读线程中轮询或用 selectors 等待。
+设备地址格式:
+    serial:COM3@115200 / serial:/dev/ttyUSB0   串口（波特率缺省取 STM32_CONFIG）
+    tcp://192.168.1.20:5000                    主动连接设备或串口服务器
+    udp://0.0.0.0:6000                         在本地端口接收设备推送的数据报
+    mock://dev1?rate=1000&seed=1               进程内模拟设备（见 load_generator），用于负载测试
+"""
+import socket
+from typing import Optional
+from urllib.parse import urlsplit, parse_qs
+from ..config.settings import STM32_CONFIG
+from .load_generator import MockDevice
+
+
+class Transport:
+    """read_available 从不阻塞：无数据时返回 b''，连接断开时抛出 ConnectionError"""
+    uri = ''
+
+    def open(self):
+        raise NotImplementedError
+
+    def close(self):
+        raise NotImplementedError
+
+    def fileno(self) -> Optional[int]:
+        """可供 selectors 等待的文件描述符；平台不支持时返回 None，由调用方轮询"""
+        return None
+
+    def read_available(self, max_bytes: int) -> bytes:
+        raise NotImplementedError
+
+
+class SerialTransport(Transport):
+    def __init__(self, port: str, baudrate: Optional[int] = None):
+        self.port = port
+        self.baudrate = baudrate or STM32_CONFIG['baudrate']
+        self.uri = f'serial:{port}@{self.baudrate}'
+        self.serial_port = None
+
+    def open(self):
+        import serial
+        # timeout=0 为非阻塞读取，只返回驱动缓冲区中已有的字节
+        self.serial_port = serial.Serial(port=self.port, baudrate=self.baudrate, timeout=0)
+
+    def close(self):
+        if self.serial_port is not None:
+            self.serial_port.close()
+            self.serial_port = None
+
+    def fileno(self) -> Optional[int]:
+        try:
+            return self.serial_port.fileno()
+        except (AttributeError, OSError):
+            return None  # Windows 上的串口不支持 select
+
+    def read_available(self, max_bytes: int) -> bytes:
+        try:
+            return self.serial_port.read(max_bytes)
+        except Exception as e:
+            raise ConnectionError(f"串口 {self.port} 读取失败: {e}") from e
+
+
+class TCPTransport(Transport):
+    def __init__(self, host: str, port: int, connect_timeout: float = 5.0):
+        self.host = host
+        self.port = port
+        self.connect_timeout = connect_timeout
+        self.uri = f'tcp://{host}:{port}'
+        self.sock: Optional[socket.socket] = None
+
+    def open(self):
+        self.sock = socket.create_connection((self.host, self.port), timeout=self.connect_timeout)
+        self.sock.setblocking(False)
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+    def fileno(self) -> Optional[int]:
+        return self.sock.fileno() if self.sock is not None else None
+
+    def read_available(self, max_bytes: int) -> bytes:
+        try:
+            data = self.sock.recv(max_bytes)
+        except (BlockingIOError, InterruptedError):
+            return b''
+        except OSError as e:
+            raise ConnectionError(f"TCP {self.host}:{self.port} 读取失败: {e}") from e
+        if not data:
+            raise ConnectionError(f"TCP {self.host}:{self.port} 连接已被对端关闭")
+        return data
+
+
+class UDPTransport(Transport):
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.uri = f'udp://{host}:{port}'
+        self.sock: Optional[socket.socket] = None
+
+    def open(self):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind((self.host, self.port))
+        self.sock.setblocking(False)
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+    def fileno(self) -> Optional[int]:
+        return self.sock.fileno() if self.sock is not None else None
+
+    def read_available(self, max_bytes: int) -> bytes:
+        """一次读取至多 max_bytes 字节的若干数据报；帧可以跨数据报，由解析器重新同步"""
+        chunks = []
+        size = 0
+        while size < max_bytes:
+            try:
+                data = self.sock.recv(65535)
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError as e:
+                raise ConnectionError(f"UDP {self.host}:{self.port} 读取失败: {e}") from e
+            chunks.append(data)
+            size += len(data)
+        return b''.join(chunks)
+
+
+class MockTransport(Transport):
+    """没有可 select 的文件描述符，由读线程按 poll_interval 轮询；每次读取时按经过的时间生成帧"""
+    def __init__(self, name: str, rate: Optional[float] = None, seed: Optional[int] = None):
+        self.name = name
+        self.rate = rate
+        self.seed = seed
+        self.uri = f'mock://{name}'
+        self.device: Optional[MockDevice] = None
+        self.pending = b''
+
+    def open(self):
+        self.device = MockDevice(self.rate, self.seed)
+        self.pending = b''
+
+    def close(self):
+        self.device = None
+
+    def read_available(self, max_bytes: int) -> bytes:
+        if self.device is None:
+            raise ConnectionError(f"模拟设备 {self.name} 未打开")
+        if not self.pending:
+            self.pending = self.device.emit()
+        data, self.pending = self.pending[:max_bytes], self.pending[max_bytes:]
+        return data
+
+
+def open_transport(uri: str) -> Transport:
+    """按地址创建传输对象（尚未打开）"""
+    if uri.startswith('serial:'):
+        port, _, baudrate = uri[len('serial:'):].partition('@')
+        return SerialTransport(port, int(baudrate) if baudrate else None)
+    parts = urlsplit(uri)
+    if parts.scheme == 'tcp' and parts.hostname and parts.port:
+        return TCPTransport(parts.hostname, parts.port)
+    if parts.scheme == 'udp' and parts.port:
+        return UDPTransport(parts.hostname or '0.0.0.0', parts.port)
+    if parts.scheme == 'mock':
+        query = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+        return MockTransport(parts.netloc or 'mock', float(query['rate']) if 'rate' in query else None,
+                             int(query['seed']) if 'seed' in query else None)
+    raise ValueError(f"无法识别的设备地址: {uri}")
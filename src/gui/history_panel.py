@@ -2,13 +2,30 @@
 历史数据面板
 用于查询和导出历史数据并绘制历史曲线
 """
+import time
+from PyQt6.QtCore import pyqtSignal
 from PyQt6.QtWidgets import QWidget
 from loguru import logger
+from ..utils.exporter import HistoryExporter, ExportJob
 
 class HistoryPanel(QWidget):
+    # 导出在后台线程中进行，通过信号把进度和结果投递回GUI线程
+    export_progress = pyqtSignal(int, int)
+    export_finished = pyqtSignal(dict)
+
     def __init__(self):
         super().__init__()
+        self.start_time = time.time() - 24 * 3600
+        self.end_time = None
+        self.export_job = None
     def query_data(self):
         pass
     def export_data(self, filename):
-        pass
+        if self.export_job and self.export_job.is_running:
+            logger.warning("已有导出任务在进行中")
+            return
+        self.export_job = ExportJob(HistoryExporter(), filename, self.start_time, self.end_time,
+                                    progress=self.export_progress.emit, on_finished=self.export_finished.emit).start()
+    def cancel_export(self):
+        if self.export_job:
+            self.export_job.cancel()
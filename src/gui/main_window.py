@@ -23,13 +23,19 @@ except ImportError:
 from ..config.settings import UI_CONFIG
 
 
-def run_gui(monitoring_system=None):
+def run_gui(monitoring_system=None, client=None):
+    """client 为 AcquisitionClient 时界面挂载到独立的采集进程，关闭界面不会停止采集"""
     app = QApplication(sys.argv)
     main_window = None
     try:
         from PyQt6.QtWidgets import QMainWindow
         main_window = QMainWindow()
         main_window.setWindowTitle("矿井智能监测系统")
+        main_window.resize(*UI_CONFIG['window_size'])
+        if client is not None:
+            panel = MonitoringPanel()
+            panel.attach_client(client)
+            main_window.setCentralWidget(panel)
         main_window.show()
         sys.exit(app.exec())
     except Exception as e:
@@ -1,16 +1,156 @@
 """
 实时监控面板
 显示实时传感器数据和状态信息
+曲线数据由 PlotWorker 在后台线程中准备（增量读取缓冲区 + 按像素列 min/max 降采样），
+界面线程只把现成的像素坐标拷入 QPolygonF 并绘制，通道数和采样率增加时界面线程的开销基本不变。
 """
 import time
+from typing import Optional
+import numpy as np
+from PyQt6.QtCore import Qt, QRectF, pyqtSignal, QTimer
+from PyQt6.QtGui import QColor, QPainter, QPen, QPolygonF
 from PyQt6.QtWidgets import QWidget
 from loguru import logger
+from ..config.settings import UI_CONFIG
+from .plot_model import PlotFrame, PlotWorker, RealtimePlotModel
+
+LABEL_WIDTH = 160
+CHANNEL_COLORS = ('#4fc3f7', '#ffb74d', '#81c784', '#e57373', '#ba68c8', '#fff176')
+
+
+def _to_polygon(points: np.ndarray) -> QPolygonF:
+    """把 (k, 2) float64 像素坐标整块拷入 QPolygonF，避免逐点创建 QPointF"""
+    polygon = QPolygonF()
+    polygon.resize(len(points))
+    ptr = polygon.data()
+    ptr.setsize(points.nbytes)
+    np.frombuffer(ptr, dtype=np.float64)[:] = points.ravel()
+    return polygon
+
 
 class MonitoringPanel(QWidget):
-    def __init__(self):
+    frame_ready = pyqtSignal()
+
+    def __init__(self, data_collector=None, collector_manager=None):
         super().__init__()
+        self.model = RealtimePlotModel(UI_CONFIG['plot_window_seconds'])
+        self.worker = PlotWorker(self.model, UI_CONFIG['plot_fps'], self.frame_ready.emit)
+        self.frame: Optional[PlotFrame] = None
+        self.polygons = []
+        self.status = {}
+        self.data_collector = None
+        self.collector_manager = None
+        self.client = None
+        # 跨线程信号以排队方式投递到界面线程
+        self.frame_ready.connect(self.refresh, Qt.ConnectionType.QueuedConnection)
+        self.status_timer = QTimer(self)
+        self.status_timer.timeout.connect(self.update_data)
+        self.status_timer.start(UI_CONFIG['update_interval'])
+        self.setMinimumHeight(UI_CONFIG['plot_lane_min_height'] * 3)
+        self.set_sources(data_collector, collector_manager)
+
+    def set_sources(self, data_collector=None, collector_manager=None):
+        """以采集器和多设备管理器中各设备缓冲区的每个字段作为一个通道"""
+        self.data_collector = data_collector
+        self.collector_manager = collector_manager
+        buffers = {}
+        if data_collector is not None:
+            buffers[data_collector.device_id] = data_collector.data_buffer
+        if collector_manager is not None:
+            buffers.update((device_id, channel.buffer) for device_id, channel in collector_manager.channels.items())
+        self.set_buffers(buffers)
+
+    def attach_client(self, client):
+        """挂载到独立的采集进程：曲线直接读取共享内存缓冲区，状态取自服务端推送的统计"""
+        self.data_collector = self.collector_manager = None
+        self.client = client
+        self.set_buffers(client.rings)
+
+    def set_buffers(self, buffers):
+        self.model.clear()
+        for device_id, buffer in buffers.items():
+            for field in buffer.fields:
+                if field != 'timestamp':
+                    self.model.add_channel(f"{device_id}/{field}", buffer, field)
+        self._resize_model()
+
+    def _resize_model(self):
+        count = max(1, len(self.model.channels))
+        self.model.resize(max(1, self.width() - LABEL_WIDTH), self.height() / count)
+
+    def resizeEvent(self, event):
+        self._resize_model()
+        super().resizeEvent(event)
+
+    def showEvent(self, event):
+        self.worker.start()
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self.worker.stop()
+        super().hideEvent(event)
+
+    def closeEvent(self, event):
+        self.worker.stop()
+        self.status_timer.stop()
+        super().closeEvent(event)
+
     def update_data(self):
-        pass
+        """按 update_interval 刷新状态信息（采集速率、连接状态等），与曲线刷新互不影响"""
+        try:
+            status = {}
+            if self.data_collector is not None:
+                stats = self.data_collector.stats
+                status['采集速率'] = f"{stats['data_rate']:.0f} 条/秒"
+                status['连接'] = '已连接' if stats['connection_status'] else '未连接'
+            if self.collector_manager is not None:
+                stats = self.collector_manager.get_stats()
+                status['设备'] = f"{stats['connected']}/{len(stats['devices'])}"
+            if self.client is not None:
+                stats = self.client.stats
+                if 'collector' in stats:
+                    status['采集速率'] = f"{stats['collector']['data_rate']:.0f} 条/秒"
+                status['采集服务'] = f"pid {self.client.service_pid}" if self.client.is_connected else '已断开'
+            worker = self.worker.stats
+            status['绘图'] = f"{worker['prepare_avg'] * 1000:.1f} ms/帧, 跳过 {worker['skipped']}"
+            self.status = status
+        except Exception as e:
+            logger.error(f"更新监控状态失败: {e}")
 
     def refresh(self):
-        pass
+        """在界面线程中取最新一帧；积压的通知取到 None 直接返回"""
+        frame = self.worker.take_frame()
+        if frame is None:
+            return
+        self.frame = frame
+        self.polygons = [_to_polygon(points) if len(points) else None for points in frame.lanes]
+        self.update()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), QColor('#1e1e1e'))
+        frame = self.frame
+        if frame is None or not frame.names:
+            painter.setPen(QColor('#888888'))
+            painter.drawText(self.rect(), Qt.AlignmentFlag.AlignCenter, '等待数据...')
+            painter.end()
+            return
+        lane_height = self.height() / len(frame.names)
+        for i, (name, polygon, (vmin, vmax), latest) in enumerate(zip(frame.names, self.polygons, frame.ranges, frame.latest)):
+            top = i * lane_height
+            painter.setPen(QColor('#333333'))
+            painter.drawLine(0, int(top), self.width(), int(top))
+            painter.setPen(QColor('#cccccc'))
+            label = f"{name}  {latest:.2f}" if latest == latest else name
+            painter.drawText(QRectF(4, top, LABEL_WIDTH - 8, lane_height), Qt.AlignmentFlag.AlignVCenter, label)
+            if polygon is None:
+                continue
+            painter.save()
+            painter.translate(LABEL_WIDTH, top)
+            painter.setPen(QPen(QColor(CHANNEL_COLORS[i % len(CHANNEL_COLORS)]), 0))
+            painter.drawPolyline(polygon)
+            painter.restore()
+        painter.setPen(QColor('#888888'))
+        painter.drawText(QRectF(LABEL_WIDTH, 0, self.width() - LABEL_WIDTH - 4, 16), Qt.AlignmentFlag.AlignRight,
+                         '  '.join(f"{k}: {v}" for k, v in self.status.items()) or time.strftime('%H:%M:%S'))
+        painter.end()
@@ -0,0 +1,225 @@
+"""
+实时曲线数据模型
+不依赖 Qt：从采集器的环形缓冲区按追加序号增量读取新样本（零拷贝视图），按像素列做 min/max 降采样，
+每一列对应固定的绝对时间区间，窗口滚动时只需覆盖过期的列，不必重算整个窗口。
+PlotWorker 在后台线程中按显示刷新率生成帧，界面线程只取最新一帧绘制，来不及绘制的帧直接被覆盖。
+"""
+import math
+import threading
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+import numpy as np
+from loguru import logger
+from ..config.settings import UI_CONFIG
+from ..utils.ring_buffer import SensorRingBuffer
+
+
+class PlotFrame(NamedTuple):
+    """
+    一帧绘图数据。names[i] 通道在 lanes[i] 中的折线为 (k, 2) 的像素坐标（列内 min/max 交替，已按泳道自动缩放），
+    ranges[i] 为该通道可见数据的 (最小值, 最大值)，latest[i] 为最新值。
+    """
+    end_time: float
+    window: float
+    names: Tuple[str, ...]
+    lanes: Tuple[np.ndarray, ...]
+    ranges: Tuple[Tuple[float, float], ...]
+    latest: Tuple[float, ...]
+
+
+class BufferTrack:
+    """单个缓冲区的降采样状态；同一缓冲区的多个字段共用时间分桶"""
+    def __init__(self, buffer: SensorRingBuffer, columns: int, window: float):
+        self.buffer = buffer
+        self.fields: List[str] = []
+        self.rows: List[int] = []
+        self.columns = columns
+        self.bin_width = window / columns
+        self._time_row = buffer.fields.index('timestamp')
+        self.reset()
+
+    def add_field(self, field: str):
+        self.fields.append(field)
+        self.rows.append(self.buffer.fields.index(field))
+        self.reset()
+
+    def reset(self):
+        """清空分桶，下次 update 时从缓冲区回填整个窗口"""
+        self.bin_ids = np.full(self.columns, -1, dtype=np.int64)
+        self.mins = np.full((len(self.rows), self.columns), np.nan)
+        self.maxs = np.full((len(self.rows), self.columns), np.nan)
+        self.last_values = np.full(len(self.rows), np.nan)
+        self.seen = 0
+
+    def update(self, now: float) -> int:
+        """把上次以来的新样本并入分桶，返回处理的样本数"""
+        total = self.buffer.total_count
+        if total == self.seen or not self.rows:
+            return 0
+        view = self.buffer.between_counts(self.seen, total)
+        self.seen = total
+        times = view[self._time_row]
+        first_bin = math.floor(now / self.bin_width) - self.columns + 1
+        # 时间戳单调递增，只保留落在当前窗口内的部分
+        start = int(np.searchsorted(times, first_bin * self.bin_width, side='left'))
+        if start >= len(times):
+            return 0
+        times = times[start:]
+        values = view[self.rows, start:]
+        self.last_values = values[:, -1].copy()
+        bins = np.floor(times / self.bin_width).astype(np.int64)
+        starts = np.flatnonzero(np.diff(bins, prepend=bins[0] - 1))
+        unique = bins[starts]
+        new_min = np.fmin.reduceat(values, starts, axis=1)
+        new_max = np.fmax.reduceat(values, starts, axis=1)
+        slots = unique % self.columns
+        same = self.bin_ids[slots] == unique
+        self.mins[:, slots] = np.where(same, np.fmin(self.mins[:, slots], new_min), new_min)
+        self.maxs[:, slots] = np.where(same, np.fmax(self.maxs[:, slots], new_max), new_max)
+        self.bin_ids[slots] = unique
+        return len(times)
+
+    def visible(self, now: float):
+        """当前窗口各列的 (有效列掩码, mins, maxs)，列按时间从旧到新排列"""
+        last_bin = math.floor(now / self.bin_width)
+        ids = np.arange(last_bin - self.columns + 1, last_bin + 1)
+        slots = ids % self.columns
+        valid = self.bin_ids[slots] == ids
+        return valid, self.mins[:, slots], self.maxs[:, slots]
+
+
+class RealtimePlotModel:
+    """
+    多通道实时曲线模型。通道来自任意 SensorRingBuffer 字段；columns 应等于绘图区宽度（像素），
+    每通道每帧最多 2 * columns 个点，与采样率无关。update() 只应在一个线程中调用。
+    """
+    def __init__(self, window: Optional[float] = None, columns: int = 800, lane_height: float = 60.0):
+        self.window = window or UI_CONFIG['plot_window_seconds']
+        self.columns = max(1, columns)
+        self.lane_height = lane_height
+        self.channels: List[Tuple[str, BufferTrack, int]] = []
+        self.tracks: Dict[int, BufferTrack] = {}
+        self._lock = threading.Lock()
+
+    def add_channel(self, name: str, buffer: SensorRingBuffer, field: str):
+        with self._lock:
+            track = self.tracks.get(id(buffer))
+            if track is None:
+                track = self.tracks[id(buffer)] = BufferTrack(buffer, self.columns, self.window)
+            track.add_field(field)
+            self.channels.append((name, track, len(track.fields) - 1))
+
+    def clear(self):
+        with self._lock:
+            self.channels = []
+            self.tracks = {}
+
+    def resize(self, columns: int, lane_height: float):
+        """绘图区尺寸变化时调用；列数变化会重建分桶并从缓冲区回填"""
+        columns = max(1, int(columns))
+        with self._lock:
+            self.lane_height = lane_height
+            if columns == self.columns:
+                return
+            self.columns = columns
+            for track in self.tracks.values():
+                track.columns = columns
+                track.bin_width = self.window / columns
+                track.reset()
+
+    def update(self, now: Optional[float] = None) -> PlotFrame:
+        now = time.time() if now is None else now
+        with self._lock:
+            visible = {}
+            for key, track in self.tracks.items():
+                track.update(now)
+                visible[key] = track.visible(now)
+            names, lanes, ranges, latest = [], [], [], []
+            for name, track, index in self.channels:
+                valid, mins, maxs = visible[id(track.buffer)]
+                columns = np.flatnonzero(valid & ~np.isnan(mins[index]))
+                lo, hi = mins[index, columns], maxs[index, columns]
+                names.append(name)
+                latest.append(float(track.last_values[index]))
+                if not columns.size:
+                    lanes.append(np.empty((0, 2)))
+                    ranges.append((math.nan, math.nan))
+                    continue
+                vmin, vmax = float(lo.min()), float(hi.max())
+                scale = (self.lane_height - 1) / (vmax - vmin) if vmax > vmin else 0.0
+                points = np.empty((2 * columns.size, 2))
+                points[0::2, 0] = points[1::2, 0] = columns
+                # 像素坐标 y 向下增大，最大值在泳道顶部
+                points[0::2, 1] = (vmax - lo) * scale
+                points[1::2, 1] = (vmax - hi) * scale
+                lanes.append(points)
+                ranges.append((vmin, vmax))
+        return PlotFrame(now, self.window, tuple(names), tuple(lanes), tuple(ranges), tuple(latest))
+
+
+class PlotWorker:
+    """
+    后台线程按 fps 生成帧，只保留最新一帧；每生成一帧调用一次 notify（界面侧通常是 pyqtSignal.emit），
+    界面线程在槽函数中调用 take_frame() 取帧，多余的通知取到 None 直接返回，刷新自然合并到显示刷新率。
+    """
+    def __init__(self, model: RealtimePlotModel, fps: Optional[float] = None, notify: Optional[Callable[[], None]] = None):
+        self.model = model
+        self.interval = 1.0 / (fps or UI_CONFIG['plot_fps'])
+        self.notify = notify
+        self._frame: Optional[PlotFrame] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+        self.stats = {'frames': 0, 'taken': 0, 'skipped': 0, 'prepare_avg': 0.0, 'prepare_max': 0.0}
+
+    @property
+    def is_running(self) -> bool:
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self):
+        if self.is_running:
+            return
+        self._stop.clear()
+        self.thread = threading.Thread(target=self._run, name='PlotWorker', daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout: float = 1.0):
+        self._stop.set()
+        if self.thread and self.thread is not threading.current_thread():
+            self.thread.join(timeout=timeout)
+        self.thread = None
+
+    def take_frame(self) -> Optional[PlotFrame]:
+        with self._lock:
+            frame, self._frame = self._frame, None
+        if frame is not None:
+            self.stats['taken'] += 1
+        return frame
+
+    def _run(self):
+        next_tick = time.monotonic()
+        while not self._stop.is_set():
+            started = time.perf_counter()
+            try:
+                frame = self.model.update()
+            except Exception as e:
+                logger.error(f"生成曲线帧失败: {e}")
+                frame = None
+            elapsed = time.perf_counter() - started
+            if frame is not None:
+                with self._lock:
+                    if self._frame is not None:
+                        self.stats['skipped'] += 1
+                    self._frame = frame
+                frames = self.stats['frames'] + 1
+                self.stats['frames'] = frames
+                self.stats['prepare_avg'] += (elapsed - self.stats['prepare_avg']) / frames
+                self.stats['prepare_max'] = max(self.stats['prepare_max'], elapsed)
+                if self.notify:
+                    self.notify()
+            next_tick += self.interval
+            delay = next_tick - time.monotonic()
+            if delay > 0:
+                self._stop.wait(delay)
+            else:
+                next_tick = time.monotonic()
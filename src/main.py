@@ -1,38 +1,70 @@
 """
 矿井智能监测系统主程序
+AI 分析（aiohttp）、多设备管理、采集服务 IPC 和界面只在实际用到时导入，无界面和命令行运行不承担这些模块的加载开销。
 """
 import sys
-import asyncio
+import signal
 from pathlib import Path
 from loguru import logger
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from src.core.data_collector import DataCollector
-from src.core.deepseek_ai import get_analyzer
-from src.core.alarm_system import get_alarm_system
-from src.utils.logger import setup_logger
-from src.config.settings import UI_CONFIG
+import numpy as np
+from src.core.data_collector import DataCollector, SensorData
+from src.core.alarm_system import get_alarm_system, AlarmLevel
+from src.utils.database import get_database_manager
+from src.utils.retention import RetentionManager
+from src.utils.logger import register_log_metrics, setup_logger
+from src.utils.metrics import start_metrics_server, stop_metrics_server
+from src.utils.profiler import install_signal_handlers, register_debug_routes, get_tracer
+from src.config.settings import DEEPSEEK_CONFIG, DEVICES_CONFIG, LOGGING_CONFIG, MOCK_CONFIG, METRICS_CONFIG, PROFILER_CONFIG
 
 
 class MineMonitoringSystem:
     """主类"""
-    def __init__(self, use_mock_data: bool = True):
+    def __init__(self, use_mock_data: bool = True, buffer_factory=None):
+        """buffer_factory(device_id, capacity) 替换各设备的进程内缓冲区，采集服务模式下用于创建共享内存缓冲区"""
         self.use_mock_data = use_mock_data
+        self.buffer_factory = buffer_factory
         self.data_collector = None
         self.ai_analyzer = None
         self.alarm_system = None
+        self.async_runtime = None
+        self.ai_scheduler = None
+        self.retention_manager = None
+        self.collector_manager = None
         self.is_running = False
         setup_logger()
         logger.info("矿井监测系统启动中...")
+        if METRICS_CONFIG['enabled']:
+            # 须在创建各组件之前启用，组件构造时才会登记真实的指标对象
+            try:
+                register_debug_routes(start_metrics_server())
+                register_log_metrics()
+            except OSError as e:
+                logger.error(f"指标端点启动失败: {e}")
     
     def initialize(self):
         try:
-            self.data_collector = DataCollector(use_mock=self.use_mock_data)
-            self.ai_analyzer = get_analyzer()
+            self.data_collector = DataCollector(use_mock=self.use_mock_data, buffer_factory=self.buffer_factory)
             self.alarm_system = get_alarm_system()
-            self.data_collector.subscribe(self._on_data_received)
+            if DEEPSEEK_CONFIG['api_key']:
+                from src.core.deepseek_ai import get_analyzer
+                from src.core.async_runtime import AsyncLoopThread, AIJobScheduler
+                self.ai_analyzer = get_analyzer()
+                self.async_runtime = AsyncLoopThread('ai-loop')
+                self.ai_scheduler = AIJobScheduler(self.async_runtime)
+            else:
+                logger.info("未配置DeepSeek API密钥，AI分析已关闭")
+            self.retention_manager = RetentionManager(get_database_manager())
+            # 报警检查不能漏掉样本：队列满时反压采集线程，而不是丢弃批次
+            self.data_collector.subscribe(self._on_data_batch, name='alarm_check', maxsize=10000, policy='wait', batch=True)
             self.alarm_system.add_alarm_callback(self._on_alarm_triggered)
+            if DEVICES_CONFIG['devices']:
+                # 额外配置的设备由采集管理器统一读取，每个设备拥有独立的缓冲区和报警状态
+                from src.core.collector_manager import CollectorManager
+                self.collector_manager = CollectorManager(buffer_factory=self.buffer_factory)
+                self.collector_manager.add_alarm_callback(self._on_alarm_triggered)
             return True
         except Exception as e:
             logger.error(f"初始化失败: {e}")
@@ -42,9 +74,15 @@ class MineMonitoringSystem:
         try:
             if not self.initialize():
                 return False
+            get_database_manager().start_alarm_writer()
             if not self.data_collector.start(port, baudrate):
                 logger.error("数据采集启动失败")
                 return False
+            if self.async_runtime and self.async_runtime.start():
+                self.ai_analyzer.set_session(self.async_runtime.session)
+            if self.collector_manager:
+                self.collector_manager.start()
+            self.retention_manager.start()
             self.is_running = True
             self.alarm_system.test_alarm_system()
             return True
@@ -55,47 +93,97 @@ class MineMonitoringSystem:
     def stop(self):
         try:
             self.is_running = False
+            if self.ai_scheduler:
+                self.ai_scheduler.cancel_all()
+            if self.retention_manager:
+                self.retention_manager.stop()
+            if self.collector_manager:
+                self.collector_manager.stop()
             if self.data_collector:
                 self.data_collector.stop()
+            get_database_manager().stop_alarm_writer()
+            if self.async_runtime:
+                self.async_runtime.stop()
+                self.ai_analyzer.set_session(None)
+            stop_metrics_server()
             logger.info("系统已停止")
         except Exception as e:
             logger.error(f"停止时发生错误: {e}")
     
-    def _on_data_received(self, sensor_data):
+    def _on_data_batch(self, rows):
         try:
-            alarms = self.alarm_system.check_sensor_data(sensor_data.to_dict())
+            rows = np.asarray(rows, dtype=np.float64)
+            if not len(rows):
+                return
+            _, alarms = self.alarm_system.check_sensor_batch(rows)
             if alarms:
-                logger.warning(f"检测到 {len(alarms)} 个报警事件")
-            import time
-            if hasattr(self, '_last_ai_analysis'):
-                if time.time() - self._last_ai_analysis > 60:
-                    asyncio.create_task(self._perform_ai_analysis(sensor_data))
-                    self._last_ai_analysis = time.time()
-            else:
-                self._last_ai_analysis = time.time()
-                asyncio.create_task(self._perform_ai_analysis(sensor_data))
+                logger.bind(log_key='alarm_batch').warning(f"检测到 {len(alarms)} 个报警事件")
+            if self.ai_scheduler is None:
+                return
+            # 调度器负责节流与合并，这里只登记任务，不阻塞数据路径；AI分析只关心整批中的最新样本
+            sensor_data = SensorData._make(rows[-1].tolist())
+            self.ai_scheduler.submit('safety', lambda: self._perform_ai_analysis(sensor_data))
         except Exception as e:
             logger.error(f"处理数据时发生错误: {e}")
     
+    def _analysis_window(self):
+        window, rollup = self.data_collector.get_analysis_window(1)
+        return window.copy(), rollup
+
     async def _perform_ai_analysis(self, sensor_data):
+        import asyncio
         try:
-            historical_data = self.data_collector.get_recent_data(hours=1)
-            historical_dict = [data.to_dict() for data in historical_data]
-            safety_result = await self.ai_analyzer.analyze_safety_status(
-                sensor_data.to_dict(), historical_dict
-            )
+            historical_data, rollup = await asyncio.to_thread(self._analysis_window)
+            safety_result = await self.ai_analyzer.analyze_safety_status(sensor_data, historical_data, rollup)
             if safety_result:
                 logger.info(f"AI安全分析: {safety_result.risk_level} - {safety_result.result}")
                 if safety_result.risk_level in ['危险', '警告']:
                     self.alarm_system.trigger_system_alarm(
                         f"AI检测到风险: {safety_result.result}",
-                        level=self.alarm_system.AlarmLevel.WARNING
+                        level=AlarmLevel.WARNING
                     )
         except Exception as e:
             logger.error(f"AI分析失败: {e}")
     
     def _on_alarm_triggered(self, alarm_event):
-        logger.warning(f"报警触发: {alarm_event.message}")
+        # 报警风暴时同一类报警按键限流合并，消息中的数值不同也视为同类
+        key = f"alarm:{alarm_event.device_id}:{alarm_event.alarm_type.value}:{alarm_event.parameter_name}:{alarm_event.alarm_level.value}"
+        logger.bind(log_key=key).warning(f"报警触发: {alarm_event.message}")
+
+
+def run_headless(args):
+    """采集服务模式：采集、存储和报警在本进程运行，界面进程通过共享内存和 IPC 挂载"""
+    from src.core.acquisition_service import AcquisitionService
+    service = AcquisitionService()
+    system = MineMonitoringSystem(use_mock_data=args.mock, buffer_factory=service.create_ring)
+    install_signal_handlers()
+    signal.signal(signal.SIGTERM, lambda signum, frame: service.stop())
+    if args.trace:
+        get_tracer().enable(args.trace)
+    try:
+        if system.start(args.port, args.baudrate):
+            service.serve(system)
+        else:
+            logger.error("系统启动失败")
+    finally:
+        system.stop()
+        service.close()
+
+
+def service_args(args) -> list:
+    """把采集相关的命令行参数转交给自动拉起的采集服务"""
+    forwarded = ['--baudrate', str(args.baudrate)]
+    if args.port:
+        forwarded += ['--port', args.port]
+    if args.mock:
+        forwarded.append('--mock')
+    if args.mock_rate:
+        forwarded += ['--mock-rate', str(args.mock_rate)]
+    if args.metrics or args.metrics_port:
+        forwarded += ['--metrics-port', str(METRICS_CONFIG['port'])]
+    if args.log_json:
+        forwarded.append('--log-json')
+    return forwarded
 
 
 def main():
@@ -104,9 +192,44 @@ def main():
     parser.add_argument('--port', type=str)
     parser.add_argument('--baudrate', type=int, default=115200)
     parser.add_argument('--mock', action='store_true')
+    parser.add_argument('--mock-rate', type=float, help='模拟设备每秒样本数 (1 ~ 10000)')
     parser.add_argument('--gui', action='store_true')
+    parser.add_argument('--headless', action='store_true', help='无界面采集服务模式，界面可通过 --gui --attach 挂载')
+    parser.add_argument('--attach', action='store_true', help='与 --gui 同用：挂载到采集服务（未运行时自动启动），界面重启不中断采集')
+    parser.add_argument('--metrics', action='store_true', help='启用运行指标并在本地提供 Prometheus 格式的 /metrics 端点')
+    parser.add_argument('--metrics-port', type=int, help=f"指标端点端口，默认 {METRICS_CONFIG['port']}")
+    parser.add_argument('--trace', type=float, nargs='?', const=PROFILER_CONFIG['trace_fraction'], metavar='FRACTION',
+                        help='启动即开启样本阶段追踪，可指定抽样比例')
+    parser.add_argument('--log-json', action='store_true', help=f"额外输出 JSON-lines 日志到 {LOGGING_CONFIG['json_path']}")
     args = parser.parse_args()
+    if args.log_json:
+        LOGGING_CONFIG['json'] = True
+    setup_logger()
+    if args.mock_rate:
+        MOCK_CONFIG['rate'] = args.mock_rate
+    if args.metrics or args.metrics_port:
+        METRICS_CONFIG['enabled'] = True
+    if args.metrics_port:
+        METRICS_CONFIG['port'] = args.metrics_port
+    if args.headless:
+        run_headless(args)
+        return
+    if args.gui and args.attach:
+        from src.gui.main_window import run_gui
+        from src.core.acquisition_service import attach_or_spawn
+        client = attach_or_spawn(service_args(args))
+        if client is None:
+            logger.error("无法连接采集服务")
+            return
+        try:
+            run_gui(client=client)
+        finally:
+            client.close()
+        return
     system = MineMonitoringSystem(use_mock_data=args.mock)
+    install_signal_handlers()
+    if args.trace:
+        get_tracer().enable(args.trace)
     try:
         if args.gui:
             from src.gui.main_window import run_gui
@@ -0,0 +1,346 @@
+"""
+传感器数据批量写入模块
+由后台线程从有界队列中取出数据，按批次通过共享写连接写入数据库，并在同一事务内更新降采样汇总表。
+报警记录由 AlarmRecordWriter 以同样的方式批量写入。
+"""
+import queue
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence
+from loguru import logger
+from ..config.settings import ALARM_CONFIG, DB_WRITER_CONFIG
+from .rollup import upsert_rollups
+from .metrics import get_metrics
+from .profiler import get_tracer
+
+# durability 策略对应的 synchronous 模式：
+# off 由操作系统决定何时落盘；normal 在 WAL 检查点时 fsync；full 每个批次提交都 fsync
+SYNCHRONOUS_MODES = {'off': 'OFF', 'normal': 'NORMAL', 'full': 'FULL'}
+OVERFLOW_POLICIES = ('block', 'drop', 'drop_oldest')
+INSERT_SENSOR_SQL = 'INSERT INTO sensor_data (pressure, temperature, vibration, timestamp, device_id) VALUES (?, ?, ?, ?, ?)'
+INSERT_ALARM_SQL = ('INSERT INTO alarm_records (id, alarm_type, alarm_level, parameter_name, parameter_value, threshold_value, '
+                    'message, timestamp, acknowledged, device_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)')
+_STOP = object()
+
+
+class SensorDataWriter:
+    def __init__(self, db_manager, config: Optional[Dict] = None):
+        cfg = dict(DB_WRITER_CONFIG, **(config or {}))
+        if cfg['durability'] not in SYNCHRONOUS_MODES:
+            raise ValueError(f"未知的持久化策略: {cfg['durability']}")
+        if cfg['overflow'] not in OVERFLOW_POLICIES:
+            raise ValueError(f"未知的队列溢出策略: {cfg['overflow']}")
+        self.db_manager = db_manager
+        self.batch_size = cfg['batch_size']
+        self.flush_interval = cfg['flush_interval']
+        self.durability = cfg['durability']
+        self.overflow = cfg['overflow']
+        self.block_timeout = cfg['block_timeout']
+        self.queue: queue.Queue = queue.Queue(maxsize=cfg['queue_size'])
+        self.thread: Optional[threading.Thread] = None
+        self.is_running = False
+        self.stats = {'submitted': 0, 'written': 0, 'batches': 0, 'dropped': 0, 'backpressured': 0, 'errors': 0, 'last_flush': None}
+        # 统计由提交线程和写入线程共同更新
+        self._stats_lock = threading.Lock()
+        # 每个批次提交后在写入线程中以该批行调用，用于统计落库延迟等；回调应尽快返回
+        self.flush_listeners: List[Callable[[list], None]] = []
+        self._tracer = get_tracer()
+        metrics = get_metrics()
+        self._write_seconds = metrics.histogram('stage_seconds', '各处理阶段单批耗时（秒）', {'stage': 'db_write'})
+        self._batch_rows = metrics.histogram('db_write_batch_rows', '每次提交写入的行数', lowest=1.0, highest=1e7,
+                                             buckets=(1, 10, 50, 100, 500, 1000, 5000, 10000, 50000))
+        metrics.gauge('db_writer_queue_depth', '写入队列中等待的项数', fn=self.queue.qsize)
+        for key in ('written', 'dropped', 'backpressured', 'errors'):
+            metrics.gauge(f'db_writer_{key}', f'写入线程统计 {key}', fn=lambda key=key: self.stats[key])
+
+    def start(self):
+        if self.is_running:
+            return
+        self.db_manager.set_synchronous(self.durability)
+        self.is_running = True
+        self.thread = threading.Thread(target=self._run, name='SensorDataWriter')
+        self.thread.daemon = True
+        self.thread.start()
+        logger.info(f"传感器数据批量写入线程已启动 (batch={self.batch_size}, durability={self.durability})")
+
+    def stop(self, timeout: float = 5.0):
+        if not self.is_running:
+            return
+        self.is_running = False
+        self.queue.put(_STOP)
+        if self.thread:
+            self.thread.join(timeout=timeout)
+            if self.thread.is_alive():
+                logger.warning("传感器数据写入线程未能在超时内退出，部分数据可能未落盘")
+        logger.info(f"传感器数据批量写入线程已停止: 写入 {self.stats['written']} 条, 丢弃 {self.stats['dropped']} 条")
+
+    def submit(self, row: Sequence) -> bool:
+        """提交一行 (pressure, temperature, vibration, timestamp, device_id)，队列满时按溢出策略处理"""
+        return self._enqueue(row, 1)
+
+    def submit_many(self, rows: List[Sequence]) -> bool:
+        """整批提交，占用一个队列槽位；溢出策略以整批为单位生效"""
+        if not rows:
+            return True
+        return self._enqueue(rows, len(rows))
+
+    def _count(self, key: str, size: int):
+        with self._stats_lock:
+            self.stats[key] += size
+
+    def _enqueue(self, item, size: int) -> bool:
+        self._count('submitted', size)
+        try:
+            self.queue.put_nowait(item)
+            return True
+        except queue.Full:
+            pass
+        if self.overflow == 'block':
+            self._count('backpressured', size)
+            try:
+                self.queue.put(item, timeout=self.block_timeout)
+                return True
+            except queue.Full:
+                self._count('dropped', size)
+                return False
+        if self.overflow == 'drop_oldest':
+            evicted = self._replace_oldest(item)
+            if evicted:
+                self._count('dropped', evicted)
+                return True
+        self._count('dropped', size)
+        return False
+
+    def _replace_oldest(self, item) -> int:
+        """
+        在队列锁内移除最早的一项数据并把 item 放到队尾，返回移除的行数；队列中没有数据项时返回 0。
+        flush 的 Event 和停止标记不是数据，跳过不删，否则 flush 会一直等到超时、stop 之后写入线程也不会退出。
+        """
+        q = self.queue
+        with q.mutex:
+            for index, oldest in enumerate(q.queue):
+                if oldest is not _STOP and not isinstance(oldest, threading.Event):
+                    del q.queue[index]
+                    q.queue.append(item)
+                    q.not_empty.notify()
+                    return len(oldest) if isinstance(oldest, list) else 1
+        return 0
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """等待当前已提交的数据全部写入数据库"""
+        if not self.is_running:
+            return True
+        done = threading.Event()
+        try:
+            self.queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def pending(self) -> int:
+        return self.queue.qsize()
+
+    def _run(self):
+        batch = []
+        deadline = 0.0
+        try:
+            while True:
+                timeout = max(0.0, deadline - time.monotonic()) if batch else None
+                try:
+                    item = self.queue.get(timeout=timeout)
+                except queue.Empty:
+                    self._write_batch(batch)
+                    batch = []
+                    continue
+                if item is _STOP:
+                    break
+                if isinstance(item, threading.Event):
+                    self._write_batch(batch)
+                    batch = []
+                    item.set()
+                    continue
+                was_empty = not batch
+                if isinstance(item, list):
+                    batch.extend(item)
+                else:
+                    batch.append(item)
+                if was_empty:
+                    deadline = time.monotonic() + self.flush_interval
+                if len(batch) >= self.batch_size:
+                    self._write_batch(batch)
+                    batch = []
+        finally:
+            waiters = []
+            while True:
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if isinstance(item, threading.Event):
+                    waiters.append(item)
+                elif isinstance(item, list):
+                    batch.extend(item)
+                elif item is not _STOP:
+                    batch.append(item)
+            self._write_batch(batch)
+            for item in waiters:
+                item.set()
+
+    def _write_batch(self, batch):
+        if not batch:
+            return
+        started = time.perf_counter()
+        try:
+            with self.db_manager.get_connection() as conn:
+                conn.executemany(INSERT_SENSOR_SQL, batch)
+                upsert_rollups(conn, batch)
+                conn.commit()
+            self._write_seconds.observe(time.perf_counter() - started)
+            self._batch_rows.observe(len(batch))
+            if self._tracer.enabled:
+                self._tracer.mark('db_commit', [row[3] for row in batch])
+            with self._stats_lock:
+                self.stats['written'] += len(batch)
+                self.stats['batches'] += 1
+                self.stats['last_flush'] = time.time()
+        except Exception as e:
+            with self._stats_lock:
+                self.stats['errors'] += 1
+                self.stats['dropped'] += len(batch)
+            logger.error(f"批量写入传感器数据失败 ({len(batch)} 条): {e}")
+            return
+        for listener in self.flush_listeners:
+            try:
+                listener(batch)
+            except Exception as e:
+                logger.error(f"写入完成回调执行失败: {e}")
+
+
+class AlarmRecordWriter:
+    """
+    报警记录批量写入线程。行的ID由 DatabaseManager 在提交时分配，调用方不必等待落库；
+    队列满时退回调用方线程同步写入，队列本身不丢弃报警。
+    批量写入失败（如超过 busy_timeout 仍被锁）时按 retry_backoff 指数退避重试 retries 次，
+    仍失败则逐行写入，单条坏行（如主键冲突）不影响同批其他报警；确实未能写入的行数计入 stats['lost']。
+    """
+    def __init__(self, db_manager, config: Optional[Dict] = None):
+        cfg = dict(ALARM_CONFIG, **(config or {}))
+        self.db_manager = db_manager
+        self.batch_size = cfg['batch_size']
+        self.flush_interval = cfg['flush_interval']
+        self.retries = cfg['retries']
+        self.retry_backoff = cfg['retry_backoff']
+        self.queue: queue.Queue = queue.Queue(maxsize=cfg['queue_size'])
+        self.thread: Optional[threading.Thread] = None
+        self.is_running = False
+        self.stats = {'written': 0, 'batches': 0, 'overflow': 0, 'errors': 0, 'retries': 0, 'lost': 0}
+        metrics = get_metrics()
+        metrics.gauge('alarm_writer_queue_depth', '报警写入队列中等待的记录数', fn=self.queue.qsize)
+        metrics.gauge('alarm_writer_errors', '报警批量写入失败次数', fn=lambda: self.stats['errors'])
+        metrics.gauge('alarm_writer_lost', '重试和逐行写入后仍未能落库的报警记录数', fn=lambda: self.stats['lost'])
+
+    def start(self):
+        if self.is_running:
+            return
+        self.is_running = True
+        self.thread = threading.Thread(target=self._run, name='AlarmRecordWriter', daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        if not self.is_running:
+            return
+        self.is_running = False
+        self.queue.put(_STOP)
+        if self.thread:
+            self.thread.join(timeout=timeout)
+            if self.thread.is_alive():
+                logger.warning("报警记录写入线程未能在超时内退出，部分报警可能未落盘")
+
+    def submit(self, row: Sequence):
+        """row 按 INSERT_ALARM_SQL 的列顺序（含已分配的 id 和 device_id）"""
+        try:
+            self.queue.put_nowait(row)
+        except queue.Full:
+            self.stats['overflow'] += 1
+            self._write_batch([row])
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """等待已提交的报警全部落库，确认、查询前调用"""
+        if not self.is_running:
+            return True
+        done = threading.Event()
+        self.queue.put(done)
+        return done.wait(timeout)
+
+    def _run(self):
+        batch = []
+        deadline = 0.0
+        while True:
+            timeout = max(0.0, deadline - time.monotonic()) if batch else None
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                self._write_batch(batch)
+                batch = []
+                continue
+            if item is _STOP or isinstance(item, threading.Event):
+                self._write_batch(batch)
+                batch = []
+                if item is _STOP:
+                    break
+                item.set()
+                continue
+            if not batch:
+                deadline = time.monotonic() + self.flush_interval
+            batch.append(item)
+            if len(batch) >= self.batch_size:
+                self._write_batch(batch)
+                batch = []
+        while True:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if isinstance(item, threading.Event):
+                item.set()
+            elif item is not _STOP:
+                batch.append(item)
+        self._write_batch(batch)
+
+    def _write_batch(self, batch):
+        if not batch:
+            return
+        delay = self.retry_backoff
+        for attempt in range(self.retries + 1):
+            try:
+                self._insert(batch)
+                self.stats['written'] += len(batch)
+                self.stats['batches'] += 1
+                return
+            except sqlite3.IntegrityError as e:
+                # 约束冲突重试也不会成功，直接逐行写入找出坏行
+                self.stats['errors'] += 1
+                logger.warning(f"批量写入报警记录失败 ({len(batch)} 条): {e}，改为逐行写入")
+                break
+            except Exception as e:
+                self.stats['errors'] += 1
+                if attempt == self.retries:
+                    logger.warning(f"批量写入报警记录重试 {self.retries} 次仍失败 ({len(batch)} 条): {e}，改为逐行写入")
+                    break
+                self.stats['retries'] += 1
+                logger.warning(f"批量写入报警记录失败 ({len(batch)} 条): {e}，{delay:.1f} 秒后重试")
+                time.sleep(delay)
+                delay *= 2
+        for row in batch:
+            try:
+                self._insert([row])
+                self.stats['written'] += 1
+            except Exception as e:
+                self.stats['lost'] += 1
+                logger.error(f"报警记录 {row[0]} 写入失败，已丢失: {e}")
+
+    def _insert(self, rows):
+        with self.db_manager.get_connection() as conn:
+            conn.executemany(INSERT_ALARM_SQL, rows)
+            conn.commit()
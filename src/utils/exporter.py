@@ -0,0 +1,158 @@
+"""
+历史数据导出模块
+通过 DatabaseManager.iter_sensor_chunks 按固定块大小流式读取，增量写出 CSV / CSV.gz / Parquet，
+内存占用只与块大小有关；支持进度回调和取消，可在后台线程中运行
+"""
+import csv
+import gzip
+import time
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Optional
+import numpy as np
+from loguru import logger
+from ..config.settings import EXPORT_CONFIG
+
+EXPORT_COLUMNS = ('timestamp', 'device_id', 'pressure', 'temperature', 'vibration')
+EXPORT_FORMATS = ('csv', 'csv.gz', 'parquet')
+
+ProgressCallback = Callable[[int, int], None]
+
+
+def detect_format(filename) -> str:
+    name = str(filename).lower()
+    if name.endswith('.csv.gz'):
+        return 'csv.gz'
+    if name.endswith('.parquet'):
+        return 'parquet'
+    return 'csv'
+
+
+class ExportCancelled(Exception):
+    pass
+
+
+class _CsvSink:
+    def __init__(self, path: Path, compressed: bool):
+        if compressed:
+            self.file = gzip.open(path, 'wt', newline='', encoding='utf-8', compresslevel=EXPORT_CONFIG['gzip_level'])
+        else:
+            self.file = open(path, 'w', newline='', encoding='utf-8')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(EXPORT_COLUMNS)
+
+    def write(self, rows):
+        # 数据库行顺序为 (pressure, temperature, vibration, timestamp, device_id)，时间戳和设备ID放到前两列
+        self.writer.writerows((r[3], r[4], r[0], r[1], r[2]) for r in rows)
+
+    def close(self):
+        self.file.close()
+
+
+class _ParquetSink:
+    def __init__(self, path: Path):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("导出 Parquet 需要安装 pyarrow")
+        self.pa = pa
+        self.schema = pa.schema([(name, pa.string() if name == 'device_id' else pa.float64()) for name in EXPORT_COLUMNS])
+        self.writer = pq.ParquetWriter(str(path), self.schema, compression=EXPORT_CONFIG['parquet_compression'])
+
+    def write(self, rows):
+        columns = np.asarray([r[:4] for r in rows], dtype=np.float64).T
+        devices = self.pa.array([r[4] for r in rows], type=self.pa.string())
+        arrays = [self.pa.array(columns[3]), devices] + [self.pa.array(columns[i]) for i in (0, 1, 2)]
+        self.writer.write_table(self.pa.Table.from_arrays(arrays, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+class HistoryExporter:
+    def __init__(self, db_manager=None, chunk_size: Optional[int] = None):
+        if db_manager is None:
+            from .database import get_database_manager
+            db_manager = get_database_manager()
+        self.db_manager = db_manager
+        self.chunk_size = chunk_size or EXPORT_CONFIG['chunk_size']
+
+    def export(self, filename, start_time: float, end_time: Optional[float] = None, fmt: Optional[str] = None,
+               progress: Optional[ProgressCallback] = None, cancel_event: Optional[threading.Event] = None,
+               device_id: Optional[str] = None) -> Dict:
+        """
+        导出 [start_time, end_time] 内的原始数据，device_id 为 None 时导出全部设备。progress(已写行数, 预计总行数) 每块调用一次；
+        cancel_event 置位后在下一块前停止并删除未完成的文件。先写入 .part 临时文件，完成后改名。
+        """
+        fmt = fmt or detect_format(filename)
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"不支持的导出格式: {fmt}")
+        path = Path(filename)
+        tmp = path.with_name(path.name + '.part')
+        total = self.db_manager.count_sensor_rows(start_time, end_time, device_id)
+        started = time.perf_counter()
+        written = 0
+        sink = _ParquetSink(tmp) if fmt == 'parquet' else _CsvSink(tmp, fmt == 'csv.gz')
+        chunks = self.db_manager.iter_sensor_chunks(start_time, end_time, self.chunk_size, device_id)
+        try:
+            for rows in chunks:
+                if cancel_event is not None and cancel_event.is_set():
+                    raise ExportCancelled()
+                sink.write(rows)
+                written += len(rows)
+                if progress:
+                    progress(written, max(total, written))
+            sink.close()
+            tmp.replace(path)
+        except ExportCancelled:
+            sink.close()
+            tmp.unlink(missing_ok=True)
+            logger.info(f"导出已取消: {path.name} (已写 {written} 条)")
+            return {'status': 'cancelled', 'rows': written, 'path': None, 'elapsed': time.perf_counter() - started}
+        except Exception:
+            sink.close()
+            tmp.unlink(missing_ok=True)
+            raise
+        finally:
+            chunks.close()
+        elapsed = time.perf_counter() - started
+        logger.info(f"导出完成: {path} ({written} 条, {elapsed:.1f}s)")
+        return {'status': 'completed', 'rows': written, 'path': str(path), 'elapsed': elapsed}
+
+
+class ExportJob:
+    """在后台线程中运行一次导出；GUI 线程通过 progress 回调/信号获知进度，调用 cancel() 取消"""
+    def __init__(self, exporter: HistoryExporter, filename, start_time: float, end_time: Optional[float] = None,
+                 fmt: Optional[str] = None, progress: Optional[ProgressCallback] = None,
+                 on_finished: Optional[Callable[[Dict], None]] = None, device_id: Optional[str] = None):
+        self.cancel_event = threading.Event()
+        self.result: Optional[Dict] = None
+        self._on_finished = on_finished
+        self._args = (filename, start_time, end_time, fmt, progress, self.cancel_event, device_id)
+        self.thread = threading.Thread(target=self._run, args=(exporter,), name='HistoryExport')
+        self.thread.daemon = True
+
+    def start(self) -> 'ExportJob':
+        self.thread.start()
+        return self
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def join(self, timeout: Optional[float] = None) -> Optional[Dict]:
+        self.thread.join(timeout)
+        return self.result
+
+    @property
+    def is_running(self) -> bool:
+        return self.thread.is_alive()
+
+    def _run(self, exporter: HistoryExporter):
+        try:
+            self.result = exporter.export(*self._args)
+        except Exception as e:
+            logger.error(f"导出失败: {e}")
+            self.result = {'status': 'failed', 'rows': 0, 'path': None, 'error': str(e)}
+        if self._on_finished:
+            self._on_finished(self.result)
@@ -8,6 +8,7 @@ import hashlib
 from datetime import datetime, timedelta
 from typing import Any, Dict, List, Optional, Union
 from pathlib import Path
+import numpy as np
 
 
 def timestamp_to_datetime(timestamp: float) -> datetime:
@@ -29,28 +30,140 @@ def safe_float(value: Any, default: float = 0.0) -> float:
         return default
 
 
+def moving_average_array(data, window_size: int = 5) -> np.ndarray:
+    """
+    calculate_moving_average 的NumPy实现，基于前缀和，O(n)。
+    前 window_size-1 个点保持原值；数据长度小于窗口时原样返回。
+    前缀和只累加有限值且先减去其均值：带大偏移的数据（如时间戳）直接累加会让前缀和变得很大，窗口差值损失精度。
+    NaN/inf 另按窗口计数，只影响包含它们的窗口（含 NaN 或正负 inf 同时出现为 NaN，否则为对应符号的 inf），与逐窗口求和一致。
+    """
+    if window_size <= 0:
+        raise ZeroDivisionError("window_size 必须为正整数")
+    arr = np.asarray(data, dtype=np.float64)
+    result = arr.copy()
+    if arr.size < window_size:
+        return result
+    finite = np.isfinite(arr)
+    center = arr[finite].mean() if finite.any() else 0.0
+    window_sums = _window_sums(np.where(finite, arr - center, 0.0), window_size)
+    result[window_size - 1:] = window_sums / window_size + center
+    if not finite.all():
+        nan = _window_sums(np.isnan(arr), window_size)
+        pos = _window_sums(arr == np.inf, window_size)
+        neg = _window_sums(arr == -np.inf, window_size)
+        tail = result[window_size - 1:]
+        tail[pos > 0] = np.inf
+        tail[neg > 0] = -np.inf
+        tail[(nan > 0) | ((pos > 0) & (neg > 0))] = np.nan
+    return result
+
+
+def _window_sums(arr: np.ndarray, window_size: int) -> np.ndarray:
+    """长度为 len(arr)-window_size+1 的滑动窗口和"""
+    csum = np.cumsum(arr, dtype=np.float64 if arr.dtype.kind == 'f' else np.int64)
+    sums = csum[window_size - 1:].copy()
+    sums[1:] -= csum[:-window_size]
+    return sums
+
+
 def calculate_moving_average(data: List[float], window_size: int = 5) -> List[float]:
     if len(data) < window_size:
         return data
-    result = []
-    for i in range(len(data)):
-        if i < window_size - 1:
-            result.append(data[i])
-        else:
-            window_data = data[i - window_size + 1:i + 1]
-            avg = sum(window_data) / len(window_data)
-            result.append(avg)
-    return result
+    return moving_average_array(data, window_size).tolist()
+
+
+def moving_average_chunked(data, window_size: int = 5, chunk_size: int = 1_000_000, out=None) -> np.ndarray:
+    """
+    分块计算移动平均，适用于 np.memmap 等超出内存的数组；out 可传入同样长度的 memmap 用于写出结果。
+    块之间携带前一块末尾的 window_size-1 个点，结果与 moving_average_array 一致。
+    """
+    if window_size <= 0:
+        raise ZeroDivisionError("window_size 必须为正整数")
+    n = len(data)
+    if out is None:
+        out = np.empty(n, dtype=np.float64)
+    tail = np.empty(0, dtype=np.float64)
+    for start in range(0, n, chunk_size):
+        chunk = np.asarray(data[start:start + chunk_size], dtype=np.float64)
+        joined = np.concatenate([tail, chunk]) if tail.size else chunk
+        out[start:start + len(chunk)] = moving_average_array(joined, window_size)[tail.size:]
+        if window_size > 1:
+            tail = joined[-(window_size - 1):]
+    return out
+
+
+def detect_anomalies_array(data, threshold: float = 2.0) -> np.ndarray:
+    """detect_anomalies 的NumPy实现：|x - mean| > threshold * 总体标准差 的下标"""
+    arr = np.asarray(data, dtype=np.float64)
+    if arr.size < 3:
+        return np.empty(0, dtype=np.intp)
+    return np.flatnonzero(np.abs(arr - arr.mean()) > threshold * arr.std())
 
 
 def detect_anomalies(data: List[float], threshold: float = 2.0) -> List[int]:
-    if len(data) < 3:
+    return detect_anomalies_array(data, threshold).tolist()
+
+
+def detect_anomalies_robust(data, threshold: float = 3.5) -> List[int]:
+    """
+    基于中位数绝对偏差(MAD)的稳健异常检测，修正 z 分数 0.6745*(x-median)/MAD 超过 threshold 即为异常。
+    MAD 为0（一半以上的点相同）时退化为平均绝对偏差。
+    """
+    arr = np.asarray(data, dtype=np.float64)
+    if arr.size < 3:
         return []
-    mean = sum(data) / len(data)
-    variance = sum((x - mean) ** 2 for x in data) / len(data)
-    std_dev = variance ** 0.5
-    anomalies = []
-    for i, value in enumerate(data):
-        if abs(value - mean) > threshold * std_dev:
-            anomalies.append(i)
-    return anomalies
+    median = np.median(arr)
+    deviation = np.abs(arr - median)
+    mad = np.median(deviation)
+    if mad > 0:
+        scores = 0.6745 * deviation / mad
+    else:
+        mean_ad = deviation.mean()
+        if mean_ad == 0:
+            return []
+        scores = deviation / (1.253314 * mean_ad)
+    return np.flatnonzero(scores > threshold).tolist()
+
+
+def detect_anomalies_chunked(data, threshold: float = 2.0, chunk_size: int = 1_000_000) -> np.ndarray:
+    """两遍分块扫描：先用 Chan 合并公式累积均值和方差，再逐块筛选下标，内存占用与 chunk_size 成正比"""
+    n = len(data)
+    if n < 3:
+        return np.empty(0, dtype=np.intp)
+    count, mean, m2 = 0, 0.0, 0.0
+    for start in range(0, n, chunk_size):
+        chunk = np.asarray(data[start:start + chunk_size], dtype=np.float64)
+        c_count, c_mean = chunk.size, chunk.mean()
+        c_m2 = float(((chunk - c_mean) ** 2).sum())
+        delta = c_mean - mean
+        total = count + c_count
+        mean += delta * c_count / total
+        m2 += c_m2 + delta * delta * count * c_count / total
+        count = total
+    limit = threshold * (m2 / count) ** 0.5
+    found = []
+    for start in range(0, n, chunk_size):
+        chunk = np.asarray(data[start:start + chunk_size], dtype=np.float64)
+        found.append(np.flatnonzero(np.abs(chunk - mean) > limit) + start)
+    return np.concatenate(found)
+
+
+class RateLimiter:
+    """滑动窗口限流器：time_window 秒内最多允许 max_calls 次调用"""
+    def __init__(self, max_calls: int, time_window: float):
+        self.max_calls = max_calls
+        self.time_window = time_window
+        self.calls: List[float] = []
+
+    def is_allowed(self) -> bool:
+        now = time.time()
+        self.calls = [t for t in self.calls if now - t < self.time_window]
+        if len(self.calls) >= self.max_calls:
+            return False
+        self.calls.append(now)
+        return True
+
+    def wait_time(self) -> float:
+        if len(self.calls) < self.max_calls:
+            return 0.0
+        return max(0.0, self.time_window - (time.time() - self.calls[0]))
@@ -1,29 +1,252 @@
 """
 日志管理模块
-配置和管理系统日志
+配置和管理系统日志。
+异步模式（LOGGING_CONFIG['async']）下每个输出都是一个 QueuedSink：调用方线程只格式化消息并放入有界队列，
+终端和文件由后台线程批量写入，串口接收、报警回调等线程不再等待日志 I/O；队列满时丢弃新消息并计数。
+重复日志按键限流：同一键在 rate_limit_interval 秒内最多输出 rate_limit_burst 条，其余合并计数，
+窗口过后的下一条附注合并的条数。键默认为 (模块, 行号, 消息)，即只合并内容完全相同的日志；
+内容随数值变化的日志（如报警）用 logger.bind(log_key=...) 指定键，按类别合并。
+可选的 JSON-lines 输出（LOGGING_CONFIG['json']）每行一个紧凑的 JSON 对象，离线处理无需按格式解析文本。
 """
+import atexit
+import copy
+import json
+import queue
 import sys
-from pathlib import Path
+import threading
+import time
+import traceback
+from typing import Callable, Dict, List, Optional
 from loguru import logger
 from ..config.settings import LOGGING_CONFIG
 
+CONSOLE_FORMAT = "<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan> | <level>{message}</level>"
+# 写入线程每次最多合并写出的消息数
+WRITE_BATCH = 1000
+_STOP = object()
 
-def setup_logger():
+_configured = False
+_atexit_registered = False
+_patcher_installed = False
+_rate_limiter: Optional['LogRateLimiter'] = None
+_sinks: Dict[str, 'QueuedSink'] = {}
+_writers: List = []
+
+
+class LogRateLimiter:
+    """按键的固定窗口限流；作为 loguru patcher 对每条日志只判断一次，被合并的日志由各输出的 filter 丢弃"""
+    def __init__(self, interval: float, burst: int, max_keys: int):
+        self.interval = interval
+        self.burst = burst
+        self.max_keys = max_keys
+        self.suppressed = 0
+        # 键 -> [窗口开始时间, 窗口内已输出条数, 窗口内已合并条数]
+        self._windows: Dict = {}
+        self._lock = threading.Lock()
+
+    def patch(self, record):
+        extra = record['extra']
+        key = extra.get('log_key') or (record['name'], record['line'], record['message'])
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= self.interval:
+                if window is None and len(self._windows) >= self.max_keys:
+                    self._prune(now)
+                self._windows[key] = [now, 1, 0]
+                if window is not None and window[2]:
+                    record['message'] += f" (此前另有 {window[2]} 条同类日志已合并)"
+                return
+            if window[1] < self.burst:
+                window[1] += 1
+                return
+            window[2] += 1
+            self.suppressed += 1
+        extra['_log_drop'] = True
+
+    def _prune(self, now: float):
+        for key in [key for key, window in self._windows.items() if now - window[0] >= self.interval]:
+            del self._windows[key]
+        if len(self._windows) >= self.max_keys:
+            # 大量互不相同的活跃消息，放弃已有窗口，避免键表无限增长
+            self._windows.clear()
+
+
+class QueuedSink:
+    """
+    loguru 的可调用 sink。target 在写入线程中以一批已格式化的消息（带 .record 的 str）调用；
+    （不能命名为 write：带 write 属性的对象会被 loguru 当作流直接同步写入）
+    日志不反压数据路径，队列满时直接丢弃，丢弃数见 stats。
+    """
+    def __init__(self, name: str, target: Callable[[List[str]], None], maxsize: int):
+        self.name = name
+        self.target = target
+        self.queue: queue.Queue = queue.Queue(maxsize=maxsize)
+        self.stats = {'written': 0, 'dropped': 0, 'errors': 0}
+        self.thread = threading.Thread(target=self._run, name=f'LogWriter-{name}', daemon=True)
+        self.thread.start()
+
+    def __call__(self, message):
+        try:
+            self.queue.put_nowait(message)
+        except queue.Full:
+            self.stats['dropped'] += 1
+
+    def flush(self, timeout: float = 2.0) -> bool:
+        """等待已入队的日志写出"""
+        done = threading.Event()
+        try:
+            self.queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def stop(self, timeout: float = 2.0):
+        try:
+            self.queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            return
+        self.thread.join(timeout)
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < WRITE_BATCH:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            messages = [item for item in batch if isinstance(item, str)]
+            if messages:
+                try:
+                    self.target(messages)
+                    self.stats['written'] += len(messages)
+                except Exception:
+                    # 日志输出本身失败时不能再走 logger，直接写到原始 stderr
+                    self.stats['errors'] += 1
+                    traceback.print_exc(file=sys.__stderr__)
+            for item in batch:
+                if isinstance(item, threading.Event):
+                    item.set()
+            if any(item is _STOP for item in batch):
+                return
+
+
+def _keep(record) -> bool:
+    return '_log_drop' not in record['extra']
+
+
+def _patch(record):
+    limiter = _rate_limiter
+    if limiter is not None:
+        limiter.patch(record)
+
+
+def _write_console(messages: List[str]):
+    stream = sys.stdout
+    stream.write(''.join(messages))
+    stream.flush()
+
+
+def _file_writer(path, rotation, retention) -> Callable[[List[str]], None]:
+    """
+    返回把已格式化文本追加到 path 的写函数，轮转与保留仍交给 loguru 的文件输出：
+    文本经一个独立的 loguru 实例原样写出（raw），不经过主 logger 的格式化、限流和其他输出。
+    须在主 logger 没有任何输出时调用（deepcopy 要求）。
+    """
+    writer = copy.deepcopy(logger)
+    writer.configure(patcher=lambda record: None)
+    writer.add(path, format='{message}', level=0, rotation=rotation, retention=retention, encoding='utf-8', colorize=False)
+    _writers.append(writer)
+    emit = writer.opt(raw=True)
+    return lambda lines: emit.log('INFO', ''.join(lines))
+
+
+def _json_line(message) -> str:
+    record = message.record
+    entry = {'ts': round(record['time'].timestamp(), 6), 'level': record['level'].name, 'name': record['name'],
+             'line': record['line'], 'thread': record['thread'].name, 'msg': record['message']}
+    extra = {key: value for key, value in record['extra'].items() if not key.startswith('_')}
+    if extra:
+        entry['extra'] = extra
+    if record['exception'] is not None:
+        entry['exc'] = ''.join(traceback.format_exception(*record['exception']))
+    return json.dumps(entry, ensure_ascii=False, separators=(',', ':'), default=str) + '\n'
+
+
+def _teardown():
     logger.remove()
-    logger.add(
-        sys.stdout,
-        format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan> | <level>{message}</level>",
-        level=LOGGING_CONFIG['level'],
-        colorize=True
-    )
-    logger.add(
-        LOGGING_CONFIG['file_path'],
-        format=LOGGING_CONFIG['format'],
-        level=LOGGING_CONFIG['level'],
-        rotation=LOGGING_CONFIG['rotation'],
-        retention=LOGGING_CONFIG['retention'],
-        encoding='utf-8'
-    )
-    logger.info("日志系统初始化完成")
-
-setup_logger()
+    for sink in _sinks.values():
+        sink.stop()
+    _sinks.clear()
+    for writer in _writers:
+        writer.remove()
+    _writers.clear()
+
+
+def setup_logger(force: bool = False):
+    """配置控制台、文件和可选的 JSON-lines 日志；重复调用不会重复添加输出，force=True 时重新配置"""
+    global _configured, _atexit_registered, _patcher_installed, _rate_limiter
+    if _configured and not force:
+        return
+    _configured = True
+    _teardown()
+    cfg = LOGGING_CONFIG
+    level = cfg['level']
+    _rate_limiter = LogRateLimiter(cfg['rate_limit_interval'], cfg['rate_limit_burst'], cfg['rate_limit_keys']) \
+        if cfg['rate_limit_burst'] > 0 else None
+    json_write = _file_writer(cfg['json_path'], cfg['rotation'], cfg['retention']) if cfg['json'] else None
+    if cfg['async']:
+        file_write = _file_writer(cfg['file_path'], cfg['rotation'], cfg['retention'])
+        _sinks['console'] = QueuedSink('console', _write_console, cfg['queue_size'])
+        _sinks['file'] = QueuedSink('file', file_write, cfg['queue_size'])
+        logger.add(_sinks['console'], format=CONSOLE_FORMAT, level=level, colorize=True, filter=_keep)
+        logger.add(_sinks['file'], format=cfg['format'], level=level, filter=_keep)
+        if json_write:
+            _sinks['json'] = QueuedSink('json', lambda messages: json_write([_json_line(m) for m in messages]), cfg['queue_size'])
+            logger.add(_sinks['json'], format='{message}', level=level, filter=_keep)
+        if not _atexit_registered:
+            _atexit_registered = True
+            atexit.register(stop_logger)
+    else:
+        logger.add(sys.stdout, format=CONSOLE_FORMAT, level=level, colorize=True, filter=_keep)
+        logger.add(cfg['file_path'], format=cfg['format'], level=level, rotation=cfg['rotation'],
+                   retention=cfg['retention'], encoding='utf-8', filter=_keep)
+        if json_write:
+            logger.add(lambda message: json_write([_json_line(message)]), format='{message}', level=level, filter=_keep)
+    if not _patcher_installed:
+        _patcher_installed = True
+        logger.configure(patcher=_patch)
+    logger.info(f"日志系统初始化完成 ({'异步' if cfg['async'] else '同步'}写入{', JSON-lines' if cfg['json'] else ''})")
+
+
+def stop_logger():
+    """写完队列中的日志并移除全部输出，之后的日志只输出到 stderr；进程退出时自动调用"""
+    global _configured
+    if not _configured:
+        return
+    if _rate_limiter is not None and _rate_limiter.suppressed:
+        logger.info(f"日志限流共合并 {_rate_limiter.suppressed} 条重复日志")
+    _teardown()
+    _configured = False
+    logger.add(sys.stderr, level=LOGGING_CONFIG['level'])
+
+
+def get_log_stats() -> Dict:
+    stats = {name: dict(sink.stats, pending=sink.queue.qsize()) for name, sink in _sinks.items()}
+    stats['rate_limited'] = _rate_limiter.suppressed if _rate_limiter is not None else 0
+    return stats
+
+
+def register_log_metrics():
+    """启用指标之后调用，登记日志队列和限流的指标"""
+    from .metrics import get_metrics
+    metrics = get_metrics()
+    metrics.gauge('log_rate_limited', '被限流合并的重复日志数',
+                  fn=lambda: _rate_limiter.suppressed if _rate_limiter is not None else 0)
+    for name in _sinks:
+        labels = {'sink': name}
+        metrics.gauge('log_dropped', '日志队列已满时丢弃的消息数', labels,
+                      fn=lambda name=name: _sinks[name].stats['dropped'] if name in _sinks else 0)
+        metrics.gauge('log_queue_depth', '日志队列中等待写出的消息数', labels,
+                      fn=lambda name=name: _sinks[name].queue.qsize() if name in _sinks else 0)
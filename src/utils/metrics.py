@@ -0,0 +1,321 @@
+"""
+运行指标模块
+提供计数器、仪表和 HDR 风格（对数-线性分桶，相对误差约 3%）的延迟直方图，并通过本地 HTTP 端点以
+Prometheus 文本格式暴露。未启用时各组件拿到的是空操作指标，热路径上只多一次空方法调用。
+组件应在构造时（即 enable_metrics() 之后）获取指标对象；仪表可以传入回调，在抓取时才求值，不占用热路径。
+"""
+import math
+import threading
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from loguru import logger
+from ..config.settings import METRICS_CONFIG
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Optional[Dict[str, str]]) -> Labels:
+    return tuple(sorted((labels or {}).items()))
+
+
+def _format_labels(labels: Labels, extra: Sequence[Tuple[str, str]] = ()) -> str:
+    items = list(labels) + list(extra)
+    if not items:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in items)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(items, escaped)) + '}'
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name: str, labels: Labels):
+        self.name = name
+        self.labels = labels
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self.value += amount
+
+    def samples(self) -> List[Tuple[str, Labels, float]]:
+        return [(self.name, self.labels, self.value)]
+
+
+class Gauge:
+    kind = 'gauge'
+
+    def __init__(self, name: str, labels: Labels, fn: Optional[Callable[[], float]] = None):
+        self.name = name
+        self.labels = labels
+        self.fn = fn
+        self.value = 0.0
+
+    def set(self, value: float):
+        self.value = value
+
+    def samples(self) -> List[Tuple[str, Labels, float]]:
+        if self.fn is None:
+            return [(self.name, self.labels, self.value)]
+        try:
+            return [(self.name, self.labels, float(self.fn()))]
+        except Exception:
+            return []
+
+
+class Histogram:
+    """
+    每个 2 的幂区间再等分为 SUB_BUCKETS 个子桶，覆盖 [lowest, highest]；observe 为 O(1)。
+    导出时按 buckets（缺省为 METRICS_CONFIG['buckets']）聚合为 Prometheus 的累计桶，进程内可用 percentile() 取精确到子桶的分位数。
+    """
+    kind = 'histogram'
+    SUB_BUCKETS = 32
+
+    def __init__(self, name: str, labels: Labels, lowest: float = 1e-6, highest: float = 3600.0,
+                 buckets: Optional[Sequence[float]] = None):
+        self.name = name
+        self.labels = labels
+        self.buckets = tuple(buckets or METRICS_CONFIG['buckets'])
+        self.lowest = lowest
+        self.exp_min = math.frexp(lowest)[1]
+        self.size = (math.frexp(highest)[1] - self.exp_min + 1) * self.SUB_BUCKETS
+        self.counts = [0] * self.size
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def _index(self, value: float) -> int:
+        if value <= self.lowest:
+            return 0
+        mantissa, exponent = math.frexp(value)
+        return min((exponent - self.exp_min) * self.SUB_BUCKETS + int((mantissa - 0.5) * 2 * self.SUB_BUCKETS), self.size - 1)
+
+    def upper_bound(self, index: int) -> float:
+        exponent, sub = divmod(index, self.SUB_BUCKETS)
+        return math.ldexp(0.5 + (sub + 1) / (2 * self.SUB_BUCKETS), exponent + self.exp_min)
+
+    def observe(self, value: float):
+        index = self._index(value)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += value
+
+    def observe_many(self, values: np.ndarray):
+        """整批记录，用于按样本统计延迟"""
+        values = np.asarray(values, dtype=np.float64)
+        if not values.size:
+            return
+        mantissa, exponent = np.frexp(np.maximum(values, self.lowest))
+        index = (exponent - self.exp_min) * self.SUB_BUCKETS + ((mantissa - 0.5) * 2 * self.SUB_BUCKETS).astype(np.int64)
+        binned = np.bincount(np.clip(index, 0, self.size - 1), minlength=self.size)
+        nonzero = np.flatnonzero(binned)
+        with self._lock:
+            for i, n in zip(nonzero.tolist(), binned[nonzero].tolist()):
+                self.counts[i] += n
+            self.count += int(values.size)
+            self.sum += float(values.sum())
+
+    def percentile(self, p: float) -> float:
+        with self._lock:
+            counts, total = list(self.counts), self.count
+        if not total:
+            return 0.0
+        target = total * p / 100.0
+        seen = 0
+        for index, n in enumerate(counts):
+            seen += n
+            if n and seen >= target:
+                return self.upper_bound(index)
+        return self.upper_bound(self.size - 1)
+
+    def samples(self) -> List[Tuple[str, Labels, float]]:
+        with self._lock:
+            counts, total, total_sum = list(self.counts), self.count, self.sum
+        result = []
+        cumulative = 0
+        index = 0
+        for bound in self.buckets:
+            while index < self.size and self.upper_bound(index) <= bound:
+                cumulative += counts[index]
+                index += 1
+            result.append((f'{self.name}_bucket', self.labels + (('le', _format_value(float(bound))),), cumulative))
+        result.append((f'{self.name}_bucket', self.labels + (('le', '+Inf'),), total))
+        result.append((f'{self.name}_sum', self.labels, total_sum))
+        result.append((f'{self.name}_count', self.labels, total))
+        return result
+
+
+class _NullMetric:
+    """未启用指标时返回的空操作对象，接口与 Counter/Gauge/Histogram 相同"""
+    value = 0
+    count = 0
+
+    def inc(self, amount: float = 1):
+        pass
+
+    def set(self, value: float):
+        pass
+
+    def observe(self, value: float):
+        pass
+
+    def observe_many(self, values):
+        pass
+
+    def percentile(self, p: float) -> float:
+        return 0.0
+
+
+NULL_METRIC = _NullMetric()
+
+
+class MetricsRegistry:
+    def __init__(self, prefix: str = 'mine_'):
+        self.prefix = prefix
+        self.enabled = False
+        self._metrics: Dict[Tuple[str, Labels], object] = {}
+        self._help: Dict[str, Tuple[str, str]] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name: str, help_text: str, labels: Optional[Dict[str, str]], **kwargs):
+        if not self.enabled:
+            return NULL_METRIC
+        name = self.prefix + name
+        key = (name, _label_key(labels))
+        with self._lock:
+            metric = self._metrics.get(key)
+            if metric is None:
+                metric = cls(name, key[1], **kwargs)
+                self._metrics[key] = metric
+                self._help.setdefault(name, (cls.kind, help_text))
+            elif kwargs.get('fn') is not None:
+                metric.fn = kwargs['fn']  # 组件重建时让回调指向新的实例
+            return metric
+
+    def counter(self, name: str, help_text: str = '', labels: Optional[Dict[str, str]] = None):
+        return self._get(Counter, name, help_text, labels)
+
+    def gauge(self, name: str, help_text: str = '', labels: Optional[Dict[str, str]] = None,
+              fn: Optional[Callable[[], float]] = None):
+        return self._get(Gauge, name, help_text, labels, fn=fn)
+
+    def histogram(self, name: str, help_text: str = '', labels: Optional[Dict[str, str]] = None,
+                  lowest: float = 1e-6, highest: float = 3600.0, buckets: Optional[Sequence[float]] = None):
+        return self._get(Histogram, name, help_text, labels, lowest=lowest, highest=highest, buckets=buckets)
+
+    def render(self) -> str:
+        """Prometheus 文本格式"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+            helps = dict(self._help)
+        lines = []
+        described = set()
+        for metric in sorted(metrics, key=lambda m: (m.name, m.labels)):
+            if metric.name not in described:
+                kind, help_text = helps[metric.name]
+                lines.append(f'# HELP {metric.name} {help_text}')
+                lines.append(f'# TYPE {metric.name} {kind}')
+                described.add(metric.name)
+            for name, labels, value in metric.samples():
+                lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+class MetricsServer:
+    """
+    本地 HTTP 端点，/metrics 返回 Prometheus 文本；其他模块可通过 add_route 挂载调试接口。
+    处理函数接收查询参数字典，返回 (状态码, Content-Type, 响应体)。
+    """
+    def __init__(self, registry: MetricsRegistry, host: str, port: int):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self.routes: Dict[str, Callable[[Dict[str, str]], Tuple[int, str, str]]] = {
+            '/metrics': lambda query: (200, 'text/plain; version=0.0.4; charset=utf-8', registry.render())}
+        self.httpd = None
+        self.thread: Optional[threading.Thread] = None
+
+    def add_route(self, path: str, handler: Callable[[Dict[str, str]], Tuple[int, str, str]]):
+        self.routes[path] = handler
+
+    def start(self):
+        # http.server 连带导入 email 等模块，只在启用指标端点时加载
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        routes = self.routes
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path, _, query = self.path.partition('?')
+                handler = routes.get(path)
+                if handler is None:
+                    self.send_error(404)
+                    return
+                params = dict(item.partition('=')[::2] for item in query.split('&') if item)
+                try:
+                    status, content_type, body = handler(params)
+                except Exception as e:
+                    logger.error(f"处理 {path} 请求失败: {e}")
+                    status, content_type, body = 500, 'text/plain; charset=utf-8', str(e)
+                data = body.encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer((self.host, self.port), Handler)
+        self.httpd.daemon_threads = True
+        self.port = self.httpd.server_address[1]
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name='MetricsServer', daemon=True)
+        self.thread.start()
+        logger.info(f"指标端点已启动: http://{self.host}:{self.port}/metrics")
+
+    def stop(self):
+        if self.httpd:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.httpd = None
+
+
+_registry = MetricsRegistry()
+_server: Optional[MetricsServer] = None
+
+
+def get_metrics() -> MetricsRegistry:
+    return _registry
+
+
+def enable_metrics():
+    """须在创建采集、写库等组件之前调用，之后获取的指标才是真实对象"""
+    _registry.enabled = True
+
+
+def start_metrics_server(host: Optional[str] = None, port: Optional[int] = None) -> MetricsServer:
+    global _server
+    enable_metrics()
+    if _server is None:
+        _server = MetricsServer(_registry, host or METRICS_CONFIG['host'], METRICS_CONFIG['port'] if port is None else port)
+        _server.start()
+    return _server
+
+
+def get_metrics_server() -> Optional[MetricsServer]:
+    return _server
+
+
+def stop_metrics_server():
+    global _server
+    if _server is not None:
+        _server.stop()
+        _server = None
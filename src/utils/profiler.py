@@ -0,0 +1,234 @@
+"""
+现场性能诊断模块
+SamplingProfiler 按固定间隔读取 sys._current_frames()，对所有线程（串口接收、订阅者、写库、asyncio 事件循环等）
+做采样剖析，结果以 collapsed-stack 格式（每行 "线程;帧;帧 次数"，可直接交给 flamegraph.pl / speedscope）写入 EXPORTS_DIR。
+SampleTracer 为极小比例的样本记录各处理阶段的到达时间，用于定位是哪一段在积压。
+两者都可以通过信号（见 PROFILER_CONFIG）或指标端点上的 /debug/profile、/debug/trace 在运行中开启，无需重启进程。
+"""
+import json
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+import numpy as np
+from loguru import logger
+from ..config.settings import EXPORTS_DIR, PROFILER_CONFIG
+
+# 样本依次经过的阶段；阶段时间均为 time.time()，与解析器给样本打的时间戳可直接相减
+TRACE_STAGES = ('parse', 'buffer', 'db_queue', 'alarm', 'db_commit')
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{getattr(code, 'co_qualname', code.co_name)} ({Path(code.co_filename).name}:{frame.f_lineno})"
+
+
+class SamplingProfiler:
+    """同一时间只允许一次采样；采样线程自身不计入结果"""
+    def __init__(self, interval: Optional[float] = None):
+        self.interval = interval or PROFILER_CONFIG['interval']
+        self._lock = threading.Lock()
+        self.last_path: Optional[Path] = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._lock.locked()
+
+    def capture(self, duration: float, path: Optional[Path] = None) -> Optional[Path]:
+        """阻塞采样 duration 秒并写出 collapsed-stack 文件，已有采样进行中时返回 None"""
+        if not self._lock.acquire(blocking=False):
+            logger.warning("已有性能采样在进行中")
+            return None
+        try:
+            stacks, samples = self._sample(duration)
+            path = path or EXPORTS_DIR / f"profile_{datetime.now():%Y%m%d_%H%M%S}.folded"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as f:
+                for stack, count in stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+            self.last_path = path
+            logger.info(f"性能采样完成: {samples} 次采样, {len(stacks)} 个不同调用栈 -> {path}")
+            return path
+        finally:
+            self._lock.release()
+
+    def capture_async(self, duration: float) -> bool:
+        """在后台线程中采样，供信号处理函数等不能阻塞的场合调用"""
+        if self.is_running:
+            logger.warning("已有性能采样在进行中")
+            return False
+        threading.Thread(target=self.capture, args=(duration,), name='SamplingProfiler', daemon=True).start()
+        return True
+
+    def _sample(self, duration: float):
+        own = threading.get_ident()
+        stacks: Counter = Counter()
+        samples = 0
+        deadline = time.monotonic() + duration
+        while time.monotonic() < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                labels = []
+                while frame is not None:
+                    labels.append(_frame_label(frame))
+                    frame = frame.f_back
+                labels.append(names.get(ident, f'thread-{ident}'))
+                stacks[';'.join(reversed(labels))] += 1
+            samples += 1
+            time.sleep(self.interval)
+        return stacks, samples
+
+
+class SampleTracer:
+    """
+    enabled 为 False 时各阶段只多一次属性判断。开启后在 parse 阶段按 fraction 随机选取样本，
+    之后各阶段按样本时间戳匹配并记录到达时间；全部阶段到齐或超过 timeout 秒的记录以 JSON 行追加到 path。
+    样本以时间戳为键，多设备同一时刻的样本会合并为一条记录。
+    """
+    def __init__(self):
+        self.enabled = False
+        self.fraction = PROFILER_CONFIG['trace_fraction']
+        self.timeout = PROFILER_CONFIG['trace_timeout']
+        self.path: Optional[Path] = None
+        self._active: Dict[float, Dict[str, float]] = {}
+        self._keys = np.empty(0)
+        self._rng = np.random.default_rng()
+        self._lock = threading.Lock()
+        self.stats = {'traced': 0, 'completed': 0, 'expired': 0}
+
+    def enable(self, fraction: Optional[float] = None, path: Optional[Path] = None) -> Path:
+        with self._lock:
+            if fraction is not None:
+                self.fraction = fraction
+            self.path = path or EXPORTS_DIR / f"trace_{datetime.now():%Y%m%d_%H%M%S}.jsonl"
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.enabled = True
+        logger.info(f"样本阶段追踪已开启 (比例 {self.fraction:g}) -> {self.path}")
+        return self.path
+
+    def disable(self):
+        with self._lock:
+            self.enabled = False
+            self._flush(list(self._active.items()))
+            self._active.clear()
+            self._keys = np.empty(0)
+        logger.info(f"样本阶段追踪已关闭: {self.stats}")
+
+    def toggle(self) -> bool:
+        if self.enabled:
+            self.disable()
+        else:
+            self.enable()
+        return self.enabled
+
+    def mark(self, stage: str, timestamps):
+        """记录一批样本（时间戳数组或序列）到达 stage 的时间；parse 阶段负责抽样"""
+        now = time.time()
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        with self._lock:
+            if not self.enabled:
+                return
+            if stage == TRACE_STAGES[0]:
+                picked = timestamps[self._rng.random(len(timestamps)) < self.fraction]
+                for ts in picked.tolist():
+                    self._active[ts] = {'sample': ts, stage: now}
+                if picked.size:
+                    self.stats['traced'] += int(picked.size)
+                    self._keys = np.fromiter(self._active, np.float64, len(self._active))
+            elif self._keys.size:
+                for ts in timestamps[np.isin(timestamps, self._keys)].tolist():
+                    self._active[ts].setdefault(stage, now)
+            self._expire(now)
+
+    def _expire(self, now: float):
+        finished = [(ts, record) for ts, record in self._active.items()
+                    if len(record) > len(TRACE_STAGES) or now - record['parse'] > self.timeout]
+        if not finished:
+            return
+        for ts, _ in finished:
+            del self._active[ts]
+        self._keys = np.fromiter(self._active, np.float64, len(self._active))
+        self._flush(finished)
+
+    def _flush(self, records: List):
+        if not records or self.path is None:
+            return
+        lines = []
+        for _, record in records:
+            complete = len(record) > len(TRACE_STAGES)
+            self.stats['completed' if complete else 'expired'] += 1
+            # 各阶段相对样本时间戳的延迟（毫秒），缺失的阶段为 null
+            stages = {stage: round((record[stage] - record['sample']) * 1000, 3) if stage in record else None
+                      for stage in TRACE_STAGES}
+            lines.append(json.dumps({'sample': record['sample'], 'stages_ms': stages, 'complete': complete}))
+        try:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write('\n'.join(lines) + '\n')
+        except OSError as e:
+            logger.error(f"写入样本追踪记录失败: {e}")
+
+
+_profiler: Optional[SamplingProfiler] = None
+_tracer = SampleTracer()
+
+
+def get_profiler() -> SamplingProfiler:
+    global _profiler
+    if _profiler is None:
+        _profiler = SamplingProfiler()
+    return _profiler
+
+
+def get_tracer() -> SampleTracer:
+    return _tracer
+
+
+def install_signal_handlers() -> bool:
+    """profile_signal 触发一次后台采样，trace_signal 切换样本追踪；只能在主线程调用，Windows 上不可用"""
+    profile_signal = getattr(signal, PROFILER_CONFIG['profile_signal'] or '', None)
+    trace_signal = getattr(signal, PROFILER_CONFIG['trace_signal'] or '', None)
+    if profile_signal is None and trace_signal is None:
+        return False
+    try:
+        if profile_signal is not None:
+            signal.signal(profile_signal, lambda signum, frame: get_profiler().capture_async(PROFILER_CONFIG['duration']))
+        if trace_signal is not None:
+            signal.signal(trace_signal, lambda signum, frame: threading.Thread(target=_tracer.toggle, daemon=True).start())
+    except ValueError as e:
+        logger.warning(f"无法安装诊断信号处理函数: {e}")
+        return False
+    logger.info(f"诊断信号已就绪: {PROFILER_CONFIG['profile_signal']} 性能采样, {PROFILER_CONFIG['trace_signal']} 切换样本追踪")
+    return True
+
+
+def register_debug_routes(server):
+    """
+    在指标端点上挂载:
+        /debug/profile?seconds=10        同步采样并返回 collapsed-stack 文本（同时写入 EXPORTS_DIR）
+        /debug/trace?enable=1&fraction=0.01   开启/关闭样本追踪，返回当前状态
+    """
+    def profile(query: Dict[str, str]):
+        seconds = min(float(query.get('seconds') or PROFILER_CONFIG['duration']), PROFILER_CONFIG['max_duration'])
+        path = get_profiler().capture(seconds)
+        if path is None:
+            return 409, 'text/plain; charset=utf-8', '已有性能采样在进行中\n'
+        return 200, 'text/plain; charset=utf-8', path.read_text(encoding='utf-8')
+
+    def trace(query: Dict[str, str]):
+        if 'enable' in query:
+            if query['enable'] in ('1', 'true', 'on'):
+                _tracer.enable(float(query['fraction']) if query.get('fraction') else None)
+            elif _tracer.enabled:
+                _tracer.disable()
+        state = {'enabled': _tracer.enabled, 'fraction': _tracer.fraction, 'path': str(_tracer.path) if _tracer.path else None,
+                 'pending': len(_tracer._active), **_tracer.stats}
+        return 200, 'application/json; charset=utf-8', json.dumps(state, ensure_ascii=False)
+
+    server.add_route('/debug/profile', profile)
+    server.add_route('/debug/trace', trace)
@@ -0,0 +1,354 @@
+"""
+数据保留与归档模块
+最近 hot_days 天的原始数据保留在主库；更早的数据按天/周迁移到数据库目录下 partitions/ 中的分区库文件，
+超过 raw_days 的分区压缩归档为列式文件后删除，此后仅保留汇总表。
+所有工作在后台线程中分块进行，每块只短暂持有写锁，不阻塞采集写入路径。
+"""
+import time
+import sqlite3
+import zipfile
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+import numpy as np
+from loguru import logger
+from ..config.settings import RETENTION_CONFIG, ARCHIVE_DIR
+from .rollup import rollup_table
+from .ring_buffer import DEFAULT_DEVICE
+
+DAY = 86400
+SENSOR_COLUMNS = ('pressure', 'temperature', 'vibration', 'timestamp')
+ROW_COLUMNS = SENSOR_COLUMNS + ('device_id',)
+GRANULARITY_DAYS = {'day': 1, 'week': 7}
+ARCHIVE_FORMATS = ('npz', 'parquet')
+PARTITION_SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS sensor_data (
+        id INTEGER PRIMARY KEY,
+        pressure REAL NOT NULL,
+        temperature REAL NOT NULL,
+        vibration REAL NOT NULL,
+        timestamp REAL NOT NULL,
+        device_id TEXT NOT NULL DEFAULT 'default'
+    )
+'''
+
+
+def partition_dir(db_path) -> Path:
+    return Path(db_path).parent / 'partitions'
+
+
+def partition_start(timestamp: float, granularity: str = 'day') -> int:
+    """分区起始时间（UTC 零点）；按周分区时从周一开始"""
+    day = int(timestamp // DAY) * DAY
+    if granularity == 'week':
+        day -= ((day // DAY + 3) % 7) * DAY  # 1970-01-01 是周四
+    return day
+
+
+def partition_name(start: int, granularity: str = 'day') -> str:
+    return f"sensor_{granularity}_{datetime.fromtimestamp(start, timezone.utc):%Y%m%d}.db"
+
+
+def parse_partition(path: Path) -> Optional[Tuple[int, int]]:
+    """从文件名解析分区的 [start, end) 时间范围"""
+    try:
+        _, granularity, date = path.stem.split('_')
+        start = int(datetime.strptime(date, '%Y%m%d').replace(tzinfo=timezone.utc).timestamp())
+        return start, start + GRANULARITY_DAYS[granularity] * DAY
+    except (ValueError, KeyError):
+        return None
+
+
+def list_partitions(directory: Path) -> List[Tuple[int, int, Path]]:
+    if not directory.exists():
+        return []
+    found = []
+    for path in directory.glob('sensor_*.db'):
+        bounds = parse_partition(path)
+        if bounds:
+            found.append((bounds[0], bounds[1], path))
+    return sorted(found)
+
+
+def _has_device_column(conn: sqlite3.Connection) -> bool:
+    return any(row[1] == 'device_id' for row in conn.execute('PRAGMA table_info(sensor_data)'))
+
+
+def iter_partition_chunks(directory: Path, start_time: float, end_time: float, chunk_size: int = 10000,
+                          device_id: Optional[str] = None) -> Iterator[List[tuple]]:
+    """
+    按时间顺序逐块读取与 [start_time, end_time) 重叠的分区，每块为 (pressure, temperature, vibration, timestamp, device_id) 元组列表。
+    多设备之前生成的分区没有 device_id 列，其数据视为默认设备。
+    """
+    for p_start, p_end, path in list_partitions(directory):
+        if p_end <= start_time or p_start >= end_time:
+            continue
+        conn = sqlite3.connect(f"{path.resolve().as_uri()}?mode=ro", uri=True)
+        try:
+            sql = 'SELECT pressure, temperature, vibration, timestamp, {} FROM sensor_data WHERE timestamp >= ? AND timestamp < ?'
+            params: list = [start_time, end_time]
+            if _has_device_column(conn):
+                sql = sql.format('device_id')
+                if device_id is not None:
+                    sql += ' AND device_id = ?'
+                    params.append(device_id)
+            elif device_id is None or device_id == DEFAULT_DEVICE:
+                sql = sql.format('?')
+                params.insert(0, DEFAULT_DEVICE)
+            else:
+                continue
+            cursor = conn.execute(sql + ' ORDER BY timestamp', params)
+            while rows := cursor.fetchmany(chunk_size):
+                yield rows
+        finally:
+            conn.close()
+
+
+def query_partitions(directory: Path, start_time: float, end_time: float, limit: Optional[int] = None,
+                     device_id: Optional[str] = None) -> List[Dict]:
+    rows: List[Dict] = []
+    for chunk in iter_partition_chunks(directory, start_time, end_time, min(limit or 10000, 10000), device_id):
+        rows.extend(dict(zip(ROW_COLUMNS, row)) for row in chunk)
+        if limit is not None and len(rows) >= limit:
+            return rows[:limit]
+    return rows
+
+
+def load_archive(path, with_devices: bool = False):
+    """
+    读取归档文件，返回 (N, 4) 的 (pressure, temperature, vibration, timestamp) 数组；
+    with_devices 为 True 时返回 (数组, 长度为 N 的设备ID数组)，旧归档中的数据视为默认设备。
+    """
+    path = Path(path)
+    if path.suffix == '.parquet':
+        import pyarrow.parquet as pq
+        table = pq.read_table(path)
+        data = np.column_stack([table.column(name).to_numpy() for name in SENSOR_COLUMNS])
+        if 'device_id' in table.column_names:
+            devices = np.asarray(table.column('device_id').to_pylist())
+        else:
+            devices = np.full(len(data), DEFAULT_DEVICE)
+        return (data, devices) if with_devices else data
+    with np.load(path) as archive:
+        names = sorted(name for name in archive.files if name.startswith('chunk_'))
+        chunks = [archive[name] for name in names]
+        devices = [archive[f'device_{name[6:]}'] if f'device_{name[6:]}' in archive.files else np.full(len(chunk), DEFAULT_DEVICE)
+                   for name, chunk in zip(names, chunks)]
+    data = np.concatenate(chunks) if chunks else np.empty((0, 4))
+    if not with_devices:
+        return data
+    return data, (np.concatenate(devices) if devices else np.empty(0, dtype=str))
+
+
+class RetentionManager:
+    def __init__(self, db_manager, config: Optional[Dict] = None, archive_dir: Optional[Path] = None):
+        cfg = dict(RETENTION_CONFIG, **(config or {}))
+        if cfg['partition'] not in GRANULARITY_DAYS:
+            raise ValueError(f"未知的分区粒度: {cfg['partition']}")
+        if cfg['archive_format'] not in ARCHIVE_FORMATS:
+            raise ValueError(f"未知的归档格式: {cfg['archive_format']}")
+        self.db_manager = db_manager
+        self.config = cfg
+        self.granularity = cfg['partition']
+        self.chunk_rows = cfg['chunk_rows']
+        self.chunk_pause = cfg['chunk_pause']
+        self.partition_dir = partition_dir(db_manager.db_path)
+        self.archive_dir = Path(archive_dir or ARCHIVE_DIR)
+        self.thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self.stats = {'runs': 0, 'moved': 0, 'archived_partitions': 0, 'archived_rows': 0, 'rollups_expired': 0,
+                      'vacuumed_pages': 0, 'errors': 0, 'last_run': None}
+
+    @property
+    def is_running(self) -> bool:
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self):
+        if not self.config['enabled'] or self.is_running:
+            return
+        self._stop_event.clear()
+        self.thread = threading.Thread(target=self._run, name='RetentionManager')
+        self.thread.daemon = True
+        self.thread.start()
+        logger.info(f"数据保留任务已启动 (热数据 {self.config['hot_days']} 天, 原始数据 {self.config['raw_days']} 天)")
+
+    def stop(self, timeout: float = 5.0):
+        self._stop_event.set()
+        if self.thread:
+            self.thread.join(timeout=timeout)
+            self.thread = None
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            self.run_once()
+            self._stop_event.wait(self.config['interval'])
+
+    def _pause(self) -> bool:
+        """块与块之间让出写锁；返回 False 表示收到停止信号"""
+        return not self._stop_event.wait(self.chunk_pause)
+
+    def run_once(self, now: Optional[float] = None) -> Dict:
+        now = now or time.time()
+        for step in (self._move_cold_rows, self._archive_partitions, self._expire_rollups, self._incremental_vacuum):
+            if self._stop_event.is_set():
+                break
+            try:
+                step(now)
+            except Exception as e:
+                self.stats['errors'] += 1
+                logger.error(f"数据保留任务 {step.__name__} 失败: {e}")
+        self.stats['runs'] += 1
+        self.stats['last_run'] = now
+        return dict(self.stats)
+
+    def hot_cutoff(self, now: Optional[float] = None) -> int:
+        """早于该时间的完整分区会被迁出主库"""
+        return partition_start((now or time.time()) - self.config['hot_days'] * DAY, self.granularity)
+
+    def _open_partition(self, start: int) -> sqlite3.Connection:
+        self.partition_dir.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(self.partition_dir / partition_name(start, self.granularity)))
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(PARTITION_SCHEMA)
+        if not _has_device_column(conn):
+            conn.execute(f"ALTER TABLE sensor_data ADD COLUMN device_id TEXT NOT NULL DEFAULT '{DEFAULT_DEVICE}'")
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_sensor_timestamp ON sensor_data(timestamp)')
+        return conn
+
+    def _move_cold_rows(self, now: float):
+        """先写入分区库并提交，再按 id 从主库删除；中途失败重跑时 INSERT OR IGNORE 保证幂等"""
+        cutoff = self.hot_cutoff(now)
+        partitions: Dict[int, sqlite3.Connection] = {}
+        try:
+            while not self._stop_event.is_set():
+                with self.db_manager.get_read_connection() as conn:
+                    rows = conn.execute(
+                        'SELECT id, pressure, temperature, vibration, timestamp, device_id FROM sensor_data '
+                        'WHERE timestamp < ? ORDER BY timestamp LIMIT ?',
+                        (cutoff, self.chunk_rows)).fetchall()
+                if not rows:
+                    break
+                grouped: Dict[int, list] = {}
+                for row in rows:
+                    grouped.setdefault(partition_start(row[4], self.granularity), []).append(tuple(row))
+                for start, group in grouped.items():
+                    if start not in partitions:
+                        partitions[start] = self._open_partition(start)
+                    partitions[start].executemany(
+                        'INSERT OR IGNORE INTO sensor_data (id, pressure, temperature, vibration, timestamp, device_id) '
+                        'VALUES (?, ?, ?, ?, ?, ?)', group)
+                    partitions[start].commit()
+                with self.db_manager.get_connection() as conn:
+                    conn.executemany('DELETE FROM sensor_data WHERE id = ?', [(row[0],) for row in rows])
+                    conn.commit()
+                self.stats['moved'] += len(rows)
+                if not self._pause():
+                    break
+        finally:
+            for conn in partitions.values():
+                conn.close()
+        if partitions:
+            logger.info(f"已将 {len(partitions)} 个分区的冷数据迁出主库，累计 {self.stats['moved']} 条")
+
+    def _archive_partitions(self, now: float):
+        expiry = now - self.config['raw_days'] * DAY
+        for start, end, path in list_partitions(self.partition_dir):
+            if end > expiry or self._stop_event.is_set():
+                continue
+            written = self._archive_partition(path)
+            if written is None:
+                continue
+            for suffix in ('', '-wal', '-shm'):
+                Path(f'{path}{suffix}').unlink(missing_ok=True)
+            self.stats['archived_partitions'] += 1
+            self.stats['archived_rows'] += written
+            logger.info(f"分区 {path.name} 已归档 ({written} 条)")
+
+    def _archive_partition(self, path: Path) -> Optional[int]:
+        """逐块读取分区并写入压缩归档；先写临时文件再改名，失败时保留原分区"""
+        fmt = self.config['archive_format']
+        if fmt == 'parquet':
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                logger.warning("未安装 pyarrow，改用 npz 格式归档")
+                fmt = 'npz'
+        self.archive_dir.mkdir(parents=True, exist_ok=True)
+        target = self.archive_dir / f'{path.stem}.{fmt}'
+        tmp = target.with_name(target.name + '.tmp')
+        conn = sqlite3.connect(f"{path.resolve().as_uri()}?mode=ro", uri=True)
+        try:
+            device = 'device_id' if _has_device_column(conn) else f"'{DEFAULT_DEVICE}'"
+            cursor = conn.execute(f'SELECT pressure, temperature, vibration, timestamp, {device} FROM sensor_data ORDER BY timestamp')
+            written = self._write_parquet(cursor, tmp) if fmt == 'parquet' else self._write_npz(cursor, tmp)
+            tmp.replace(target)
+            return written
+        except Exception as e:
+            self.stats['errors'] += 1
+            tmp.unlink(missing_ok=True)
+            logger.error(f"归档分区 {path.name} 失败: {e}")
+            return None
+        finally:
+            conn.close()
+
+    def _write_npz(self, cursor, target: Path) -> int:
+        """每块保存为 npz 中的一个 (n, 4) 数值数组和一个同名编号的设备ID数组，np.load 可直接读取"""
+        written = 0
+        with zipfile.ZipFile(target, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+            index = 0
+            while rows := cursor.fetchmany(self.chunk_rows):
+                values, devices = zip(*((row[:4], row[4]) for row in rows))
+                with archive.open(f'chunk_{index:06d}.npy', 'w', force_zip64=True) as f:
+                    np.lib.format.write_array(f, np.asarray(values, dtype=np.float64))
+                with archive.open(f'device_{index:06d}.npy', 'w', force_zip64=True) as f:
+                    np.lib.format.write_array(f, np.asarray(devices, dtype=str))
+                written += len(rows)
+                index += 1
+        return written
+
+    def _write_parquet(self, cursor, target: Path) -> int:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        schema = pa.schema([(name, pa.float64()) for name in SENSOR_COLUMNS] + [('device_id', pa.string())])
+        written = 0
+        with pq.ParquetWriter(str(target), schema, compression='zstd') as writer:
+            while rows := cursor.fetchmany(self.chunk_rows):
+                columns = np.asarray([row[:4] for row in rows], dtype=np.float64).T
+                arrays = [pa.array(c) for c in columns] + [pa.array([row[4] for row in rows], type=pa.string())]
+                writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+                written += len(rows)
+        return written
+
+    def _expire_rollups(self, now: float):
+        for name, days in self.config['rollup_days'].items():
+            if not days:
+                continue
+            table = rollup_table(name)
+            while not self._stop_event.is_set():
+                with self.db_manager.get_connection() as conn:
+                    deleted = conn.execute(f'DELETE FROM {table} WHERE (device_id, bucket) IN '
+                                           f'(SELECT device_id, bucket FROM {table} WHERE bucket < ? LIMIT ?)',
+                                           (now - days * DAY, self.chunk_rows)).rowcount
+                    conn.commit()
+                self.stats['rollups_expired'] += deleted
+                if deleted < self.chunk_rows or not self._pause():
+                    break
+
+    def _incremental_vacuum(self, now: float):
+        """以 incremental_vacuum 分批归还空闲页，代替会长时间锁库的 VACUUM"""
+        with self.db_manager.get_read_connection() as conn:
+            if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+                return
+            free = conn.execute('PRAGMA freelist_count').fetchone()[0]
+        pages = self.config['vacuum_pages']
+        while free > 0 and not self._stop_event.is_set():
+            with self.db_manager.get_connection() as conn:
+                # execute() 只单步执行该 PRAGMA（每步释放一页），executescript 才会执行到底
+                conn.executescript(f'PRAGMA incremental_vacuum({pages});')
+            step = min(pages, free)
+            free -= step
+            self.stats['vacuumed_pages'] += step
+            if not self._pause():
+                break
@@ -0,0 +1,118 @@
+"""
+环形缓冲区模块
+基于NumPy的列式传感器数据环形缓冲区，支持O(1)追加和按时间二分查找
+"""
+from typing import Optional, Sequence
+import numpy as np
+
+SENSOR_FIELDS = ('pressure', 'temperature', 'vibration', 'timestamp')
+TIMESTAMP_ROW = SENSOR_FIELDS.index('timestamp')
+# 写入数据库的行在传感器字段之后附加设备ID
+DEVICE_INDEX = len(SENSOR_FIELDS)
+DEFAULT_DEVICE = 'default'
+
+
+class SensorRingBuffer:
+    """
+    单生产者、多读者的列式环形缓冲区。
+
+    每个样本同时写入位置 i 和 i + capacity（镜像存储），因此最近任意 n <= capacity
+    个样本在内存中总是连续的，查询可以直接返回视图而无需拷贝或拼接。
+    写入方先写数据再更新计数，读者无需加锁；返回的视图在生产者继续写入
+    capacity - n 个样本之前保持有效，需要长期持有时请调用 copy()。
+    """
+    def __init__(self, capacity: int, fields: Sequence[str] = SENSOR_FIELDS):
+        if capacity <= 0:
+            raise ValueError("缓冲区容量必须大于0")
+        self.capacity = capacity
+        self.fields = tuple(fields)
+        self._time_row = self.fields.index('timestamp')
+        self._data = np.zeros((len(self.fields), 2 * capacity), dtype=np.float64)
+        self._count = 0
+
+    def __len__(self) -> int:
+        return min(self._count, self.capacity)
+
+    @property
+    def total_count(self) -> int:
+        return self._count
+
+    def append(self, row: Sequence[float]):
+        """追加一行，字段顺序与 fields 一致"""
+        i = self._count % self.capacity
+        self._data[:, i] = row
+        self._data[:, i + self.capacity] = row
+        self._count += 1
+
+    def extend(self, rows: np.ndarray):
+        """批量追加，rows 形状为 (n, len(fields))"""
+        rows = np.asarray(rows, dtype=np.float64)
+        if rows.ndim != 2 or rows.shape[1] != len(self.fields):
+            raise ValueError(f"批量数据形状应为 (n, {len(self.fields)})")
+        if len(rows) > self.capacity:
+            self._count += len(rows) - self.capacity
+            rows = rows[-self.capacity:]
+        cap = self.capacity
+        start = self._count % cap
+        first = min(len(rows), cap - start)
+        cols = rows.T
+        self._data[:, start:start + first] = cols[:, :first]
+        self._data[:, start + cap:start + cap + first] = cols[:, :first]
+        rest = len(rows) - first
+        if rest:
+            self._data[:, :rest] = cols[:, first:]
+            self._data[:, cap:cap + rest] = cols[:, first:]
+        self._count += len(rows)
+
+    def clear(self):
+        self._count = 0
+
+    def _bounds(self, n: Optional[int] = None):
+        count = self._count
+        size = min(count, self.capacity)
+        if n is not None:
+            size = min(size, max(n, 0))
+        end = count % self.capacity + self.capacity
+        return end - size, end
+
+    def latest(self, n: Optional[int] = None) -> np.ndarray:
+        """最近 n 个样本的零拷贝视图，形状为 (len(fields), n)"""
+        start, end = self._bounds(n)
+        return self._data[:, start:end]
+
+    def between_counts(self, start: int, end: int) -> np.ndarray:
+        """
+        追加序号位于 [start, end) 的样本的零拷贝视图（序号从 0 开始，即追加前的 total_count），
+        已被覆盖的较早部分自动截掉。读者先记下 total_count 再按序号增量读取，不受生产者并发写入的影响。
+        """
+        end = min(end, self._count)
+        start = max(start, end - self.capacity, 0)
+        if start >= end:
+            return self._data[:, :0]
+        stop = (end - 1) % self.capacity + 1 + self.capacity
+        return self._data[:, stop - (end - start):stop]
+
+    def last(self) -> Optional[np.ndarray]:
+        if self._count == 0:
+            return None
+        return self.latest(1)[:, 0]
+
+    def between(self, start_time: float, end_time: Optional[float] = None) -> np.ndarray:
+        """时间戳位于 [start_time, end_time] 内的样本视图，要求时间戳单调递增"""
+        start, end = self._bounds()
+        times = self._data[self._time_row, start:end]
+        lo = int(np.searchsorted(times, start_time, side='left'))
+        hi = len(times) if end_time is None else int(np.searchsorted(times, end_time, side='right'))
+        return self._data[:, start + lo:start + max(lo, hi)]
+
+    def since(self, start_time: float) -> np.ndarray:
+        return self.between(start_time)
+
+    def oldest_timestamp(self) -> Optional[float]:
+        if self._count == 0:
+            return None
+        start, _ = self._bounds()
+        return float(self._data[self._time_row, start])
+
+    def column(self, window: np.ndarray, name: str) -> np.ndarray:
+        return window[self.fields.index(name)]
@@ -0,0 +1,200 @@
+"""
+时序降采样模块
+维护 1分钟/1小时/1天 粒度的 min/max/avg/count 汇总表，并为历史查询按点数预算选择分辨率；
+原始分辨率的窗口使用 LTTB 算法降采样
+"""
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+from ..config.settings import ROLLUP_CONFIG
+from .ring_buffer import DEVICE_INDEX
+
+CHANNELS = ('pressure', 'temperature', 'vibration')
+RAW = 'raw'
+
+
+def rollup_table(name: str) -> str:
+    return f'sensor_rollup_{name}'
+
+
+def _resolutions() -> List[tuple]:
+    """按粒度从细到粗排列的 (名称, 秒数)"""
+    return sorted(ROLLUP_CONFIG['resolutions'].items(), key=lambda item: item[1])
+
+
+def create_rollup_tables(cursor):
+    """
+    按 (device_id, bucket) 建立汇总表，bucket 为桶起始时间戳（按 UTC 对齐）；保存 sum 而不是 avg，便于增量合并。
+    旧版本不含 device_id 的汇总表会被删除重建，随后由 needs_backfill 触发回填。
+    """
+    columns = ', '.join(f'{c}_min REAL NOT NULL, {c}_max REAL NOT NULL, {c}_sum REAL NOT NULL' for c in CHANNELS)
+    for name, _ in _resolutions():
+        table = rollup_table(name)
+        existing = [row[1] for row in cursor.execute(f'PRAGMA table_info({table})').fetchall()]
+        if existing and 'device_id' not in existing:
+            cursor.execute(f'DROP TABLE {table}')
+        cursor.execute(f'''
+            CREATE TABLE IF NOT EXISTS {table} (
+                device_id TEXT NOT NULL,
+                bucket INTEGER NOT NULL,
+                count INTEGER NOT NULL,
+                {columns},
+                PRIMARY KEY (device_id, bucket)
+            ) WITHOUT ROWID
+        ''')
+
+
+def _upsert_sql(table: str) -> str:
+    names = ['device_id', 'bucket', 'count'] + [f'{c}_{agg}' for c in CHANNELS for agg in ('min', 'max', 'sum')]
+    updates = ['count = count + excluded.count']
+    for c in CHANNELS:
+        updates.append(f'{c}_min = MIN({c}_min, excluded.{c}_min)')
+        updates.append(f'{c}_max = MAX({c}_max, excluded.{c}_max)')
+        updates.append(f'{c}_sum = {c}_sum + excluded.{c}_sum')
+    return (f"INSERT INTO {table} ({', '.join(names)}) VALUES ({', '.join('?' * len(names))}) "
+            f"ON CONFLICT(device_id, bucket) DO UPDATE SET {', '.join(updates)}")
+
+
+def aggregate_rows(rows: np.ndarray, seconds: int, device_id: str) -> List[tuple]:
+    """把同一设备 (N, 4) 的 (pressure, temperature, vibration, timestamp) 行按桶聚合为 upsert 参数"""
+    buckets = (np.floor(rows[:, 3] / seconds) * seconds).astype(np.int64)
+    order = np.argsort(buckets, kind='stable')
+    buckets = buckets[order]
+    values = rows[order, :3]
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    counts = np.diff(np.r_[starts, buckets.size])
+    mins = np.minimum.reduceat(values, starts)
+    maxs = np.maximum.reduceat(values, starts)
+    sums = np.add.reduceat(values, starts)
+    stacked = np.stack([mins, maxs, sums], axis=2).reshape(starts.size, -1)  # 每个通道依次为 min, max, sum
+    return [(device_id, int(b), int(n), *agg) for b, n, agg in zip(buckets[starts].tolist(), counts.tolist(), stacked.tolist())]
+
+
+def upsert_rollups(conn, rows: Sequence[Sequence]):
+    """在调用方的事务内把一批 (pressure, temperature, vibration, timestamp, device_id) 行合并进各粒度汇总表"""
+    if not ROLLUP_CONFIG['enabled'] or not len(rows):
+        return
+    by_device: Dict[str, list] = {}
+    for row in rows:
+        by_device.setdefault(row[DEVICE_INDEX], []).append(row[:DEVICE_INDEX])
+    for device_id, values in by_device.items():
+        arr = np.asarray(values, dtype=np.float64)
+        for name, seconds in _resolutions():
+            conn.executemany(_upsert_sql(rollup_table(name)), aggregate_rows(arr, seconds, device_id))
+
+
+def needs_backfill(cursor) -> bool:
+    """汇总表为空而原始表有数据（升级前创建的数据库）时需要回填"""
+    finest = rollup_table(_resolutions()[0][0])
+    return (cursor.execute(f'SELECT 1 FROM {finest} LIMIT 1').fetchone() is None
+            and cursor.execute('SELECT 1 FROM sensor_data LIMIT 1').fetchone() is not None)
+
+
+def rebuild_rollups(conn):
+    """根据 sensor_data 全量重建汇总表，用于已有数据库的首次回填"""
+    aggregates = ', '.join(f'MIN({c}), MAX({c}), SUM({c})' for c in CHANNELS)
+    names = ', '.join(f'{c}_min, {c}_max, {c}_sum' for c in CHANNELS)
+    for name, seconds in _resolutions():
+        table = rollup_table(name)
+        conn.execute(f'DELETE FROM {table}')
+        conn.execute(f'''
+            INSERT INTO {table} (device_id, bucket, count, {names})
+            SELECT device_id, CAST(timestamp / {seconds} AS INTEGER) * {seconds} AS b, COUNT(*), {aggregates}
+            FROM sensor_data GROUP BY device_id, b
+        ''')
+
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets 降采样，返回保留点的下标。
+    首尾点固定保留，中间每个桶选取与前一选中点、下一桶均值构成三角形面积最大的点。
+    """
+    n = x.size
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.intp)
+    selected = np.empty(threshold, dtype=np.intp)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        if i + 2 < edges.size:
+            next_lo, next_hi = edges[i + 1], edges[i + 2]
+        else:
+            next_lo, next_hi = n - 1, n
+        avg_x = x[next_lo:next_hi].mean()
+        avg_y = y[next_lo:next_hi].mean()
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def _device_filter(device_id: Optional[str]) -> tuple:
+    return (' AND device_id = ?', [device_id]) if device_id is not None else ('', [])
+
+
+def estimate_raw_count(conn, start_time: float, end_time: float, device_id: Optional[str] = None) -> int:
+    """用最细粒度汇总表的 count 之和估算原始数据条数（边界桶按整桶计）；device_id 为 None 时统计全部设备"""
+    name, seconds = _resolutions()[0]
+    where, params = _device_filter(device_id)
+    return conn.execute(f'SELECT COALESCE(SUM(count), 0) FROM {rollup_table(name)} WHERE bucket >= ? AND bucket <= ?{where}',
+                        [start_time - seconds, end_time] + params).fetchone()[0]
+
+
+def choose_resolution(raw_count: int, span: float, max_points: int, allow_raw: bool = True) -> str:
+    """
+    原始数据点数不超过预算时直接返回原始数据；不超过 lttb_max_rows 时用原始数据加 LTTB 降采样；
+    否则选择桶数不超过预算的最细汇总粒度，都不满足时退回最粗粒度。
+    allow_raw 为 False（窗口内原始数据已迁出主库）时只在汇总粒度中选择。
+    """
+    if allow_raw and (raw_count <= max_points or raw_count <= ROLLUP_CONFIG['lttb_max_rows']):
+        return RAW
+    resolutions = _resolutions()
+    for name, seconds in resolutions:
+        if span / seconds <= max_points:
+            return name
+    return resolutions[-1][0]
+
+
+def query_history(conn, start_time: float, end_time: float, max_points: int, resolution: Optional[str] = None,
+                  allow_raw: bool = True, device_id: Optional[str] = None) -> Dict:
+    """
+    查询 [start_time, end_time] 内的历史曲线数据，结果点数不超过 max_points（按汇总粒度时可能略少）。
+    返回 {'resolution', 'channels': {通道: {'timestamp', 'avg', 'min', 'max', 'count'}}}；
+    原始分辨率下每个通道独立做 LTTB，时间戳可能不同。device_id 为 None 时汇总所有设备（原始分辨率下各设备样本按时间混合）。
+    """
+    cursor = conn.cursor()
+    cursor.row_factory = None  # 直接取元组，避免为大量行构造 sqlite3.Row
+    if resolution is None:
+        raw_count = estimate_raw_count(cursor, start_time, end_time, device_id)
+        resolution = choose_resolution(raw_count, end_time - start_time, max_points, allow_raw)
+    where, params = _device_filter(device_id)
+    if resolution == RAW:
+        rows = cursor.execute(
+            f'SELECT pressure, temperature, vibration, timestamp FROM sensor_data WHERE timestamp >= ? AND timestamp <= ?{where} ORDER BY timestamp',
+            [start_time, end_time] + params).fetchall()
+        data = np.array(rows, dtype=np.float64).reshape(-1, 4)
+        times = data[:, 3]
+        channels = {}
+        for index, name in enumerate(CHANNELS):
+            keep = lttb(times, data[:, index], max_points)
+            values = data[keep, index]
+            channels[name] = {'timestamp': times[keep], 'avg': values, 'min': values, 'max': values,
+                              'count': np.ones(keep.size, dtype=np.int64)}
+        return {'resolution': RAW, 'channels': channels}
+    seconds = dict(_resolutions())[resolution]
+    # 多个设备的同一个桶合并为一行
+    names = ', '.join(f'MIN({c}_min), MAX({c}_max), SUM({c}_sum)' for c in CHANNELS)
+    rows = cursor.execute(f'SELECT bucket, SUM(count), {names} FROM {rollup_table(resolution)} '
+                          f'WHERE bucket >= ? AND bucket <= ?{where} GROUP BY bucket ORDER BY bucket',
+                          [int(start_time // seconds) * seconds, end_time] + params).fetchall()
+    data = np.array(rows, dtype=np.float64).reshape(-1, 2 + 3 * len(CHANNELS))
+    counts = data[:, 1].astype(np.int64)
+    times = data[:, 0]
+    channels = {}
+    for index, name in enumerate(CHANNELS):
+        base = 2 + 3 * index
+        channels[name] = {'timestamp': times, 'avg': data[:, base + 2] / np.maximum(counts, 1),
+                          'min': data[:, base], 'max': data[:, base + 1], 'count': counts}
+    return {'resolution': resolution, 'channels': channels}
@@ -0,0 +1,87 @@
+"""
+共享内存环形缓冲区模块
+SharedSensorRing 与 SensorRingBuffer 的内存布局和读接口完全相同，只是数据和追加计数放在
+multiprocessing.shared_memory 中：采集进程作为唯一写者创建缓冲区，界面等其他进程按名称只读挂载，
+读取最新数据无需序列化或拷贝。写者先写数据再更新计数，读者的一致性约束与 SensorRingBuffer 相同。
+"""
+from multiprocessing import shared_memory
+from typing import Dict, Optional, Sequence
+import numpy as np
+from .ring_buffer import SensorRingBuffer, SENSOR_FIELDS
+
+# 头部: [追加计数, 容量, 字段数]，之后为 (字段数, 2 * 容量) 的镜像数据区
+HEADER_SLOTS = 3
+
+
+def _attach_segment(name: str) -> shared_memory.SharedMemory:
+    """挂载已有的共享内存段，但不交给本进程的 resource_tracker，避免本进程退出时把写者的段一并删除"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python 3.13 之前没有 track 参数，挂载后手动取消登记
+        from multiprocessing import resource_tracker
+        segment = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(segment._name, 'shared_memory')
+        return segment
+
+
+class SharedSensorRing(SensorRingBuffer):
+    def __init__(self, segment: shared_memory.SharedMemory, fields: Sequence[str], owner: bool):
+        header = np.ndarray((HEADER_SLOTS,), dtype=np.int64, buffer=segment.buf)
+        self.segment = segment
+        self.owner = owner
+        self.capacity = int(header[1])
+        self.fields = tuple(fields)
+        self._time_row = self.fields.index('timestamp')
+        self._header = header
+        self._data = np.ndarray((len(self.fields), 2 * self.capacity), dtype=np.float64,
+                                buffer=segment.buf, offset=HEADER_SLOTS * 8)
+
+    @property
+    def _count(self) -> int:
+        return int(self._header[0])
+
+    @_count.setter
+    def _count(self, value: int):
+        self._header[0] = value
+
+    @property
+    def name(self) -> str:
+        return self.segment.name
+
+    @classmethod
+    def create(cls, capacity: int, fields: Sequence[str] = SENSOR_FIELDS, name: Optional[str] = None) -> 'SharedSensorRing':
+        if capacity <= 0:
+            raise ValueError("缓冲区容量必须大于0")
+        size = HEADER_SLOTS * 8 + len(fields) * 2 * capacity * 8
+        segment = shared_memory.SharedMemory(name=name, create=True, size=size)
+        header = np.ndarray((HEADER_SLOTS,), dtype=np.int64, buffer=segment.buf)
+        header[:] = (0, capacity, len(fields))
+        return cls(segment, fields, owner=True)
+
+    @classmethod
+    def attach(cls, name: str, fields: Sequence[str] = SENSOR_FIELDS) -> 'SharedSensorRing':
+        """只读挂载；不要在挂载方调用 append/extend"""
+        segment = _attach_segment(name)
+        header = np.ndarray((HEADER_SLOTS,), dtype=np.int64, buffer=segment.buf)
+        if int(header[2]) != len(fields):
+            segment.close()
+            raise ValueError(f"共享缓冲区 {name} 的字段数 {int(header[2])} 与期望的 {len(fields)} 不一致")
+        return cls(segment, fields, owner=False)
+
+    def describe(self) -> Dict:
+        """供其他进程挂载所需的信息"""
+        return {'name': self.name, 'capacity': self.capacity, 'fields': self.fields}
+
+    def close(self):
+        """释放本进程的映射；创建者同时删除共享内存段。之后不能再访问此前返回的视图"""
+        self._header = self._data = None
+        try:
+            self.segment.close()
+        except BufferError:
+            pass  # 仍有视图引用该段，映射随进程退出释放
+        if self.owner:
+            try:
+                self.segment.unlink()
+            except FileNotFoundError:
+                pass